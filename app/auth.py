@@ -1,18 +1,22 @@
+import asyncio
 import logging
+import threading
 from abc import ABC, abstractmethod
 from typing import Annotated, Any, Optional
 
 import jwt
-import requests
-from cachetools import TTLCache, cached
 from fastapi import Depends, HTTPException, Request, status
 
 from .embeddings import create_embedding
-from .models import CurrentUser, Workspace
-from .models_stores import WorkspaceStore
+from .models import CurrentUser, Workspace, WorkspaceStatuses
+from .models_stores_async import AsyncWorkspaceStore
+from .oauth2.discovery import OIDCDiscovery
+from .oauth2.jwks import JWKSCache
+from .oauth2.token_cache import VerifiedTokenCache
+from .oauth2.userinfo import UserInfoClient
 from .services import get_service
 from .settings import settings
-from .sql import SQLAlchemyTransactionContext
+from .sql import AsyncSQLAlchemyTransactionContext
 from .vector_store import create_workspace_vstore
 
 log = logging.getLogger(__name__)
@@ -24,7 +28,24 @@ class AuthAPI(ABC):
         pass
 
     @abstractmethod
-    def get_current_user(request: Request) -> Optional[CurrentUser]:
+    async def get_current_user(request: Request) -> Optional[CurrentUser]:
+        pass
+
+    def cached_claims(self, request: Request) -> Optional[dict[str, Any]]:
+        """The claims of a token verified before, None when it has to be verified"""
+        return None
+
+    def verify(self, request: Request) -> dict[str, Any]:
+        """Verifies the token, may block on I/O"""
+        return self.authenticate(request)
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+    async def startup(self):
+        pass
+
+    async def aclose(self):
         pass
 
 
@@ -34,10 +55,39 @@ class OAuth2Impl(AuthAPI):
             raise Exception(
                 "No crypto support for JWT, please install the cryptography dependency"
             )
-        resp = requests.get(settings.OAUTH2_OPENID_CONFIGURATION)
-        if resp.status_code != 200:
-            raise Exception("Could not fetch openid configuration")
-        self._oauth_configuration = resp.json()
+        # nothing here may hit the network, discovery happens lazily or in the lifespan
+        self._discovery = OIDCDiscovery(
+            uri=settings.OAUTH2_OPENID_CONFIGURATION,
+            cache_file=settings.OAUTH2_OPENID_CONFIGURATION_CACHE_FILE,
+            lifespan=settings.OAUTH2_OPENID_CONFIGURATION_LIFESPAN,
+        )
+        self._jwks: Optional[JWKSCache] = None
+        self._jwks_lock = threading.Lock()
+        self._token_cache = VerifiedTokenCache(
+            max_bytes=settings.OAUTH2_TOKEN_CACHE_MAX_BYTES,
+            leeway=settings.OAUTH2_TOKEN_CACHE_LEEWAY,
+        )
+        self._userinfo = UserInfoClient(
+            ttl=settings.OAUTH2_USERINFO_CACHE_TTL,
+            negative_ttl=settings.OAUTH2_USERINFO_NEGATIVE_CACHE_TTL,
+            max_connections=settings.OAUTH2_USERINFO_MAX_CONNECTIONS,
+        )
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def _oauth_configuration(self) -> dict[str, Any]:
+        return self._discovery.get()
+
+    def _get_jwks(self) -> JWKSCache:
+        if self._jwks is None:
+            with self._jwks_lock:
+                if self._jwks is None:
+                    self._jwks = JWKSCache(
+                        uri=self._oauth_configuration["jwks_uri"],
+                        lifespan=settings.OAUTH2_JWKS_LIFESPAN,
+                        min_refetch_interval=settings.OAUTH2_JWKS_MIN_REFETCH_INTERVAL,
+                    )
+        return self._jwks
 
     def _get_token_from_request(self, request: Request) -> str:
         authorization_header = request.headers.get("Authorization")
@@ -53,12 +103,19 @@ class OAuth2Impl(AuthAPI):
         return token
 
     def authenticate(self, request: Request) -> dict[str, Any]:
+        # skip signature verification for tokens we already verified
+        data = self.cached_claims(request)
+        if data is not None:
+            return data
+        return self.verify(request)
+
+    def cached_claims(self, request: Request) -> Optional[dict[str, Any]]:
+        return self._token_cache.get(self._get_token_from_request(request))
+
+    def verify(self, request: Request) -> dict[str, Any]:
         access_token = self._get_token_from_request(request)
         try:
-            jwks_client = jwt.PyJWKClient(
-                self._oauth_configuration["jwks_uri"], cache_jwk_set=True, lifespan=360
-            )
-            signing_key = jwks_client.get_signing_key_from_jwt(access_token)
+            signing_key = self._get_jwks().get_signing_key_from_jwt(access_token)
             data = jwt.decode(
                 access_token,
                 key=signing_key.key,
@@ -76,6 +133,7 @@ class OAuth2Impl(AuthAPI):
                 },
             )
             log.debug("decoded token: %s", data)
+            self._token_cache.put(access_token, data)
             return data
         except jwt.exceptions.PyJWTError as e:
             log.info("Token is invalid: %s", e)
@@ -83,24 +141,32 @@ class OAuth2Impl(AuthAPI):
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="token is invalid"
             )
 
-    @cached(cache=TTLCache(maxsize=1000, ttl=300))
-    def fetch_userinfo_by_access_token(self, access_token: str) -> dict[str, Any]:
-        try:
-            data = requests.get(
-                url=self._oauth_configuration["userinfo_endpoint"],
-                headers={"Authorization": f"Bearer {access_token}"},
-            )
-            return data.json()
-
-        except Exception as err:
-            log.debug("Failed to fetch userinfo: %s", err)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail=f"{err}"
-            )
-
-    def get_current_user(self, request: Request, decoded_access_token: dict[str, Any]):
+    def stats(self) -> dict[str, Any]:
+        return {
+            "discovery": self._discovery.stats(),
+            "jwks": self._jwks.stats() if self._jwks is not None else None,
+            "tokens": self._token_cache.stats(),
+            "userinfo": self._userinfo.stats(),
+        }
+
+    async def startup(self):
+        self._refresher = asyncio.create_task(self._discovery.run_refresher())
+
+    async def aclose(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        await self._userinfo.aclose()
+
+    async def get_current_user(
+        self, request: Request, decoded_access_token: dict[str, Any]
+    ):
         access_token = self._get_token_from_request(request)
-        user = self.fetch_userinfo_by_access_token(access_token)
+        user = await self._userinfo.get(
+            self._oauth_configuration["userinfo_endpoint"],
+            access_token,
+            token_exp=decoded_access_token.get("exp"),
+        )
         current_user = CurrentUser.from_oauth2(user, decoded_access_token)
         return current_user
 
@@ -113,10 +179,14 @@ def create_auth_api() -> AuthAPI:
 auth_api = create_auth_api()
 
 
-def get_current_active_user(request: Request) -> Optional[CurrentUser]:
+async def get_current_active_user(request: Request) -> Optional[CurrentUser]:
     try:
-        decoded_token = auth_api.authenticate(request)
-        return auth_api.get_current_user(request, decoded_token)
+        # a verified token is served from memory on the loop, verifying one may
+        # fetch JWKS or discovery (blocking I/O), that is kept off the event loop
+        decoded_token = auth_api.cached_claims(request)
+        if decoded_token is None:
+            decoded_token = await asyncio.to_thread(auth_api.verify, request)
+        return await auth_api.get_current_user(request, decoded_token)
     except Exception as e:
         log.info("Failed to authenticate: %s", str(e))
         raise HTTPException(
@@ -130,7 +200,7 @@ def factory_auth_api(request: Request) -> AuthAPI:
 
 async def get_current_workspace(
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
-    workspace_store: WorkspaceStore = Depends(get_service(WorkspaceStore)),
+    workspace_store: AsyncWorkspaceStore = Depends(get_service(AsyncWorkspaceStore)),
 ) -> Workspace:
     workspace_id = current_user.workspace_id
     if workspace_id is None:
@@ -139,27 +209,32 @@ async def get_current_workspace(
             detail="current user is not a member of a workspace",
         )
 
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        workspace = workspace_store.get_by_id(workspace_id, tx_context=tx_context)
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        workspace = await workspace_store.get_by_id(workspace_id, tx_context=tx_context)
         if workspace is None:
             log.debug("workspace not found: %s", workspace_id)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="workspace not found"
             )
+        if workspace.status == WorkspaceStatuses.deleting:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="workspace is being deleted",
+            )
 
         return workspace
 
 
 async def get_optional_current_workspace(
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
-    workspace_store: WorkspaceStore = Depends(get_service(WorkspaceStore)),
+    workspace_store: AsyncWorkspaceStore = Depends(get_service(AsyncWorkspaceStore)),
 ) -> Optional[Workspace]:
     workspace_id = current_user.workspace_id
     if workspace_id is None:
         return None
 
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        ws = workspace_store.get_by_id(workspace_id, tx_context=tx_context)
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        ws = await workspace_store.get_by_id(workspace_id, tx_context=tx_context)
         return ws
 
 
@@ -0,0 +1,233 @@
+import logging
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+
+from cachetools import TTLCache
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+)
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# rough per entry overhead (key, configs, dicts) on top of the serialized sizes
+ENTRY_OVERHEAD_BYTES = 1024
+
+# (workspace_id, thread_id, checkpoint_ns)
+ThreadKey = tuple[str, str, str]
+
+
+class _Entry(NamedTuple):
+    config: RunnableConfig
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    parent_config: Optional[RunnableConfig]
+    # (task_id, idx) -> (task_id, channel, value)
+    writes: dict[tuple[str, int], tuple[str, str, Any]]
+    # serialized sizes of the checkpoint and metadata, of the channel values and of
+    # the writes
+    base_size: int
+    channel_sizes: dict[str, int]
+    writes_size: int
+
+    @property
+    def size(self) -> int:
+        return (
+            self.base_size
+            + sum(self.channel_sizes.values())
+            + self.writes_size
+            + ENTRY_OVERHEAD_BYTES
+        )
+
+
+class _TTLCache(TTLCache):
+    def __init__(self, maxsize, ttl, getsizeof=None, on_evict=None):
+        super().__init__(maxsize=maxsize, ttl=ttl, getsizeof=getsizeof)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        if self._on_evict is not None:
+            self._on_evict()
+        return item
+
+
+class LatestCheckpointCache:
+    """
+    Write-through cache of the latest checkpoint of threads, with its pending writes,
+    so a conversation step loads what the previous step of this process saved without
+    reading and deserializing it again.
+
+    Entries are LRU evicted, bounded by the serialized size of what they hold, and
+    expire after ttl seconds. A thread written by another process is stale here, the
+    store checks a hit is still the latest checkpoint with all of its writes before
+    serving it (a single indexed query instead of loading and deserializing it) and
+    invalidates it otherwise. Cached values are shared with callers, the checkpoint
+    dicts LangGraph updates in place are copied in and out.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: int = 300):
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[ThreadKey], None]] = []
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "invalidations": 0,
+            "evictions": 0,
+        }
+        self._cache = _TTLCache(
+            maxsize=max_bytes,
+            ttl=ttl,
+            getsizeof=lambda entry: entry.size,
+            on_evict=self._on_evict,
+        )
+
+    def _on_evict(self):
+        self._stats["evictions"] += 1
+
+    def subscribe(self, listener: Callable[[ThreadKey], None]):
+        """
+        Calls listener with the key of every thread this process saves a checkpoint
+        or writes to, for deployments running several processes to broadcast it and
+        invalidate the thread in the others
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, key: ThreadKey):
+        for listener in self._listeners:
+            try:
+                listener(key)
+            except Exception:
+                logger.exception("checkpoint cache listener failed")
+
+    def get(
+        self, key: ThreadKey, checkpoint_id: Optional[str] = None
+    ) -> Optional[CheckpointTuple]:
+        """The thread's latest checkpoint, if it is checkpoint_id when one is given"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or (
+                checkpoint_id is not None and checkpoint_id != entry.checkpoint["id"]
+            ):
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+        return CheckpointTuple(
+            config=entry.config,
+            checkpoint=copy_checkpoint(entry.checkpoint),
+            metadata=dict(entry.metadata),
+            parent_config=entry.parent_config,
+            pending_writes=[entry.writes[k] for k in sorted(entry.writes)],
+        )
+
+    def put(
+        self,
+        key: ThreadKey,
+        checkpoint_tuple: CheckpointTuple,
+        base_size: int,
+        channel_sizes: dict[str, int],
+        writes: Optional[list[tuple[str, int, str, Any]]] = None,
+        writes_size: int = 0,
+        notify: bool = True,
+    ):
+        """
+        Caches the thread's latest checkpoint with its (task_id, idx, channel, value)
+        writes, sized by what was serialized for them. Channels without a size take
+        the one of the entry replaced, the values of unchanged channels are not
+        serialized again. Listeners are notified unless the checkpoint was read.
+        """
+        with self._lock:
+            previous = self._cache.get(key)
+            if (
+                previous is not None
+                and previous.checkpoint["id"] > checkpoint_tuple.checkpoint["id"]
+            ):
+                # read before a newer checkpoint was saved by this process
+                return
+            if previous is not None:
+                channel_sizes = {**previous.channel_sizes, **channel_sizes}
+            values = checkpoint_tuple.checkpoint["channel_values"]
+            entry = _Entry(
+                config=checkpoint_tuple.config,
+                checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint),
+                metadata=dict(checkpoint_tuple.metadata),
+                parent_config=checkpoint_tuple.parent_config,
+                writes={
+                    (task_id, idx): (task_id, channel, value)
+                    for task_id, idx, channel, value in writes or []
+                },
+                base_size=base_size,
+                channel_sizes={k: v for k, v in channel_sizes.items() if k in values},
+                writes_size=writes_size,
+            )
+            self._stats["puts"] += 1
+            try:
+                self._cache[key] = entry
+            except ValueError:
+                # a single entry larger than the whole cache
+                self._cache.pop(key, None)
+        if notify:
+            self._notify(key)
+
+    def put_writes(
+        self,
+        key: ThreadKey,
+        checkpoint_id: str,
+        writes: list[tuple[str, int, str, Any]],
+        size: int,
+    ):
+        """Adds (task_id, idx, channel, value) writes to the checkpoint if cached"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.checkpoint["id"] == checkpoint_id:
+                pending = dict(entry.writes)
+                for task_id, idx, channel, value in writes:
+                    pending[(task_id, idx)] = (task_id, channel, value)
+                try:
+                    self._cache[key] = entry._replace(
+                        writes=pending, writes_size=entry.writes_size + size
+                    )
+                except ValueError:
+                    self._cache.pop(key, None)
+        self._notify(key)
+
+    def invalidate(
+        self,
+        workspace_id: str,
+        thread_id: Optional[str] = None,
+        checkpoint_ns: Optional[str] = None,
+    ):
+        """Drops the workspace's threads, or a thread's namespaces, or one namespace"""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if checkpoint_ns is not None and thread_id is not None:
+                self._cache.pop((workspace_id, thread_id, checkpoint_ns), None)
+                return
+            stale = [
+                k
+                for k in list(self._cache.keys())
+                if k[0] == workspace_id and (thread_id is None or k[1] == thread_id)
+            ]
+            for key in stale:
+                self._cache.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.copy()
+            stats["entries"] = len(self._cache)
+            stats["bytes"] = self._cache.currsize
+            stats["max_bytes"] = self._cache.maxsize
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        return stats
+
+
+checkpoint_cache = LatestCheckpointCache(
+    max_bytes=settings.CHECKPOINT_CACHE_MAX_BYTES, ttl=settings.CHECKPOINT_CACHE_TTL
+)
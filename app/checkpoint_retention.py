@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Engine
+
+from .models_stores import CheckpointStore
+from .sql import SQLAlchemyTransactionContext
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionMetrics:
+    """
+    What the checkpoint retention reclaimed since the process started, per source
+    (inline when saving checkpoints, background for the compaction job), and how
+    the last compaction run went.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: dict[str, dict[str, int]] = {}
+        self._last_run: Optional[dict] = None
+
+    def observe(self, source: str, reclaimed: dict[str, int]):
+        with self._lock:
+            totals = self._totals.setdefault(
+                source,
+                {"threads": 0, "checkpoints": 0, "writes": 0, "blobs": 0, "bytes": 0},
+            )
+            totals["threads"] += 1
+            for key, value in reclaimed.items():
+                totals[key] += value
+
+    def observe_run(self, started_at: datetime, duration_ms: float, run: dict):
+        with self._lock:
+            self._last_run = {
+                "started_at": started_at.isoformat(),
+                "duration_ms": duration_ms,
+                **run,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "reclaimed": {k: dict(v) for k, v in self._totals.items()},
+                "last_compaction": self._last_run,
+            }
+
+
+retention_metrics = RetentionMetrics()
+
+
+class CheckpointCompactor:
+    """
+    Applies the checkpoint retention to every thread in the background, for threads
+    saved before inline retention was enabled or while it is disabled. Threads are
+    compacted batch_size per transaction so locks are never held for long.
+    """
+
+    def __init__(
+        self,
+        checkpoint_store: CheckpointStore,
+        keep_last: int,
+        batch_size: int,
+        interval: int,
+        engine: Optional[Engine] = None,
+    ):
+        self.checkpoint_store = checkpoint_store
+        self.keep_last = keep_last
+        self.batch_size = batch_size
+        self.interval = interval
+        self.engine = engine
+
+    def compact(self) -> dict[str, int]:
+        """Compacts every thread that has anything to reclaim, returns the totals"""
+        started_at, started = datetime.now(), time.perf_counter()
+        totals = {"threads": 0, "checkpoints": 0, "writes": 0, "blobs": 0, "bytes": 0}
+        after = None
+        while True:
+            with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx:
+                threads = self.checkpoint_store.list_compactable_threads(
+                    self.keep_last, after, self.batch_size, tx_context=tx
+                )
+                for workspace_id, thread_id in threads:
+                    reclaimed = self.checkpoint_store.compact_thread(
+                        workspace_id, thread_id, self.keep_last, tx_context=tx
+                    )
+                    retention_metrics.observe("background", reclaimed)
+                    totals["threads"] += 1
+                    for key, value in reclaimed.items():
+                        totals[key] += value
+            if len(threads) < self.batch_size:
+                break
+            after = threads[-1]
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        retention_metrics.observe_run(started_at, duration_ms, totals)
+        logger.info("compacted checkpoints in %.0fms: %s", duration_ms, totals)
+        return totals
+
+    def run(self, stop: threading.Event):
+        """Compacts every interval seconds until stop is set"""
+        while not stop.wait(self.interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("failed to compact checkpoints")
@@ -0,0 +1,82 @@
+import zlib
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# the first byte of a tagged value is its format, json text never starts with
+# either, so values saved before the tags (plain json) are still read as they are
+_FORMATS = {"msgpack": 0x01, "json": 0x02, "bytes": 0x03, "bytearray": 0x04}
+_TYPES = {tag: type_ for type_, tag in _FORMATS.items()}
+_COMPRESSED = 0x80
+
+
+class TaggedSerializer(SerializerProtocol):
+    """
+    Serializes checkpoints, metadata and writes with LangGraph's msgpack encoding
+    (messages and other LangChain objects included), a few times faster to encode than
+    json and as fast to decode, compressing values of at least compress_min_bytes (0
+    disables) when that makes them smaller.
+
+    A tag byte tells the format of every value, so rows written by other serializers
+    or before the tags can be mixed with new ones.
+    """
+
+    def __init__(
+        self,
+        compress_min_bytes: int = 2048,
+        compress_level: int = 1,
+        serde: Optional[JsonPlusSerializer] = None,
+    ):
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        self.serde = serde or JsonPlusSerializer()
+
+    def dumps(self, obj: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(obj)
+        tag = _FORMATS[type_]
+        if self.compress_min_bytes and len(data) >= self.compress_min_bytes:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                tag, data = tag | _COMPRESSED, compressed
+        return bytes((tag,)) + data
+
+    def loads(self, data: bytes) -> Any:
+        type_ = _TYPES.get(data[0] & ~_COMPRESSED) if data else None
+        if type_ is None:
+            return self.serde.loads(data)
+        payload = data[1:]
+        if data[0] & _COMPRESSED:
+            payload = zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        return "tagged", self.dumps(obj)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ == "tagged":
+            return self.loads(payload)
+        return self.serde.loads_typed(data)
+
+
+class JsonSerializer(TaggedSerializer):
+    """
+    Writes plain json, as LangGraph's default serializer does, and reads tagged values
+    too so switching back from the tagged serializer keeps existing rows readable
+    """
+
+    def __init__(self, serde: Optional[JsonPlusSerializer] = None):
+        super().__init__(compress_min_bytes=0, serde=serde)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+
+def checkpoint_serde(name: str, compress_min_bytes: int) -> SerializerProtocol:
+    """The checkpoint serializer by name, tagged or json"""
+    if name == "tagged":
+        return TaggedSerializer(compress_min_bytes=compress_min_bytes)
+    if name == "json":
+        return JsonSerializer()
+    raise ValueError(f"unknown checkpoint serializer: {name}")
@@ -0,0 +1,133 @@
+import enum
+import json
+import threading
+from typing import Any, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import Connection, Executable
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement
+
+from .settings import settings
+from .tx import TransactionContext
+
+
+class CountModes(enum.Enum):
+    """
+    How list totals are computed
+
+    - exact: a count query on every request.
+    - cached: an exact count cached per workspace until the table is written to or
+      for COUNT_CACHE_TTL seconds, whatever comes first.
+    - estimate: the planner's row estimate on postgres (cached on other backends),
+      cheap but may be off, meant for "about N results" and for paging.
+    """
+
+    exact = "exact"
+    cached = "cached"
+    estimate = "estimate"
+
+
+class CountCache:
+    """
+    Caches counts per (table, workspace), writers invalidate the entries of their
+    workspace. The cache is per process, the ttl bounds how stale a count can get
+    after a write made by another process.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+
+    def get(self, table: str, workspace_id: str, key: str) -> Optional[int]:
+        if self._cache is None:
+            return None
+        with self._lock:
+            return self._cache.get((table, workspace_id), {}).get(key)
+
+    def put(self, table: str, workspace_id: str, key: str, count: int):
+        if self._cache is None:
+            return
+        with self._lock:
+            counts = self._cache.get((table, workspace_id))
+            if counts is None:
+                counts = self._cache[(table, workspace_id)] = {}
+            counts[key] = count
+
+    def invalidate(self, table: str, workspace_id: Optional[str]):
+        if self._cache is None:
+            return
+        with self._lock:
+            self._cache.pop((table, workspace_id), None)
+
+
+count_cache = CountCache(
+    maxsize=settings.COUNT_CACHE_MAXSIZE, ttl=settings.COUNT_CACHE_TTL
+)
+
+
+def invalidate_counts(
+    table: str,
+    workspace_id: Optional[str],
+    tx_context: Optional[TransactionContext] = None,
+):
+    """
+    Drops the workspace's counts of table, now and once the transaction that wrote
+    to it is over, so a count a concurrent request cached before the write was
+    committed does not outlive it
+    """
+    count_cache.invalidate(table, workspace_id)
+    if tx_context is not None:
+        tx_context.after_transaction(
+            lambda: count_cache.invalidate(table, workspace_id)
+        )
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, executed with its bound parameters"""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Executable):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _estimate(
+    connection: Connection, query: Executable, params: Optional[dict[str, Any]]
+) -> int:
+    # executed rather than rendered, so parameters go through the types' bind
+    # processing (enums, json...) like the count query's would
+    plan = connection.execute(_Explain(query), params).scalar_one()
+    node = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+    # the count aggregates the rows of the scan below it
+    while node.get("Node Type") == "Aggregate" and node.get("Plans"):
+        node = node["Plans"][0]
+    return int(node["Plan Rows"])
+
+
+def count_rows(
+    connection: Connection,
+    query: Executable,
+    table: str,
+    workspace_id: str,
+    mode: CountModes = CountModes.exact,
+    params: Optional[dict[str, Any]] = None,
+) -> int:
+    """Runs a count(*) query of a workspace's rows of table as mode says"""
+    if mode == CountModes.exact:
+        return connection.execute(query, params).scalar_one()
+
+    if mode == CountModes.estimate and connection.dialect.name == "postgresql":
+        return _estimate(connection, query, params)
+
+    key = f"{query}:{sorted(query.compile().params.items())}:{params}"
+    count = count_cache.get(table, workspace_id, key)
+    if count is None:
+        count = connection.execute(query, params).scalar_one()
+        count_cache.put(table, workspace_id, key, count)
+    return count
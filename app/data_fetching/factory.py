@@ -6,6 +6,7 @@ from app.data_fetching.iface import DataFetcherInterface
 from app.data_fetching.mock import DFMockImpl
 from app.data_fetching.okta import DFOktaImpl
 from app.data_fetching.utils import prepare_metadata_ids_content
+from app.ext_vector_store import invalidate_document_counts
 from app.models import Directory
 from app.sql import SQLAlchemyTransactionContext
 from app.vault_utils import resolve_ws_config_secrets
@@ -106,3 +107,5 @@ async def background_data_fetch(
         )
     else:
         log.debug(f"No new or changed documents to insert for directory {dir.name}")
+
+    invalidate_document_counts(dir.workspace_id)
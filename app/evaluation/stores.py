@@ -113,9 +113,12 @@ class ConversationStoreMock(ConversationStore):
         pass
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ):
-        pass
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        return 0
 
 
 class ChatMessageStoreMock(ChatMessageStore):
@@ -138,9 +141,12 @@ class ChatMessageStoreMock(ChatMessageStore):
         pass
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ):
-        pass
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        return 0
 
 
 class ApplicationStoreMock(ApplicationStore):
@@ -188,9 +194,12 @@ class ApplicationStoreMock(ApplicationStore):
         pass
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
-        pass
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        return 0
 
     def update(self, **kwargs):
         pass
@@ -246,9 +255,12 @@ class DirectoryStoreMock(DirectoryStore):
         pass
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
-        pass
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        return 0
 
     def update(self, **kwargs):
         pass
@@ -1,10 +1,11 @@
 import argparse
-from typing import List
+import asyncio
+from typing import List, Optional
 
 import injector
 from app.embeddings import create_embedding
 from app.llm.conversation import prepare_known_apps_str
-from app.llm.graph import CONVERSATION_TYPE_KEY, create_graph
+from app.llm.graph import CONVERSATION_TYPE_KEY, create_graph, graph_config
 from app.llm.prompts import (
     CONVERSATION_ID_KEY,
     KNOWN_APPS_KEY,
@@ -26,7 +27,8 @@ from app.vault.api import VaultAPI
 from app.vault.env_vars import EnvVarVault
 from app.vector_store import create_retriever
 from dotenv import load_dotenv
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langchain_core.retrievers import BaseRetriever
+from langgraph.checkpoint.memory import MemorySaver
 from langsmith.evaluation import evaluate
 from langsmith.schemas import Example, Run
 
@@ -77,35 +79,40 @@ def create_graph_for_test(ws_id, conv_id, retriever):
         ),
     }
 
-    memory = SqliteSaver.from_conn_string(":memory:")
-    graph = create_graph(
-        tools=[], data_context=dc, retriever=retriever, checkpointer=memory
+    # the graph's nodes are async, so is the checkpointer driving them
+    memory = MemorySaver()
+    graph = create_graph(checkpointer=memory)
+    config = graph_config(
+        thread_id=conv_id,
+        workspace_id=ws_id,
+        tools=[],
+        retriever=retriever,
+        data_context=dc,
     )
-    return graph
+    return graph, config
 
 
-def predict_for_ws(ws_id):
-    embedding = create_embedding()
-    retriever = create_retriever(workspace_id=ws_id, embedding=embedding)
+def predict_for_ws(ws_id, retriever: Optional[BaseRetriever] = None):
+    if retriever is None:
+        embedding = create_embedding()
+        retriever = create_retriever(workspace_id=ws_id, embedding=embedding)
 
     def predict(inputs: dict) -> dict:
         conv_id = "abcd"
-        graph = create_graph_for_test(ws_id=ws_id, conv_id=conv_id, retriever=retriever)
-        config = {
-            "configurable": {
-                "thread_id": conv_id,
-                "workspace_id": ws_id,
-            }
-        }
+        graph, config = create_graph_for_test(
+            ws_id=ws_id, conv_id=conv_id, retriever=retriever
+        )
 
         messages = [d.get("data") for d in inputs.get("input")]
 
-        result = graph.invoke(
-            {
-                MEMORY_KEY: messages,
-                CONVERSATION_TYPE_KEY: inputs[CONVERSATION_TYPE_KEY],
-            },
-            config,
+        result = asyncio.run(
+            graph.ainvoke(
+                {
+                    MEMORY_KEY: messages,
+                    CONVERSATION_TYPE_KEY: inputs[CONVERSATION_TYPE_KEY],
+                },
+                config,
+            )
         )
         last_message = result[MEMORY_KEY][-1].content
         return {"output": last_message}
@@ -0,0 +1,48 @@
+from langchain_core.messages import HumanMessage
+from langchain_core.retrievers import BaseRetriever
+
+from app.evaluation.testing import predict_for_ws
+from app.llm.guardrails.on_topic import Valid
+from app.llm.nodes import CONV_TYPE_INFO, CONVERSATION_TYPE_KEY, INFORMATION_AGENT_NAME
+from app.llm.prompts import APP_ID_KEY, APP_NAME_KEY
+
+
+class _Retriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return []
+
+
+class _Agent:
+    def __init__(self, name: str):
+        self.name = name
+
+    async def ainvoke(self, state):
+        if self.name == "entry_point":
+            return {"output": {APP_ID_KEY: None, APP_NAME_KEY: None}}
+        return {"output": f"{self.name} answered {state['messages'][-1].content}"}
+
+
+async def _guardrail(input):
+    return Valid(is_valid=True, why="on topic")
+
+
+class TestEvaluation:
+    def test_predict(self, monkeypatch):
+        monkeypatch.setattr(
+            "app.llm.nodes.create_agent", lambda name, **kwargs: _Agent(name)
+        )
+        monkeypatch.setattr("app.llm.nodes.topical_guardrail", _guardrail)
+        monkeypatch.setattr(
+            "app.llm.nodes.create_request_roles_tool", lambda **kwargs: None
+        )
+
+        predict = predict_for_ws("ws1", retriever=_Retriever())
+        prediction = predict(
+            {
+                "input": [{"data": HumanMessage(content="what is jira?")}],
+                CONVERSATION_TYPE_KEY: CONV_TYPE_INFO,
+            }
+        )
+        assert prediction == {
+            "output": f"{INFORMATION_AGENT_NAME} answered what is jira?"
+        }
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_main_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bind_main_loop(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Makes loop (the running one by default) the one run_on_main_loop runs on"""
+    global _main_loop
+    _main_loop = loop or asyncio.get_running_loop()
+
+
+def run_on_main_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs coro on the server's event loop from a worker thread (e.g. a Slack
+    listener) and waits for its result. Without a server loop (scripts) coro runs on
+    a loop of its own, closed once it is done.
+    """
+    loop = _main_loop
+    if loop is None or loop.is_closed():
+        return asyncio.run(coro)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_on_main_loop called from the main loop, await instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
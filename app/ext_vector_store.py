@@ -2,6 +2,7 @@ from typing import List, Optional
 
 from sqlalchemy import text
 
+from app.counts import CountModes, count_rows, invalidate_counts
 from app.models import Document
 from app.sql import SQLAlchemyTransactionContext
 
@@ -95,6 +96,11 @@ def get_document(
     return record_to_doc(record)
 
 
+def invalidate_document_counts(workspace_id: str):
+    """To be called after a workspace's documents were added or deleted"""
+    invalidate_counts(embedding_table_name, workspace_id)
+
+
 def list_documents(
     workspace_id: str,
     app_names: Optional[List[str]] = None,
@@ -103,23 +109,35 @@ def list_documents(
     limit=10,
     projection: Optional[List[str]] = [],
     tx_context: SQLAlchemyTransactionContext = None,
-) -> tuple[List[Document], int]:
+    include_total: bool = True,
+    total_mode: CountModes = CountModes.exact,
+) -> tuple[List[Document], Optional[int]]:
     stmt = text(
         f"SELECT * FROM {collection_table_name} WHERE name = :workspace_id limit 1;"
     )
     result = tx_context.connection.execute(stmt, {"workspace_id": workspace_id})
     collection = result.first()
     if collection is None:
-        return [], 0
+        return [], 0 if include_total else None
 
     filters = prepare_where(directory=directory, app_names=app_names)
-    base_count_query = text(
-        f"select count(*) from {embedding_table_name} where {filters}"
-    )
-    total_count = tx_context.connection.execute(
-        base_count_query,
-        {"collection_id": str(collection.uuid), "directory": f'"{directory}"'},
-    ).scalar_one()
+    total_count = None
+    if include_total:
+        # the jsonb filters make an exact count as expensive as the page itself
+        base_count_query = text(
+            f"select count(*) from {embedding_table_name} where {filters}"
+        )
+        total_count = count_rows(
+            tx_context.connection,
+            base_count_query,
+            table=embedding_table_name,
+            workspace_id=workspace_id,
+            mode=total_mode,
+            params={
+                "collection_id": str(collection.uuid),
+                "directory": f'"{directory}"',
+            },
+        )
 
     proj = create_projection(proj=projection)
     query = text(
@@ -1,7 +1,10 @@
 import injector
 
-from app.sql import sqlalchemy_engine
+from app.sql import get_async_engine, sqlalchemy_engine
 
+from .checkpoint_cache import checkpoint_cache
+from .checkpoint_retention import CheckpointCompactor
+from .checkpoint_serde import checkpoint_serde
 from .models_stores import (
     ApplicationStore,
     ChatMessageStore,
@@ -9,10 +12,20 @@ from .models_stores import (
     ConversationStore,
     DirectoryStore,
     RuleStore,
+    WorkspacePurgeStore,
     WorkspaceStore,
     WorkspaceStoreHooks,
     WorkspaceStoreProxy,
 )
+from .models_stores_async import (
+    AsyncApplicationStore,
+    AsyncChatMessageStore,
+    AsyncCheckpointStoreSQL,
+    AsyncConversationStore,
+    AsyncDirectoryStore,
+    AsyncRuleStore,
+    AsyncWorkspaceStore,
+)
 from .models_stores_sql import (
     ApplicationStoreSQL,
     ChatMessageStoreSQL,
@@ -20,23 +33,130 @@ from .models_stores_sql import (
     ConversationStoreSQL,
     DirectoryStoreSQL,
     RuleStoreSQL,
+    WorkspacePurgeStoreSQL,
     WorkspaceStoreSQL,
 )
+from .settings import settings
+from .vault.api import VaultAPI
+from .workspace_cache import WorkspaceCache
+from .workspace_purge import WorkspacePurger
 
 
 class MainModule(injector.Module):
+    @injector.singleton
     @injector.provider
     def provide_workspace_store(
         self, hooks: injector.Optional[WorkspaceStoreHooks] = None
     ) -> WorkspaceStore:
         workspace_store_sql = WorkspaceStoreSQL()
-        return WorkspaceStoreProxy(store=workspace_store_sql, hooks=hooks)
+        cache = WorkspaceCache(
+            maxsize=settings.WORKSPACE_CACHE_MAXSIZE, ttl=settings.WORKSPACE_CACHE_TTL
+        )
+        return WorkspaceStoreProxy(store=workspace_store_sql, hooks=hooks, cache=cache)
+
+    @injector.singleton
+    @injector.provider
+    def provide_async_workspace_store(
+        self, store: WorkspaceStore
+    ) -> AsyncWorkspaceStore:
+        return AsyncWorkspaceStore(store)
 
+    @injector.singleton
+    @injector.provider
+    def provide_async_conversation_store(
+        self, store: ConversationStore
+    ) -> AsyncConversationStore:
+        return AsyncConversationStore(store)
+
+    @injector.singleton
+    @injector.provider
+    def provide_async_message_store(
+        self, store: ChatMessageStore
+    ) -> AsyncChatMessageStore:
+        return AsyncChatMessageStore(store)
+
+    @injector.singleton
+    @injector.provider
+    def provide_async_app_store(self, store: ApplicationStore) -> AsyncApplicationStore:
+        return AsyncApplicationStore(store)
+
+    @injector.singleton
+    @injector.provider
+    def provide_async_dir_store(self, store: DirectoryStore) -> AsyncDirectoryStore:
+        return AsyncDirectoryStore(store)
+
+    @injector.singleton
+    @injector.provider
+    def provide_async_rule_store(self, store: RuleStore) -> AsyncRuleStore:
+        return AsyncRuleStore(store)
+
+    @injector.singleton
     @injector.provider
     def provide_checkpoint_store(self) -> CheckpointStore:
-        checkpoint_store_sql = CheckpointStoreSQL(engine=sqlalchemy_engine)
+        keep_last = (
+            settings.CHECKPOINT_KEEP_LAST if settings.CHECKPOINT_COMPACT_INLINE else 0
+        )
+        serde = checkpoint_serde(
+            settings.CHECKPOINT_SERDE, settings.CHECKPOINT_COMPRESS_MIN_BYTES
+        )
+        cache = checkpoint_cache if settings.CHECKPOINT_CACHE_MAX_BYTES > 0 else None
+        if settings.CHECKPOINT_ASYNC:
+            return AsyncCheckpointStoreSQL(
+                engine=sqlalchemy_engine,
+                async_engine=get_async_engine(),
+                offload_serde=settings.CHECKPOINT_OFFLOAD_SERDE,
+                keep_last=keep_last,
+                serde=serde,
+                cache=cache,
+                compact_interval=settings.CHECKPOINT_COMPACT_INLINE_INTERVAL,
+            )
+        checkpoint_store_sql = CheckpointStoreSQL(
+            engine=sqlalchemy_engine,
+            keep_last=keep_last,
+            serde=serde,
+            cache=cache,
+            compact_interval=settings.CHECKPOINT_COMPACT_INLINE_INTERVAL,
+        )
         return checkpoint_store_sql
 
+    @injector.singleton
+    @injector.provider
+    def provide_checkpoint_compactor(
+        self, checkpoint_store: CheckpointStore
+    ) -> CheckpointCompactor:
+        return CheckpointCompactor(
+            checkpoint_store=checkpoint_store,
+            keep_last=settings.CHECKPOINT_KEEP_LAST,
+            batch_size=settings.CHECKPOINT_COMPACT_BATCH_SIZE,
+            interval=settings.CHECKPOINT_COMPACT_INTERVAL,
+        )
+
+    @injector.singleton
+    @injector.provider
+    def provide_workspace_purger(
+        self,
+        workspace_store: WorkspaceStore,
+        purge_store: WorkspacePurgeStore,
+        msg_store: ChatMessageStore,
+        conversation_store: ConversationStore,
+        app_store: ApplicationStore,
+        dir_store: DirectoryStore,
+        rule_store: RuleStore,
+        checkpoint_store: CheckpointStore,
+        vault: VaultAPI,
+    ) -> WorkspacePurger:
+        return WorkspacePurger(
+            workspace_store=workspace_store,
+            purge_store=purge_store,
+            msg_store=msg_store,
+            conversation_store=conversation_store,
+            app_store=app_store,
+            dir_store=dir_store,
+            rule_store=rule_store,
+            checkpoint_store=checkpoint_store,
+            vault=vault,
+        )
+
     def configure(self, binder):
         # binder.bind(UserStore, to=UserStoreSCIM, scope=injector.singleton)
         binder.bind(
@@ -46,3 +166,6 @@ class MainModule(injector.Module):
         binder.bind(ApplicationStore, to=ApplicationStoreSQL, scope=injector.singleton)
         binder.bind(DirectoryStore, to=DirectoryStoreSQL, scope=injector.singleton)
         binder.bind(RuleStore, to=RuleStoreSQL, scope=injector.singleton)
+        binder.bind(
+            WorkspacePurgeStore, to=WorkspacePurgeStoreSQL, scope=injector.singleton
+        )
@@ -1,10 +1,13 @@
 # from langchain.globals import set_debug
+import asyncio
 import json
 from typing import Any, Optional
 
 from app.llm.tools.utils import get_tools_for_workspace_and_conversation
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.state import CompiledStateGraph
 
 from ..embeddings import create_embedding
 from ..llm.graph import CONVERSATION_TYPE_KEY
@@ -17,9 +20,10 @@ from ..services import (
     factory_ws_store,
     service_registry,
 )
+from ..sql import SQLAlchemyTransactionContext
 from ..tx import TransactionContext
 from ..vector_store import create_retriever
-from .graph import create_graph
+from .graph import compiled_graph, graph_config
 from .prompts import (
     CONVERSATION_ID_KEY,
     KNOWN_APPS_KEY,
@@ -36,7 +40,11 @@ def create_agent_for_access_request_conversation(
     ws: Optional[Workspace],
     data_context: dict[str, Any],
     checkpointer: BaseCheckpointSaver = None,
-):
+) -> tuple[CompiledStateGraph, RunnableConfig]:
+    """
+    The access request graph, compiled once per process, and the config to run a turn
+    of the conversation with
+    """
     workspace_name = ws.name if ws is not None else None
     embedding = create_embedding()
     retriever = create_retriever(
@@ -48,14 +56,15 @@ def create_agent_for_access_request_conversation(
     if checkpointer is None:
         checkpointer = factory_checkpointer()
 
-    graph = create_graph(
+    config = graph_config(
+        thread_id=conversation.id,
+        workspace_id=conversation.workspace_id,
         tools=get_tools_for_workspace_and_conversation(conv=conversation, ws=ws),
-        data_context=data_context,
         retriever=retriever,
-        checkpointer=checkpointer,
+        data_context=data_context,
     )
 
-    return graph
+    return compiled_graph(checkpointer), config
 
 
 def add_messages(
@@ -77,27 +86,19 @@ def prepare_known_apps_str(apps: list[Application]):
     return "\n".join(app_str)
 
 
-async def make_conversation(
-    current_user: User,
-    conversation: Conversation,
-    input: str,
-    tx_context: TransactionContext,
+def _prepare_turn(
+    current_user: User, conversation: Conversation, tx_context: TransactionContext
 ):
-    message_store = service_registry().get(ChatMessageStore)
-    chat_history = LangchainChatMessageHistory(
-        conversation_id=conversation.id,
-        workspace_id=conversation.workspace_id,
-        tx_context=tx_context,
-        store=message_store,
-    )
-
     ws_store = factory_ws_store()
     ws = ws_store.get_by_id(
         workspace_id=conversation.workspace_id, tx_context=tx_context
     )
 
     app_store = factory_app_store()
-    apps, _ = app_store.list(workspace_id=ws.id, limit=1000, tx_context=tx_context)
+    with SQLAlchemyTransactionContext(read_only=True).manage() as ro_tx_context:
+        apps, _ = app_store.list(
+            workspace_id=ws.id, limit=1000, tx_context=ro_tx_context
+        )
 
     dc = {
         USER_EMAIL_KEY: current_user.email,
@@ -106,16 +107,29 @@ async def make_conversation(
         KNOWN_APPS_KEY: prepare_known_apps_str(apps=apps),
     }
 
-    agent_executor = create_agent_for_access_request_conversation(
+    return create_agent_for_access_request_conversation(
         conversation=conversation, ws=ws, data_context=dc
     )
 
-    config = {
-        "configurable": {
-            "thread_id": conversation.id,
-            "workspace_id": conversation.workspace_id,
-        }
-    }
+
+async def make_conversation(
+    current_user: User,
+    conversation: Conversation,
+    input: str,
+    tx_context: TransactionContext,
+):
+    message_store = service_registry().get(ChatMessageStore)
+    chat_history = LangchainChatMessageHistory(
+        conversation_id=conversation.id,
+        workspace_id=conversation.workspace_id,
+        tx_context=tx_context,
+        store=message_store,
+    )
+
+    # the lookups of the turn block, they run off the event loop driving the graph
+    agent_executor, config = await asyncio.to_thread(
+        _prepare_turn, current_user, conversation, tx_context
+    )
 
     result = await agent_executor.ainvoke(
         {
@@ -126,7 +140,7 @@ async def make_conversation(
     )
 
     last_message = result[MEMORY_KEY][-1].content
-    add_messages(chat_history, input, last_message)
+    await asyncio.to_thread(add_messages, chat_history, input, last_message)
     return {"output": last_message}
 
 
@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import json
 import operator
 from typing import Annotated, Any, Callable, Dict, Optional, Sequence, TypedDict
@@ -5,29 +7,37 @@ from typing import Annotated, Any, Callable, Dict, Optional, Sequence, TypedDict
 from langchain.prompts.prompt import PromptTemplate
 from langchain_core.messages import BaseMessage, ToolMessage
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableConfig
 from langchain_core.runnables.base import RunnableLike
 from langchain_core.tools import BaseTool
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolExecutor, ToolInvocation
 
 from app.llm.tools.create_ticket_for_role_request_tool import create_request_roles_tool
 from app.llm.tools.deny_access_tool import create_deny_provision_tool
 from app.llm.tools.provision_role_tool import create_provision_role_tool
 from app.llm.tools.retriever_tool import create_retriever_tool
+from app.sql import unit_of_work
 
 from .nodes import (
     CONV_TYPE_DATA_OWNER,
     CONV_TYPE_FAILED_GUARD,
     CONV_TYPE_INFO,
     CONVERSATION_TYPE_KEY,
+    DATA_CONTEXT_KEY,
     DATA_OWNER_AGENT_NODE,
     INFORMATION_AGENT_NAME,
     RECOMMENDER_AGENT_NAME,
+    RETRIEVER_TOOL_KEY,
+    TOOLS_KEY,
     create_data_owner_node,
     create_info_gatherer_node,
     create_recommendation_node,
+    data_context,
     entry_point_node,
+    request_tools,
 )
 from .prompts import MEMORY_KEY, WS_ID_KEY
 
@@ -41,21 +51,30 @@ class GraphState(TypedDict):
     extra_instructions: str
 
 
-def create_tool_node(tools, ws_id):
-    def tool_node(state):
-        app_id = state.get("app_id", None)
-        if app_id is not None:
-            prt = create_provision_role_tool(app_id=app_id, ws_id=ws_id)
-            if prt is not None:
-                tools.append(prt)
+def _app_tools(app_id, ws_id) -> list[BaseTool]:
+    tools = []
+    prt = create_provision_role_tool(app_id=app_id, ws_id=ws_id)
+    if prt is not None:
+        tools.append(prt)
+
+    dpt = create_deny_provision_tool(app_id=app_id, ws_id=ws_id)
+    if dpt is not None:
+        tools.append(dpt)
 
-            dpt = create_deny_provision_tool(app_id=app_id, ws_id=ws_id)
-            if dpt is not None:
-                tools.append(dpt)
+    crrt = create_request_roles_tool(app_id=app_id, ws_id=ws_id)
+    if crrt is not None:
+        tools.append(crrt)
+    return tools
 
-            crrt = create_request_roles_tool(app_id=app_id, ws_id=ws_id)
-            if crrt is not None:
-                tools.append(crrt)
+
+def create_tool_node():
+    async def tool_node(state, config: RunnableConfig):
+        tools = request_tools(config)
+        ws_id = data_context(config).get(WS_ID_KEY)
+        app_id = state.get("app_id", None)
+        if app_id is not None:
+            # the app's tools are created out of its data in the database, off the loop
+            tools += await asyncio.to_thread(_app_tools, app_id, ws_id)
 
         """This runs tools in the graph
         It takes in an agent action and calls that tool and returns the result."""
@@ -78,8 +97,10 @@ def create_tool_node(tools, ws_id):
             tool=tool_name,
             tool_input=tool_input,
         )
-        # We call the tool_executor and get back a response
-        response = tool_executor.invoke(action)
+        # We call the tool_executor and get back a response, the tool's
+        # transactions commit as they exit (see app.sql.unit_of_work)
+        with unit_of_work():
+            response = await tool_executor.ainvoke(action)
         # We use the response to create a ToolMessage
         tool_message = ToolMessage(
             content=f"{tool_name} response: {str(response)}", name=action.tool
@@ -133,33 +154,13 @@ class _Condition_Edge:
         self.conditional_edge_mapping = conditional_edge_mapping
 
 
-def base_nodes(
-    base_tools,
-    ret_tool,
-    data_context: dict[str, Any] = {},
-) -> list[_Node]:
+def base_nodes() -> list[_Node]:
     return [
-        _Node(name="entry_point", action=entry_point_node(data_context=data_context)),
-        _Node(
-            name=DATA_OWNER_AGENT_NODE,
-            action=create_data_owner_node(data_context=data_context),
-        ),
-        _Node(
-            name=INFORMATION_AGENT_NAME,
-            action=create_info_gatherer_node(data_context=data_context),
-        ),
-        _Node(
-            name=RECOMMENDER_AGENT_NAME,
-            action=create_recommendation_node(
-                data_context=data_context, ret_tool=ret_tool
-            ),
-        ),
-        _Node(
-            name="call_tool",
-            action=create_tool_node(
-                tools=base_tools + [ret_tool], ws_id=data_context.get(WS_ID_KEY)
-            ),
-        ),
+        _Node(name="entry_point", action=entry_point_node()),
+        _Node(name=DATA_OWNER_AGENT_NODE, action=create_data_owner_node()),
+        _Node(name=INFORMATION_AGENT_NAME, action=create_info_gatherer_node()),
+        _Node(name=RECOMMENDER_AGENT_NAME, action=create_recommendation_node()),
+        _Node(name="call_tool", action=create_tool_node()),
     ]
 
 
@@ -215,31 +216,17 @@ def base_edges() -> list[_Condition_Edge]:
 
 
 def create_graph(
-    tools: list[BaseTool],
-    retriever: BaseRetriever,
-    data_context: dict[str, Any] = {},
     state=GraphState,
     nodes: list[_Node] = None,
     edges: list[_Condition_Edge] = None,
     entry_point_node_name="entry_point",
     checkpointer: BaseCheckpointSaver = None,
-):
-    ret_tool = create_retriever_tool(
-        retriever=retriever,
-        name="recommend_access",
-        description="Searches and returns documents in order to recommend access to the user.",
-        document_prompt=PromptTemplate.from_template(
-            "{page_content}\n**directory**: {directory}"
-        ),
-    )
-
+) -> CompiledStateGraph:
     # add nodes
     workflow = StateGraph(state)
 
     if nodes is None:
-        nodes = base_nodes(
-            base_tools=tools, data_context=data_context, ret_tool=ret_tool
-        )
+        nodes = base_nodes()
 
     for node in nodes:
         workflow.add_node(node.name, node.action)
@@ -260,3 +247,39 @@ def create_graph(
     graph = workflow.compile(checkpointer=checkpointer)
 
     return graph
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_graph(checkpointer: BaseCheckpointSaver = None) -> CompiledStateGraph:
+    """
+    The access request graph, compiled once per process (and checkpointer). What
+    differs per request is passed in the run's config, see graph_config.
+    """
+    return create_graph(checkpointer=checkpointer)
+
+
+def graph_config(
+    thread_id: str,
+    workspace_id: str,
+    tools: list[BaseTool],
+    retriever: BaseRetriever,
+    data_context: dict[str, Any],
+) -> RunnableConfig:
+    """The config to run the compiled graph with for a conversation turn"""
+    ret_tool = create_retriever_tool(
+        retriever=retriever,
+        name="recommend_access",
+        description="Searches and returns documents in order to recommend access to the user.",
+        document_prompt=PromptTemplate.from_template(
+            "{page_content}\n**directory**: {directory}"
+        ),
+    )
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "workspace_id": workspace_id,
+            DATA_CONTEXT_KEY: data_context,
+            TOOLS_KEY: tools,
+            RETRIEVER_TOOL_KEY: ret_tool,
+        }
+    }
@@ -67,7 +67,7 @@ def on_topic_guard():
 
 async def topical_guardrail(user_request) -> Valid:
     guard = on_topic_guard()
-    output = guard.invoke({MEMORY_KEY: user_request})
+    output = await guard.ainvoke({MEMORY_KEY: user_request})
     result = _parser.invoke(output)
 
     return result
@@ -2,13 +2,17 @@ import asyncio
 import functools
 import json
 from types import coroutine
+from typing import Any
 
 from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
 
 from app.llm.guardrails.on_topic import topical_guardrail
 from app.llm.tools.deny_access_tool import create_deny_provision_tool
 from app.models import ConversationTypes
 from app.settings import settings
+from app.sql import unit_of_work
 
 from .agents import create_agent
 from .prompts import (
@@ -34,11 +38,34 @@ CONVERSATION_TYPE_KEY = "conv_type"
 CONV_TYPE_DATA_OWNER = ConversationTypes.data_owner.value
 CONV_TYPE_INFO = ConversationTypes.recommendation.value
 CONV_TYPE_FAILED_GUARD = "FAILED_GUARD"
-
-
-def agent_node(state, agent_creator, name):
-    agent = agent_creator(state)
-    result = asyncio.new_event_loop().run_until_complete(agent.ainvoke(state))
+# the graph is compiled once, what differs per request comes in the configurable
+# part of the run's config under these keys (see graph.graph_config)
+DATA_CONTEXT_KEY = "data_context"
+TOOLS_KEY = "tools"
+RETRIEVER_TOOL_KEY = "retriever_tool"
+
+
+def data_context(config: RunnableConfig) -> dict[str, Any]:
+    """The values of the request (user email, workspace, conversation...)"""
+    return config["configurable"].get(DATA_CONTEXT_KEY, {})
+
+
+def request_tools(config: RunnableConfig) -> list[BaseTool]:
+    """The tools of the request's workspace and its retriever tool"""
+    tools = list(config["configurable"].get(TOOLS_KEY, []))
+    ret_tool = config["configurable"].get(RETRIEVER_TOOL_KEY)
+    if ret_tool is not None:
+        tools.append(ret_tool)
+    return tools
+
+
+async def agent_node(state, config: RunnableConfig, agent_creator, name):
+    # the step's tools run in one unit of work (see app.sql.unit_of_work), each of
+    # their transactions commits when it exits
+    with unit_of_work():
+        # creating the agent looks its tools' data up in the database, off the loop
+        agent = await asyncio.to_thread(agent_creator, state, config)
+        result = await agent.ainvoke(state)
     # We convert the agent output into a format that is suitable to append to the global state
     if isinstance(result, ToolMessage):
         pass
@@ -51,17 +78,14 @@ def agent_node(state, agent_creator, name):
     }
 
 
-def create_data_owner_node(data_context):
-    def agent_creator(state):
+def create_data_owner_node():
+    def agent_creator(state, config: RunnableConfig):
+        dctx = data_context(config)
         app_id = state.get("app_id", None)
-        prt = create_provision_role_tool(
-            app_id=app_id, ws_id=data_context.get(WS_ID_KEY)
-        )
-        dpt = create_deny_provision_tool(
-            app_id=app_id, ws_id=data_context.get(WS_ID_KEY)
-        )
+        prt = create_provision_role_tool(app_id=app_id, ws_id=dctx.get(WS_ID_KEY))
+        dpt = create_deny_provision_tool(app_id=app_id, ws_id=dctx.get(WS_ID_KEY))
         do_agent = create_agent(
-            prompt=get_prompt(prompt_id=DATA_OWNER_TEMPLATE, data_context=data_context),
+            prompt=get_prompt(prompt_id=DATA_OWNER_TEMPLATE, data_context=dctx),
             tools=[prt, dpt],
             name=DATA_OWNER_AGENT_NODE,
         )
@@ -75,13 +99,12 @@ def create_data_owner_node(data_context):
     return data_owner_node
 
 
-def create_info_gatherer_node(data_context):
-    def agent_creator(state):
+def create_info_gatherer_node():
+    def agent_creator(state, config: RunnableConfig):
+        dctx = data_context(config)
         app_id = state.get("app_id", None)
-        rrt = create_request_roles_tool(
-            app_id=app_id, ws_id=data_context.get(WS_ID_KEY)
-        )
-        _dctx = data_context.copy()
+        rrt = create_request_roles_tool(app_id=app_id, ws_id=dctx.get(WS_ID_KEY))
+        _dctx = dctx.copy()
         _dctx[EXTRA_INSTRUCTIONS_KEY] = state[EXTRA_INSTRUCTIONS_KEY]
         info_agent = create_agent(
             prompt=get_prompt(prompt_id=INFO_AGENT_TEMPLATE, data_context=_dctx),
@@ -98,16 +121,15 @@ def create_info_gatherer_node(data_context):
     return info_gatherer_node
 
 
-def create_recommend_agent(data_context, ret_tool):
-    def agent_creator(state):
-        _dctx = data_context.copy()
+def create_recommend_agent():
+    def agent_creator(state, config: RunnableConfig):
+        dctx = data_context(config)
+        _dctx = dctx.copy()
         _dctx[APP_NAME_KEY] = state[APP_NAME_KEY]
         _dctx[EXTRA_INSTRUCTIONS_KEY] = state[EXTRA_INSTRUCTIONS_KEY]
         agent = create_agent(
-            prompt=get_prompt(
-                prompt_id=RECOMMENDATION_TEMPLATE, data_context=data_context
-            ),
-            tools=[ret_tool],
+            prompt=get_prompt(prompt_id=RECOMMENDATION_TEMPLATE, data_context=dctx),
+            tools=[config["configurable"][RETRIEVER_TOOL_KEY]],
             name=RECOMMENDER_AGENT_NAME,
         )
         return agent
@@ -115,8 +137,8 @@ def create_recommend_agent(data_context, ret_tool):
     return agent_creator
 
 
-def create_recommendation_node(data_context, ret_tool):
-    rec_agent = create_recommend_agent(data_context=data_context, ret_tool=ret_tool)
+def create_recommendation_node():
+    rec_agent = create_recommend_agent()
     recommendation_node = functools.partial(
         agent_node, agent_creator=rec_agent, name=RECOMMENDER_AGENT_NAME
     )
@@ -145,10 +167,10 @@ async def execute_chat_with_guardrail(runnable: coroutine, input):
             await asyncio.sleep(0.2)
 
 
-def entry_point_node(data_context):
-    def _epn(state):
+def entry_point_node():
+    async def _epn(state, config: RunnableConfig):
         agent = create_agent(
-            prompt=get_prompt(prompt_id=ENTRY_POINT, data_context=data_context),
+            prompt=get_prompt(prompt_id=ENTRY_POINT, data_context=data_context(config)),
             tools=[find_app_extra_inst_tool],
             name="entry_point",
             streaming=False,
@@ -157,9 +179,8 @@ def entry_point_node(data_context):
 
         corou = agent.ainvoke(state)
         input = state[MEMORY_KEY][-15:]
-        result, ok = asyncio.new_event_loop().run_until_complete(
-            execute_chat_with_guardrail(runnable=corou, input=input)
-        )
+        with unit_of_work():
+            result, ok = await execute_chat_with_guardrail(runnable=corou, input=input)
 
         output = result["output"]
 
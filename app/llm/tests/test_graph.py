@@ -0,0 +1,121 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.llm.graph import compiled_graph, graph_config
+from app.llm.guardrails.on_topic import Valid
+from app.llm.nodes import (
+    CONV_TYPE_INFO,
+    CONVERSATION_TYPE_KEY,
+    INFORMATION_AGENT_NAME,
+    data_context,
+    request_tools,
+)
+from app.llm.prompts import APP_ID_KEY, APP_NAME_KEY, MEMORY_KEY, WS_ID_KEY
+
+
+class _Retriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return []
+
+
+@tool
+def lookup(name: str) -> str:
+    """Looks name up"""
+    return f"found {name}"
+
+
+def _config(ws_id: str) -> dict:
+    return graph_config(
+        thread_id="t1",
+        workspace_id=ws_id,
+        tools=[lookup],
+        retriever=_Retriever(),
+        data_context={WS_ID_KEY: ws_id},
+    )
+
+
+class TestGraph:
+    def test_compiled_once(self):
+        checkpointer = MemorySaver()
+        graph = compiled_graph(checkpointer)
+        assert compiled_graph(checkpointer) is graph
+        assert graph.checkpointer is checkpointer
+        assert compiled_graph(MemorySaver()) is not graph
+
+    def test_request_values_from_config(self):
+        config = _config("ws1")
+        assert config["configurable"]["thread_id"] == "t1"
+        assert config["configurable"]["workspace_id"] == "ws1"
+        assert data_context(config) == {WS_ID_KEY: "ws1"}
+        assert [t.name for t in request_tools(config)] == [
+            "lookup",
+            "recommend_access",
+        ]
+        # tools are not shared between requests
+        request_tools(config).append(lookup)
+        assert len(request_tools(config)) == 2
+
+
+class _Agent:
+    def __init__(self, name: str, loops: list):
+        self.name = name
+        self.loops = loops
+
+    async def ainvoke(self, state):
+        self.loops.append(asyncio.get_running_loop())
+        if self.name == "entry_point":
+            return {"output": {APP_ID_KEY: None, APP_NAME_KEY: None}}
+        return {"output": f"{self.name} answered"}
+
+
+class TestNodes:
+    def test_turn_on_callers_loop(self, monkeypatch):
+        loops = []
+
+        async def guardrail(input):
+            loops.append(asyncio.get_running_loop())
+            return Valid(is_valid=True, why="on topic")
+
+        monkeypatch.setattr(
+            "app.llm.nodes.create_agent",
+            lambda name, **kwargs: _Agent(name, loops),
+        )
+        monkeypatch.setattr("app.llm.nodes.topical_guardrail", guardrail)
+        monkeypatch.setattr(
+            "app.llm.nodes.create_request_roles_tool", lambda **kwargs: None
+        )
+
+        graph = compiled_graph(MemorySaver())
+        config = _config("ws1")
+        loop = asyncio.new_event_loop()
+        created = []
+        init = asyncio.BaseEventLoop.__init__
+        monkeypatch.setattr(
+            asyncio.BaseEventLoop,
+            "__init__",
+            lambda self: created.append(self) or init(self),
+        )
+        try:
+            for turn in range(2):
+                result = loop.run_until_complete(
+                    graph.ainvoke(
+                        {
+                            MEMORY_KEY: [HumanMessage(content=f"hi {turn}")],
+                            CONVERSATION_TYPE_KEY: CONV_TYPE_INFO,
+                        },
+                        config,
+                    )
+                )
+        finally:
+            loop.close()
+
+        assert result[MEMORY_KEY][-1].content == f"{INFORMATION_AGENT_NAME} answered"
+        assert len(result[MEMORY_KEY]) == 4
+        # the entry point, the guardrail and the information agent, every turn
+        assert len(loops) == 6
+        assert all(running is loop for running in loops)
+        assert created == []
@@ -83,36 +83,42 @@ async def _request_roles(
     dir_store = factory_dir_store()
     app_store = factory_app_store()
     conv_store = factory_conversation_store()
+    # no transaction is held while the rule engine, the provisioner and the ticket
+    # system are called, the lookups and each write below commit on their own
     with SQLAlchemyTransactionContext().manage() as tx_context:
         dir = dir_store.get_by_name(
             name=directory, workspace_id=workspace_id, tx_context=tx_context
         )
-
         if dir is None:
             return "request failed, use recommender"
 
         ws = ws_store.get_by_id(workspace_id=workspace_id, tx_context=tx_context)
-        if ws is not None:
-            app = app_store.get_by_name(
+        app = (
+            app_store.get_by_name(
                 app_name=app_name, workspace_id=workspace_id, tx_context=tx_context
             )
+            if ws is not None
+            else None
+        )
 
-            if app is None:
-                return "use recommender"
+    if ws is not None:
+        if app is None:
+            return "use recommender"
 
-            try:
-                answer = await should_auto_approve(
-                    ws=ws, dir=dir, app=app, user_email=user_email, **kwargs
+        try:
+            answer = await should_auto_approve(
+                ws=ws, dir=dir, app=app, user_email=user_email, **kwargs
+            )
+            if answer.final_answer == FinalAnswer.approve:
+                logger.debug(f"access approved automatically because: {answer.why}")
+                success = await provision_role(
+                    directory=dir,
+                    workspace_id=ws.id,
+                    requester_email=user_email,
+                    **kwargs,
                 )
-                if answer.final_answer == FinalAnswer.approve:
-                    logger.debug(f"access approved automatically because: {answer.why}")
-                    success = await provision_role(
-                        directory=dir,
-                        workspace_id=ws.id,
-                        requester_email=user_email,
-                        **kwargs,
-                    )
-                    if success:
+                if success:
+                    with SQLAlchemyTransactionContext().manage() as tx_context:
                         update_conv(
                             conv_store=conv_store,
                             status=ConversationStatuses.approved.value,
@@ -121,29 +127,28 @@ async def _request_roles(
                             conversation_id=conversation_id,
                             tx_context=tx_context,
                         )
-                        return "access approved automatically"
-                    else:
-                        raise ToolException(
-                            "failed to provision access for unknown reason"
-                        )
+                    return "access approved automatically"
+                else:
+                    raise ToolException("failed to provision access for unknown reason")
 
-                owner = await get_data_owner(
-                    ws=ws, app_name=app_name, directory=dir, **kwargs
-                )
-                ticket_id = await make_request(
-                    ws=ws,
-                    owner=owner,
-                    output=output,
-                    app_name=app_name,
-                    requester=current_user,
-                    conversation_id=conversation_id,
-                    conv_summary=conv_summary,
-                    conv_lang=conv_lang,
-                    **kwargs,
-                )
-            except Exception as err:
-                raise ToolException(f"failed to open a ticket: {err}")
+            owner = await get_data_owner(
+                ws=ws, app_name=app_name, directory=dir, **kwargs
+            )
+            ticket_id = await make_request(
+                ws=ws,
+                owner=owner,
+                output=output,
+                app_name=app_name,
+                requester=current_user,
+                conversation_id=conversation_id,
+                conv_summary=conv_summary,
+                conv_lang=conv_lang,
+                **kwargs,
+            )
+        except Exception as err:
+            raise ToolException(f"failed to open a ticket: {err}")
 
+    with SQLAlchemyTransactionContext().manage() as tx_context:
         # create new conversation for data owner
         do_conv = Conversation(
             workspace_id=workspace_id,
@@ -62,38 +62,39 @@ async def _provision_role(
         dir = dir_store.get_by_name(
             name=directory, workspace_id=workspace_id, tx_context=tx_context
         )
+    if dir is None:
+        raise ToolException(f"unknown directory: {directory}")
+
+    # the provisioner is called outside of any transaction, the approval is
+    # committed on its own once it succeeded
+    try:
+        success = await provision_role(
+            directory=dir,
+            requester_email=requester_email,
+            workspace_id=workspace_id,
+            **kwargs,
+        )
+        if success is False:
+            raise ToolException("unknown error")
+    except Exception as err:
+        raise ToolException(f"failed to provision role: {err}")
 
-        if dir is not None:
-            try:
-                success = await provision_role(
-                    directory=dir,
-                    requester_email=requester_email,
-                    workspace_id=workspace_id,
-                    **kwargs,
-                )
-                if success is False:
-                    raise ToolException("unknown error")
-            except Exception as err:
-                raise ToolException(f"failed to provision role: {err}")
-
-            # update current request to approved
-            update_conv(
-                conv_store=conv_store,
-                status=ConversationStatuses.approved.value,
-                conv_summary=create_summary(
-                    conv_summary=conv_summary,
-                    requester_email=requester_email,
-                    app_name=app_name,
-                    directory=directory,
-                    **kwargs,
-                ),
-                workspace_id=workspace_id,
-                conversation_id=conversation_id,
-                tx_context=tx_context,
-            )
-
-        else:
-            raise ToolException(f"unknown directory: {directory}")
+    # update current request to approved
+    with SQLAlchemyTransactionContext().manage() as tx_context:
+        update_conv(
+            conv_store=conv_store,
+            status=ConversationStatuses.approved.value,
+            conv_summary=create_summary(
+                conv_summary=conv_summary,
+                requester_email=requester_email,
+                app_name=app_name,
+                directory=directory,
+                **kwargs,
+            ),
+            workspace_id=workspace_id,
+            conversation_id=conversation_id,
+            tx_context=tx_context,
+        )
 
     return f"role approved for {requester_email} successfully"
 
@@ -1,15 +1,24 @@
 import logging
+import threading
 from contextlib import asynccontextmanager
 
 import injector
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, Request
 
 from app.routers import directories
 
+from .auth import auth_api
+from .checkpoint_retention import CheckpointCompactor
+from .event_loop import bind_main_loop
 from .injector_extensions_module import ExtensionModule
 from .injector_main_module import MainModule
+from .llm.graph import compiled_graph
+from .models_stores import CheckpointStore
+from .models_stores_async import AsyncCheckpointStoreSQL
 from .routers import application, content, conversation, internal, rule, workspace
 from .services import set_service_registry
+from .workspace_cache import workspace_request_scope
+from .workspace_purge import WorkspacePurger
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +29,43 @@ set_service_registry(service_registry)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.debug("Starting")
+    await auth_api.startup()
+    # conversation turns started from worker threads (Slack) run on this loop
+    bind_main_loop()
+    # workspace purges interrupted by a restart carry on in the background
+    purger = service_registry.get(WorkspacePurger)
+    threading.Thread(target=purger.resume, name="workspace-purge", daemon=True).start()
+    # the asyncio engine's connections belong to the server's event loop
+    checkpointer = service_registry.get(CheckpointStore)
+    if isinstance(checkpointer, AsyncCheckpointStoreSQL):
+        checkpointer.bind_loop()
+    # the access request graph is compiled once, before the first conversation turn
+    compiled_graph(checkpointer)
+    stop_compaction = threading.Event()
+    compactor = service_registry.get(CheckpointCompactor)
+    if compactor.interval > 0 and compactor.keep_last > 0:
+        threading.Thread(
+            target=compactor.run,
+            args=(stop_compaction,),
+            name="checkpoint-compaction",
+            daemon=True,
+        ).start()
 
     yield
     logger.debug("Stopping")
+    await auth_api.aclose()
+    stop_compaction.set()
 
 
 app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def workspace_cache_scope(request: Request, call_next):
+    with workspace_request_scope():
+        return await call_next(request)
+
+
 app.include_router(internal.router)
 
 # api routers
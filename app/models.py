@@ -63,6 +63,7 @@ class WorkspaceStatuses(enum.Enum):
     creating = "creating"
     active = "active"
     error = "error"
+    deleting = "deleting"
 
 
 class Workspace(BaseModel):
@@ -78,6 +79,30 @@ class Workspace(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
 
 
+class WorkspacePurgeStatuses(enum.Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class WorkspacePurge(BaseModel):
+    """
+    Progress of a workspace deletion, step is the next step to run and deleted counts
+    the rows removed so far per step.
+    """
+
+    workspace_id: str
+    external_id: Optional[str] = None
+    status: WorkspacePurgeStatuses = Field(default=WorkspacePurgeStatuses.pending)
+    step: str
+    deleted: dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = None
+    requested_by: CurrentUser
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: generate())
     conversation_id: str = Field(default=None)
@@ -205,7 +230,14 @@ class PartialRule(Rule, OptionalModel):
 
 
 class PaginatedListBase(BaseModel):
-    total: int
+    # only set when requested, see pagination_params
+    total: Optional[int] = Field(
+        default=None,
+        description="Number of matching items, null unless the request sent "
+        "include_total=true or an offset",
+    )
+    # opaque token of the next page, absent on the last page
+    next_cursor: Optional[str] = None
 
 
 class PatchOperation(BaseModel):
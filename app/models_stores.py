@@ -4,6 +4,7 @@ from typing import Any, List, Optional
 from fastapi import BackgroundTasks
 from langgraph.checkpoint.base import BaseCheckpointSaver
 
+from .counts import CountModes
 from .models import (
     Application,
     ChatMessage,
@@ -15,9 +16,11 @@ from .models import (
     Rule,
     User,
     Workspace,
+    WorkspacePurge,
     WorkspaceStatuses,
 )
 from .tx import TransactionContext
+from .workspace_cache import WorkspaceCache
 
 
 class WorkspaceStore(ABC):
@@ -119,14 +122,40 @@ class WorkspaceStoreHooksPass(WorkspaceStoreHooks):
 
 
 class WorkspaceStoreProxy:
-    def __init__(self, store: WorkspaceStore, hooks: WorkspaceStoreHooks):
+    def __init__(
+        self,
+        store: WorkspaceStore,
+        hooks: WorkspaceStoreHooks,
+        cache: Optional[WorkspaceCache] = None,
+    ):
         self._store = store
         self._hooks = hooks
+        self._cache = cache
 
     def get_by_id(
         self, workspace_id: str, tx_context: TransactionContext
     ) -> Optional[Workspace]:
-        return self._store.get_by_id(workspace_id, tx_context)
+        if self._cache is None:
+            return self._store.get_by_id(workspace_id, tx_context)
+
+        workspace = self._cache.get(workspace_id)
+        if workspace is not None:
+            return workspace
+
+        workspace = self._store.get_by_id(workspace_id, tx_context)
+        if workspace is not None:
+            self._cache.put(workspace)
+        return workspace
+
+    def _invalidate(self, workspace: Workspace, tx_context: TransactionContext):
+        """
+        Drops the workspace written by the transaction, now for the reads that follow
+        in it and once it is over for what concurrent reads cached meanwhile
+        """
+        if self._cache is None:
+            return
+        self._cache.invalidate(workspace)
+        tx_context.after_transaction(lambda: self._cache.invalidate(workspace))
 
     def insert(
         self,
@@ -154,7 +183,9 @@ class WorkspaceStoreProxy:
         workspace: Workspace,
         tx_context: TransactionContext,
     ) -> Workspace:
-        return self._store.update(workspace=workspace, tx_context=tx_context)
+        updated = self._store.update(workspace=workspace, tx_context=tx_context)
+        self._invalidate(workspace, tx_context)
+        return updated
 
     def delete(
         self,
@@ -176,6 +207,7 @@ class WorkspaceStoreProxy:
             background_tasks=background_tasks,
             tx_context=tx_context,
         )
+        self._invalidate(workspace, tx_context)
 
         if self._hooks:
             self._hooks.post_delete(
@@ -188,6 +220,40 @@ class WorkspaceStoreProxy:
         return result
 
 
+class WorkspacePurgeStore(ABC):
+    @abstractmethod
+    def get(
+        self, workspace_id: str, tx_context: TransactionContext
+    ) -> Optional[WorkspacePurge]:
+        pass
+
+    @abstractmethod
+    def insert(
+        self, purge: WorkspacePurge, tx_context: TransactionContext
+    ) -> WorkspacePurge:
+        pass
+
+    @abstractmethod
+    def update(
+        self, purge: WorkspacePurge, tx_context: TransactionContext
+    ) -> WorkspacePurge:
+        pass
+
+    @abstractmethod
+    def claim(
+        self, workspace_id: str, stale_after: int, tx_context: TransactionContext
+    ) -> Optional[WorkspacePurge]:
+        """
+        Marks the purge as running if it is pending or it is running but was not
+        updated for stale_after seconds, returns None when someone else owns it.
+        """
+        pass
+
+    @abstractmethod
+    def list_unfinished(self, tx_context: TransactionContext) -> list[WorkspacePurge]:
+        pass
+
+
 class UserStore(ABC):
     @abstractmethod
     def get_by_email(self, email: str) -> Optional[User]:
@@ -205,6 +271,9 @@ class UserStore(ABC):
 
 
 class ConversationStore(ABC):
+    # the attributes list cursors are made of, newest first
+    cursor_keys: tuple[str, ...] = ("created_at", "id")
+
     @abstractmethod
     def get_by_id(
         self,
@@ -235,7 +304,11 @@ class ConversationStore(ABC):
         filters: dict[str, Any] = None,
         links: Optional[list[str]] = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialConversation], int]:
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+        messages_limit: Optional[int] = None,
+    ) -> tuple[list[PartialConversation], Optional[int]]:
         pass
 
     @abstractmethod
@@ -256,8 +329,11 @@ class ConversationStore(ABC):
 
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         pass
 
 
@@ -284,12 +360,17 @@ class ChatMessageStore(ABC):
 
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         pass
 
 
 class ApplicationStore(ABC):
+    cursor_keys: tuple[str, ...] = ("name", "id")
+
     @abstractmethod
     def list(
         self,
@@ -299,7 +380,10 @@ class ApplicationStore(ABC):
         limit=10,
         tx_context: TransactionContext = None,
         projection: List[str] = [],
-    ) -> tuple[list[Application], int]:
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[Application], Optional[int]]:
         pass
 
     @abstractmethod
@@ -337,12 +421,17 @@ class ApplicationStore(ABC):
 
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         pass
 
 
 class DirectoryStore(ABC):
+    cursor_keys: tuple[str, ...] = ("name", "id")
+
     @abstractmethod
     def get_by_id(
         self, directory_id: str, workspace_id: str, tx_context: TransactionContext
@@ -377,7 +466,10 @@ class DirectoryStore(ABC):
         limit=10,
         projection: List[str] = [],
         tx_context: TransactionContext = None,
-    ) -> tuple[list[Directory], int]:
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[Directory], Optional[int]]:
         pass
 
     @abstractmethod
@@ -390,12 +482,17 @@ class DirectoryStore(ABC):
 
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         pass
 
 
 class RuleStore(ABC):
+    cursor_keys: tuple[str, ...] = ("created_at", "id")
+
     @abstractmethod
     def list(
         self,
@@ -405,7 +502,10 @@ class RuleStore(ABC):
         limit=10,
         tx_context: TransactionContext = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialRule], int]:
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialRule], Optional[int]]:
         pass
 
     @abstractmethod
@@ -437,14 +537,50 @@ class RuleStore(ABC):
 
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         pass
 
 
 class CheckpointStore(BaseCheckpointSaver):
     @abstractmethod
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    def compact_thread(
+        self,
+        workspace_id: str,
+        thread_id: str,
+        keep_last: int,
+        tx_context: TransactionContext,
+    ) -> dict[str, int]:
+        """
+        Keeps the thread's keep_last newest checkpoints plus the latest of every
+        namespace and the pending writes of those latest ones only. Returns the number
+        of deleted checkpoints and writes and the bytes they took.
+        """
+        pass
+
+    @abstractmethod
+    def list_compactable_threads(
+        self,
+        keep_last: int,
+        after: Optional[tuple[str, str]],
+        limit: int,
+        tx_context: TransactionContext,
+    ) -> list[tuple[str, str]]:
+        """
+        The (workspace_id, thread_id) of threads with more than keep_last
+        checkpoints or with writes of superseded checkpoints, in order, after the
+        given one.
+        """
         pass
@@ -0,0 +1,553 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple, TypeVar
+
+from fastapi import BackgroundTasks
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from sqlalchemy import Row, Select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .checkpoint_cache import LatestCheckpointCache
+from .counts import CountModes
+from .models import (
+    Application,
+    ChatMessage,
+    Conversation,
+    CurrentUser,
+    Directory,
+    PartialApplication,
+    PartialConversation,
+    PartialDirectory,
+    PartialRule,
+    Rule,
+    Workspace,
+)
+from .models_stores import (
+    ApplicationStore,
+    ChatMessageStore,
+    ConversationStore,
+    DirectoryStore,
+    RuleStore,
+    WorkspaceStore,
+)
+from .models_stores_sql import LIST_BATCH_SIZE, CheckpointStoreSQL
+from .sql import ConnectionTransactionContext
+from .tx import AsyncTransactionContext
+
+T = TypeVar("T")
+
+
+class AsyncStore:
+    """
+    Asyncio variant of a store, runs the sync store on the sync facade of an
+    AsyncConnection so the event loop is never blocked on the database.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    @property
+    def sync_store(self):
+        return self._store
+
+    async def _run(
+        self,
+        tx_context: AsyncTransactionContext,
+        method: Callable[..., T],
+        *args,
+        **kwargs,
+    ) -> T:
+        def _call(connection):
+            return method(
+                *args,
+                tx_context=ConnectionTransactionContext(connection, owner=tx_context),
+                **kwargs,
+            )
+
+        return await tx_context.connection.run_sync(_call)
+
+
+class AsyncWorkspaceStore(AsyncStore):
+    _store: WorkspaceStore
+
+    async def get_by_id(
+        self, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Workspace]:
+        return await self._run(tx_context, self._store.get_by_id, workspace_id)
+
+    async def insert(
+        self,
+        workspace: Workspace,
+        current_user: CurrentUser,
+        background_tasks: BackgroundTasks,
+        tx_context: AsyncTransactionContext,
+    ) -> Workspace:
+        return await self._run(
+            tx_context,
+            self._store.insert,
+            workspace=workspace,
+            current_user=current_user,
+            background_tasks=background_tasks,
+        )
+
+    async def update(
+        self, workspace: Workspace, tx_context: AsyncTransactionContext
+    ) -> Workspace:
+        return await self._run(tx_context, self._store.update, workspace=workspace)
+
+    async def delete(
+        self,
+        workspace: Workspace,
+        current_user: CurrentUser,
+        background_tasks: BackgroundTasks,
+        tx_context: AsyncTransactionContext,
+    ):
+        return await self._run(
+            tx_context,
+            self._store.delete,
+            workspace=workspace,
+            current_user=current_user,
+            background_tasks=background_tasks,
+        )
+
+
+class AsyncConversationStore(AsyncStore):
+    _store: ConversationStore
+
+    @property
+    def cursor_keys(self) -> tuple[str, ...]:
+        return self._store.cursor_keys
+
+    async def get_by_id(
+        self,
+        workspace_id: str,
+        conversation_id: str,
+        tx_context: AsyncTransactionContext,
+        links: Optional[list[str]] = None,
+    ) -> Optional[Conversation]:
+        return await self._run(
+            tx_context,
+            self._store.get_by_id,
+            workspace_id=workspace_id,
+            conversation_id=conversation_id,
+            links=links,
+        )
+
+    async def get_by_external_id(
+        self,
+        workspace_id: str,
+        external_id: str,
+        tx_context: AsyncTransactionContext,
+        links: Optional[list[str]] = None,
+    ) -> Optional[Conversation]:
+        return await self._run(
+            tx_context,
+            self._store.get_by_external_id,
+            workspace_id=workspace_id,
+            external_id=external_id,
+            links=links,
+        )
+
+    async def list(
+        self,
+        workspace_id: str,
+        tx_context: AsyncTransactionContext,
+        limit: int = 10,
+        offset: int = 0,
+        filters: dict[str, Any] = None,
+        links: Optional[list[str]] = None,
+        projection: List[str] = [],
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+        messages_limit: Optional[int] = None,
+    ) -> tuple[list[PartialConversation], Optional[int]]:
+        return await self._run(
+            tx_context,
+            self._store.list,
+            workspace_id=workspace_id,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+            links=links,
+            projection=projection,
+            cursor=cursor,
+            include_total=include_total,
+            total_mode=total_mode,
+            messages_limit=messages_limit,
+        )
+
+    async def insert(
+        self, conversation: Conversation, tx_context: AsyncTransactionContext
+    ) -> Conversation:
+        return await self._run(tx_context, self._store.insert, conversation)
+
+    async def update(
+        self,
+        workspace_id: str,
+        conversation_id: str,
+        updates: dict[str, Any],
+        tx_context: AsyncTransactionContext,
+    ) -> Conversation:
+        return await self._run(
+            tx_context,
+            self._store.update,
+            workspace_id=workspace_id,
+            conversation_id=conversation_id,
+            updates=updates,
+        )
+
+
+class AsyncChatMessageStore(AsyncStore):
+    _store: ChatMessageStore
+
+    async def list(
+        self,
+        filter=None,
+        offset=0,
+        limit=10,
+        tx_context: AsyncTransactionContext = None,
+    ) -> list[ChatMessage]:
+        return await self._run(
+            tx_context, self._store.list, filter=filter, offset=offset, limit=limit
+        )
+
+    async def insert(
+        self, message: ChatMessage, tx_context: AsyncTransactionContext
+    ) -> ChatMessage:
+        return await self._run(tx_context, self._store.insert, message)
+
+
+class AsyncApplicationStore(AsyncStore):
+    _store: ApplicationStore
+
+    @property
+    def cursor_keys(self) -> tuple[str, ...]:
+        return self._store.cursor_keys
+
+    async def list(
+        self,
+        workspace_id: str,
+        filters: dict[str, Any] = None,
+        offset=0,
+        limit=10,
+        tx_context: AsyncTransactionContext = None,
+        projection: List[str] = [],
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialApplication], Optional[int]]:
+        return await self._run(
+            tx_context,
+            self._store.list,
+            workspace_id=workspace_id,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+            projection=projection,
+            cursor=cursor,
+            include_total=include_total,
+            total_mode=total_mode,
+        )
+
+    async def get_by_id(
+        self, app_id: str, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Application]:
+        return await self._run(tx_context, self._store.get_by_id, app_id, workspace_id)
+
+    async def get_by_name(
+        self, app_name: str, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Application]:
+        return await self._run(
+            tx_context, self._store.get_by_name, app_name, workspace_id
+        )
+
+    async def update(
+        self, application: Application, tx_context: AsyncTransactionContext
+    ) -> Application:
+        return await self._run(tx_context, self._store.update, application=application)
+
+    async def insert(
+        self, app: Application, tx_context: AsyncTransactionContext
+    ) -> Application:
+        return await self._run(tx_context, self._store.insert, app)
+
+    async def delete(
+        self, workspace_id: str, app_id: str, tx_context: AsyncTransactionContext
+    ):
+        return await self._run(
+            tx_context, self._store.delete, workspace_id=workspace_id, app_id=app_id
+        )
+
+
+class AsyncDirectoryStore(AsyncStore):
+    _store: DirectoryStore
+
+    @property
+    def cursor_keys(self) -> tuple[str, ...]:
+        return self._store.cursor_keys
+
+    async def get_by_id(
+        self, directory_id: str, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Directory]:
+        return await self._run(
+            tx_context, self._store.get_by_id, directory_id, workspace_id
+        )
+
+    async def get_by_name(
+        self, name: str, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Directory]:
+        return await self._run(
+            tx_context, self._store.get_by_name, workspace_id=workspace_id, name=name
+        )
+
+    async def insert(
+        self, directory: Directory, tx_context: AsyncTransactionContext
+    ) -> Directory:
+        return await self._run(tx_context, self._store.insert, directory)
+
+    async def delete(
+        self, workspace_id: str, directory_id: str, tx_context: AsyncTransactionContext
+    ):
+        return await self._run(
+            tx_context,
+            self._store.delete,
+            workspace_id=workspace_id,
+            directory_id=directory_id,
+        )
+
+    async def list(
+        self,
+        workspace_id: str,
+        filters: dict[str, Any] = None,
+        offset=0,
+        limit=10,
+        projection: List[str] = [],
+        tx_context: AsyncTransactionContext = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialDirectory], Optional[int]]:
+        return await self._run(
+            tx_context,
+            self._store.list,
+            workspace_id=workspace_id,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+            projection=projection,
+            cursor=cursor,
+            include_total=include_total,
+            total_mode=total_mode,
+        )
+
+    async def update(
+        self, directory: Directory, tx_context: AsyncTransactionContext
+    ) -> Directory:
+        return await self._run(tx_context, self._store.update, directory=directory)
+
+
+class AsyncRuleStore(AsyncStore):
+    _store: RuleStore
+
+    @property
+    def cursor_keys(self) -> tuple[str, ...]:
+        return self._store.cursor_keys
+
+    async def list(
+        self,
+        workspace_id: str,
+        filters: dict[str, Any] = None,
+        offset=0,
+        limit=10,
+        tx_context: AsyncTransactionContext = None,
+        projection: List[str] = [],
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialRule], Optional[int]]:
+        return await self._run(
+            tx_context,
+            self._store.list,
+            workspace_id=workspace_id,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+            projection=projection,
+            cursor=cursor,
+            include_total=include_total,
+            total_mode=total_mode,
+        )
+
+    async def get_by_id(
+        self, rule_id: str, workspace_id: str, tx_context: AsyncTransactionContext
+    ) -> Optional[Rule]:
+        return await self._run(tx_context, self._store.get_by_id, rule_id, workspace_id)
+
+    async def update(self, rule: Rule, tx_context: AsyncTransactionContext) -> Rule:
+        return await self._run(tx_context, self._store.update, rule=rule)
+
+    async def insert(self, rule: Rule, tx_context: AsyncTransactionContext) -> Rule:
+        return await self._run(tx_context, self._store.insert, rule)
+
+    async def delete(
+        self, workspace_id: str, rule_id: str, tx_context: AsyncTransactionContext
+    ):
+        return await self._run(
+            tx_context, self._store.delete, workspace_id=workspace_id, rule_id=rule_id
+        )
+
+
+class AsyncCheckpointStoreSQL(CheckpointStoreSQL):
+    """
+    CheckpointStoreSQL on an AsyncEngine, graph steps await the database instead of
+    blocking the event loop (and the tokens of other conversations streaming on it).
+
+    Connections of an AsyncEngine belong to the event loop they were opened on, the
+    store is bound to the loop of its first use (see bind_loop), calls made on any
+    other loop run the sync store in a worker thread instead.
+
+    When offload_serde is set checkpoints are (de)serialized in a worker thread too,
+    worth it for large checkpoints, the thread hop costs more than small ones take.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        async_engine: AsyncEngine,
+        offload_serde: bool = False,
+        keep_last: int = 0,
+        serde: Optional[SerializerProtocol] = None,
+        cache: Optional[LatestCheckpointCache] = None,
+        compact_interval: int = 0,
+    ):
+        super().__init__(
+            engine=engine,
+            keep_last=keep_last,
+            serde=serde,
+            cache=cache,
+            compact_interval=compact_interval,
+        )
+        self.async_engine = async_engine
+        self.offload_serde = offload_serde
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop = loop or asyncio.get_running_loop()
+
+    def _on_loop(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            self._loop = loop
+        return loop is self._loop
+
+    async def _serde(self, fn: Callable[..., T], *args) -> T:
+        if self.offload_serde:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _blobs_async(
+        self, connection: AsyncConnection, query: Optional[Select]
+    ) -> list[Row]:
+        return (await connection.execute(query)).all() if query is not None else []
+
+    async def alist(
+        self,
+        config: RunnableConfig,
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if not self._on_loop():
+            listed = await asyncio.to_thread(
+                lambda: list(self._list(config, filter, before, limit))
+            )
+            for checkpoint_tuple in listed:
+                yield checkpoint_tuple
+            return
+
+        query = self._list_query(config, filter, before, limit)
+        listed = 0
+        async with self.async_engine.connect() as conn:
+            result = await conn.stream(query)
+            async for rows in result.partitions(LIST_BATCH_SIZE):
+                matches = await self._serde(self._matches, rows, filter)
+                blobs = self._blobs_by_key(
+                    await self._blobs_async(
+                        conn,
+                        self._blobs_query(
+                            config, [(row.checkpoint_ns, c) for row, _, c in matches]
+                        ),
+                    )
+                )
+                for row, metadata, checkpoint in matches:
+                    if limit is not None and listed >= limit:
+                        return
+                    listed += 1
+                    yield await self._serde(
+                        self._list_tuple, config, row, metadata, checkpoint, blobs
+                    )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if not self._on_loop():
+            return await asyncio.to_thread(self._get_tuple, config)
+        cached = self._cached(config)
+        async with self.async_engine.connect() as conn:
+            if cached is not None:
+                row = (await conn.execute(self._freshness_query(config, cached))).one()
+                if self._fresh(config, cached, row):
+                    return cached
+            rows = (await conn.execute(self._tuple_query(config))).all()
+            if not rows:
+                return None
+            checkpoint = await self._serde(self.serde.loads, rows[0].checkpoint)
+            blobs = await self._blobs_async(
+                conn,
+                self._blobs_query(config, [(rows[0].checkpoint_ns, checkpoint)]),
+            )
+        checkpoint_tuple = await self._serde(
+            self._rows_tuple, config, rows, checkpoint, blobs
+        )
+        self._cache_loaded(config, rows, blobs, checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        if not self._on_loop():
+            return await asyncio.to_thread(
+                self._put, config, checkpoint, metadata, new_versions
+            )
+        record, blobs, saved = await self._serde(
+            self._checkpoint_record, config, checkpoint, metadata, new_versions
+        )
+        async with self.async_engine.begin() as conn:
+            if blobs:
+                await conn.execute(self.blobs.insert(), blobs)
+            await conn.execute(self.checkpoints.insert(), record)
+            if self._should_retain(saved):
+                await conn.run_sync(self._retain, saved)
+        self._cache_saved(checkpoint, metadata, record, blobs, saved)
+        return saved
+
+    async def aput_writes(
+        self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str
+    ) -> None:
+        if not self._on_loop():
+            return await asyncio.to_thread(self._put_writes, config, writes, task_id)
+        records = await self._serde(self._writes_records, config, writes, task_id)
+        async with self.async_engine.begin() as conn:
+            await conn.execute(self.writes.insert().values(records))
+        self._cache_writes(config, records, writes)
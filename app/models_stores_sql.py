@@ -1,6 +1,10 @@
-from typing import Any, AsyncIterator, List, Optional, Tuple
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple, Union
 
 import sqlalchemy
+from cachetools import TTLCache
 from fastapi import BackgroundTasks, HTTPException
 from langchain_core.runnables import ConfigurableFieldSpec, RunnableConfig
 from langgraph.checkpoint.base import (
@@ -10,6 +14,7 @@ from langgraph.checkpoint.base import (
     CheckpointThreadId,
     CheckpointTuple,
 )
+from langgraph.checkpoint.serde.base import SerializerProtocol
 from sqlalchemy import (
     JSON,
     Boolean,
@@ -22,18 +27,26 @@ from sqlalchemy import (
     Integer,
     LargeBinary,
     MetaData,
+    Row,
+    Select,
     String,
     Table,
     Text,
+    Update,
+    and_,
     cast,
-    distinct,
     func,
     or_,
     select,
+    tuple_,
+    union,
 )
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
 
+from .checkpoint_cache import LatestCheckpointCache, ThreadKey
+from .checkpoint_retention import retention_metrics
+from .counts import CountModes, count_rows, invalidate_counts
 from .id import generate
 from .models import (
     RULE_MUTABLE_FIELDS,
@@ -52,6 +65,8 @@ from .models import (
     RuleTypes,
     ThenTypes,
     Workspace,
+    WorkspacePurge,
+    WorkspacePurgeStatuses,
     WorkspaceStatuses,
 )
 from .models_stores import (
@@ -62,8 +77,10 @@ from .models_stores import (
     DirectoryStore,
     RuleStore,
     TransactionContext,
+    WorkspacePurgeStore,
     WorkspaceStore,
 )
+from .pagination import paginate, with_order_columns
 
 metadata = MetaData()
 
@@ -73,9 +90,13 @@ MESSAGE_TABLE_NAME = "messages"
 APPLICATIONS_TABLE_NAME = "applications"
 CHECKPOINT_TABLE_NAME = "checkpoints"
 CHECKPOINT_WRITES_TABLE_NAME = "checkpoints_writes"
+CHECKPOINT_BLOBS_TABLE_NAME = "checkpoints_blobs"
+# checkpoints fetched per round trip when listing them
+LIST_BATCH_SIZE = 20
 DIRECTORIES_TABLE_NAME = "directories"
 RULES_TABLE_NAME = "rules"
 RULES_CONTEXT_TABLE_NAME = "rules_context"
+WORKSPACE_PURGES_TABLE_NAME = "workspace_purges"
 
 workspace_table = sqlalchemy.Table(
     WORKSPACE_TABLE_NAME,
@@ -113,6 +134,25 @@ conversation_table = sqlalchemy.Table(
 )
 
 Index("idx_conv_status", conversation_table.c.status)
+# slack looks up the conversation of every incoming message by its thread
+Index(
+    "idx_conv_ws_external_id",
+    conversation_table.c.workspace_id,
+    conversation_table.c.external_id,
+)
+# conversation lists, newest first, of admins and of a single assignee
+Index(
+    "idx_conv_ws_created",
+    conversation_table.c.workspace_id,
+    conversation_table.c.created_at,
+    conversation_table.c.id,
+)
+Index(
+    "idx_conv_ws_assignee_created",
+    conversation_table.c.workspace_id,
+    conversation_table.c.assignee,
+    conversation_table.c.created_at,
+)
 
 message_table = sqlalchemy.Table(
     MESSAGE_TABLE_NAME,
@@ -136,6 +176,12 @@ message_table = sqlalchemy.Table(
     Column("created_at", DateTime(), nullable=False),
 )
 
+Index(
+    "idx_messages_conv_created",
+    message_table.c.conversation_id,
+    message_table.c.created_at,
+)
+
 checkpoint_table = sqlalchemy.Table(
     CHECKPOINT_TABLE_NAME,
     metadata,
@@ -152,6 +198,8 @@ checkpoint_table = sqlalchemy.Table(
     Column("parent_checkpoint_id", String(), nullable=True),
     Column("checkpoint", LargeBinary()),
     Column("metadata", LargeBinary()),
+    # the scalar values of metadata, to filter on (null on rows saved before)
+    Column("metadata_fields", JSON(), nullable=True),
 )
 
 checkpoint_writes_table = sqlalchemy.Table(
@@ -172,6 +220,24 @@ checkpoint_writes_table = sqlalchemy.Table(
     Column("blob", LargeBinary()),
 )
 
+# the value of a channel as of a version, checkpoints refer to the values of their
+# channel_versions, a null blob is a channel that was emptied
+checkpoint_blobs_table = sqlalchemy.Table(
+    CHECKPOINT_BLOBS_TABLE_NAME,
+    metadata,
+    Column(
+        "workspace_id",
+        String(10),
+        ForeignKey(workspace_table.c.id),
+        primary_key=True,
+    ),
+    Column("thread_id", String(10), primary_key=True),
+    Column("checkpoint_ns", String(), primary_key=True, default=""),
+    Column("channel", String(), primary_key=True),
+    Column("version", String(), primary_key=True),
+    Column("blob", LargeBinary()),
+)
+
 directory_table = sqlalchemy.Table(
     DIRECTORIES_TABLE_NAME,
     metadata,
@@ -260,6 +326,23 @@ rules_context_table = sqlalchemy.Table(
     ),
 )
 
+Index("idx_rules_context_rule_id", rules_context_table.c.rule_id)
+
+# no foreign key, a purge outlives its workspace so its outcome can be queried
+workspace_purges_table = sqlalchemy.Table(
+    WORKSPACE_PURGES_TABLE_NAME,
+    metadata,
+    Column("workspace_id", String(10), primary_key=True),
+    Column("external_id", String(), nullable=True),
+    Column("status", Enum(WorkspacePurgeStatuses), nullable=False),
+    Column("step", String(), nullable=False),
+    Column("deleted", JSON(), nullable=False),
+    Column("error", String(), nullable=True),
+    Column("requested_by", JSON(), nullable=False),
+    Column("created_at", DateTime(), nullable=False),
+    Column("updated_at", DateTime(), nullable=False),
+)
+
 
 class WorkspaceStoreSQL(WorkspaceStore):
     default_table_name: str = WORKSPACE_TABLE_NAME
@@ -323,8 +406,10 @@ class WorkspaceStoreSQL(WorkspaceStore):
             .where(self.workspaces.c.id == workspace.id)
             .values({k: v for k, v in workspace.model_dump().items() if k != "id"})
         )
-        tx_context.connection.execute(q)
-        return workspace
+        row = update_returning(tx_context.connection, self.workspaces, q)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Workspace not found")
+        return Workspace(**row._asdict())
 
     def delete(
         self,
@@ -341,6 +426,103 @@ class WorkspaceStoreSQL(WorkspaceStore):
         return None
 
 
+class WorkspacePurgeStoreSQL(WorkspacePurgeStore):
+    default_table_name: str = WORKSPACE_PURGES_TABLE_NAME
+    metadata: MetaData
+    purges: Table
+
+    @classmethod
+    def build_table(cls, metadata: MetaData, table_name: str) -> Table:
+        return workspace_purges_table
+
+    def __init__(
+        self,
+        table_name: str = default_table_name,
+    ):
+        self.metadata = metadata
+        self.purges = self.build_table(metadata=self.metadata, table_name=table_name)
+
+    def create_tables(self, engine: Engine):
+        self.metadata.create_all(engine)
+
+    def _to_purge(self, row: Row) -> WorkspacePurge:
+        return WorkspacePurge(**row._asdict())
+
+    def get(
+        self, workspace_id: str, tx_context: TransactionContext
+    ) -> Optional[WorkspacePurge]:
+        query = (
+            self.purges.select()
+            .where(
+                (self.purges.c.workspace_id == workspace_id)
+                | (self.purges.c.external_id == workspace_id)
+            )
+            .order_by(self.purges.c.created_at.desc())
+            .limit(1)
+        )
+        row = tx_context.connection.execute(query).first()
+        if row:
+            return self._to_purge(row)
+
+    def insert(
+        self, purge: WorkspacePurge, tx_context: TransactionContext
+    ) -> WorkspacePurge:
+        handle_db_operation(
+            tx_context.connection,
+            self.purges.insert(),
+            purge.model_dump(),
+        )
+        return purge
+
+    def update(
+        self, purge: WorkspacePurge, tx_context: TransactionContext
+    ) -> WorkspacePurge:
+        purge.updated_at = datetime.now()
+        q = (
+            self.purges.update()
+            .where(self.purges.c.workspace_id == purge.workspace_id)
+            .values(purge.model_dump(exclude={"workspace_id"}))
+        )
+        row = update_returning(tx_context.connection, self.purges, q)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Workspace purge not found")
+        return self._to_purge(row)
+
+    def claim(
+        self, workspace_id: str, stale_after: int, tx_context: TransactionContext
+    ) -> Optional[WorkspacePurge]:
+        now = datetime.now()
+        q = (
+            self.purges.update()
+            .where(
+                self.purges.c.workspace_id == workspace_id,
+                (self.purges.c.status == WorkspacePurgeStatuses.pending)
+                | (
+                    (self.purges.c.status == WorkspacePurgeStatuses.running)
+                    & (self.purges.c.updated_at < now - timedelta(seconds=stale_after))
+                ),
+            )
+            .values(status=WorkspacePurgeStatuses.running, updated_at=now)
+        )
+        # not update_returning, the claimed row no longer matches the criteria
+        if tx_context.connection.execute(q).rowcount == 0:
+            return None
+        return self.get(workspace_id, tx_context)
+
+    def list_unfinished(self, tx_context: TransactionContext) -> list[WorkspacePurge]:
+        query = (
+            self.purges.select()
+            .where(
+                self.purges.c.status.in_(
+                    [WorkspacePurgeStatuses.pending, WorkspacePurgeStatuses.running]
+                )
+            )
+            .order_by(self.purges.c.created_at)
+        )
+        rows = tx_context.connection.execute(query).all()
+        return [self._to_purge(row) for row in rows]
+
+
 class ConversationStoreSQL(ConversationStore):
     default_conversations_table_name: str = CONVERSATION_TABLE_NAME
     default_messages_table_name = MESSAGE_TABLE_NAME
@@ -393,12 +575,53 @@ class ConversationStoreSQL(ConversationStore):
         if result is None:
             return None
         if links and "messages" in links:
-            messages = tx_context.connection.execute(
-                self.messages.select().where(self.messages.c.conversation_id == conv.id)
-            )
-            conv.messages = [ChatMessage(**m._asdict()) for m in messages]
+            self._load_messages(workspace_id, [conv], tx_context)
         return conv
 
+    def _load_messages(
+        self,
+        workspace_id: str,
+        conversations: list[Conversation],
+        tx_context: TransactionContext,
+        messages_limit: Optional[int] = None,
+    ):
+        """
+        Loads the messages of all conversations in a single query, oldest first.
+        If messages_limit is set only the latest messages of each conversation are kept
+        """
+        if not conversations:
+            return
+
+        by_id = {c.id: c for c in conversations}
+        for c in conversations:
+            c.messages = []
+
+        messages = self.messages
+        where = (messages.c.workspace_id == workspace_id) & (
+            messages.c.conversation_id.in_(list(by_id))
+        )
+        if messages_limit is not None:
+            rn = (
+                func.row_number()
+                .over(
+                    partition_by=messages.c.conversation_id,
+                    order_by=(messages.c.created_at.desc(), messages.c.id.desc()),
+                )
+                .label("rn")
+            )
+            # rank the messages of each conversation newest first, keep the top ones
+            messages = select(self.messages, rn).where(where).subquery()
+            where = messages.c.rn <= messages_limit
+
+        query = (
+            select(*[messages.c[c.name] for c in self.messages.columns])
+            .where(where)
+            .order_by(messages.c.conversation_id, messages.c.created_at, messages.c.id)
+        )
+
+        for m in tx_context.connection.execute(query):
+            by_id[m.conversation_id].messages.append(ChatMessage(**m._asdict()))
+
     def get_by_id(
         self,
         workspace_id: str,
@@ -434,54 +657,60 @@ class ConversationStoreSQL(ConversationStore):
         filters: dict[str, Any] = None,
         links: Optional[list[str]] = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialConversation], int]:
-        # Query to count total documents
-        # Base query for counting
-        base_count_query = (
-            select(func.count())
-            .select_from(self.conversations)
-            .where(self.conversations.c.workspace_id == workspace_id)
-        )
-
-        # Applying filters to the count query
-        if filters:
-            for field, value in filters.items():
-                base_count_query = base_count_query.where(
-                    self.conversations.c[field] == value
-                )
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+        messages_limit: Optional[int] = None,
+    ) -> tuple[list[PartialConversation], Optional[int]]:
+        total_count = None
+        if include_total:
+            base_count_query = (
+                select(func.count())
+                .select_from(self.conversations)
+                .where(self.conversations.c.workspace_id == workspace_id)
+            )
 
-        # Execute count query
-        total_count = tx_context.connection.execute(base_count_query).scalar_one()
+            # Applying filters to the count query
+            if filters:
+                for field, value in filters.items():
+                    base_count_query = base_count_query.where(
+                        self.conversations.c[field] == value
+                    )
+
+            total_count = count_rows(
+                tx_context.connection,
+                base_count_query,
+                table=self.conversations.name,
+                workspace_id=workspace_id,
+                mode=total_mode,
+            )
 
+        order = [
+            (self.conversations.c.created_at, True),
+            (self.conversations.c.id, True),
+        ]
         # Query for retrieving conversations
         columns = [
             self.conversations.c[column_name]
             for column_name in projection
             if column_name in self.conversations.c
         ]
-        query = (
-            select(*columns if len(columns) > 0 else self.conversations.c)
-            .where(self.conversations.c.workspace_id == workspace_id)
-            .order_by(self.conversations.c.created_at.desc())
-            .offset(offset)
-            .limit(limit)
+        columns = with_order_columns(columns, order)
+        query = select(*columns if len(columns) > 0 else self.conversations.c).where(
+            self.conversations.c.workspace_id == workspace_id
         )
 
         if filters:
             for field, value in filters.items():
                 query = query.where(self.conversations.c[field] == value)
 
+        query = paginate(query, order, limit=limit, offset=offset, cursor=cursor)
         result = tx_context.connection.execute(query)
-        conversations = []
-        for record in result:
-            conversation = PartialConversation(**record._asdict())
-            conversations.append(conversation)
-            if links and "messages" in links:
-                messages_query = select(self.messages).where(
-                    self.messages.c.conversation_id == conversation.id
-                )
-                messages = tx_context.connection.execute(messages_query)
-                conversation.messages = [ChatMessage(**m._asdict()) for m in messages]
+        conversations = [PartialConversation(**record._asdict()) for record in result]
+        if links and "messages" in links:
+            self._load_messages(
+                workspace_id, conversations, tx_context, messages_limit=messages_limit
+            )
 
         # Return both the list of conversations and the total count
         return conversations, total_count
@@ -496,6 +725,9 @@ class ConversationStoreSQL(ConversationStore):
         # fixes Error binding parameter 4: type 'StatusEnum' is not supported
         o["status"] = o["status"].value
         handle_db_operation(tx_context.connection, self.conversations.insert(), o)
+        invalidate_counts(
+            self.conversations.name, conversation.workspace_id, tx_context
+        )
         return conversation
 
     def update(
@@ -511,25 +743,25 @@ class ConversationStoreSQL(ConversationStore):
             .where(self.conversations.c.workspace_id == workspace_id)
             .values(updates)
         )
-
-        tx_context.connection.execute(q)
-        return self.get_by_id(
-            workspace_id=workspace_id,
-            conversation_id=conversation_id,
-            tx_context=tx_context,
-        )
+        row = update_returning(tx_context.connection, self.conversations, q)
+        if row is None:
+            return None
+        # conversations are listed by status
+        invalidate_counts(self.conversations.name, workspace_id, tx_context)
+        return Conversation(**row._asdict())
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ):
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         if workspace_id is None:
-            return None
+            return 0
 
-        q = self.conversations.delete().where(
-            self.conversations.c.workspace_id == workspace_id
+        return delete_workspace_rows(
+            tx_context, self.conversations, workspace_id, limit
         )
-        tx_context.connection.execute(q)
-        return None
 
 
 class ChatMessageStoreSQL(ChatMessageStore):
@@ -596,14 +828,15 @@ class ChatMessageStoreSQL(ChatMessageStore):
         return None
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ):
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         if workspace_id is None:
-            return None
+            return 0
 
-        q = self.messages.delete().where(self.messages.c.workspace_id == workspace_id)
-        tx_context.connection.execute(q)
-        return None
+        return delete_workspace_rows(tx_context, self.messages, workspace_id, limit)
 
 
 class ApplicationStoreSQL(ApplicationStore):
@@ -639,38 +872,49 @@ class ApplicationStoreSQL(ApplicationStore):
         limit=10,
         tx_context: TransactionContext = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialApplication], int]:
-        base_count_query = (
-            select(func.count())
-            .select_from(self.apps)
-            .where(self.apps.c.workspace_id == workspace_id)
-        )
-
-        # Applying filters to the count query
-        if filters:
-            for field, value in filters.items():
-                base_count_query = base_count_query.where(self.apps.c[field] == value)
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialApplication], Optional[int]]:
+        total_count = None
+        if include_total:
+            base_count_query = (
+                select(func.count())
+                .select_from(self.apps)
+                .where(self.apps.c.workspace_id == workspace_id)
+            )
 
-        # Execute count query
-        total_count = tx_context.connection.execute(base_count_query).scalar_one()
+            # Applying filters to the count query
+            if filters:
+                for field, value in filters.items():
+                    base_count_query = base_count_query.where(
+                        self.apps.c[field] == value
+                    )
+
+            total_count = count_rows(
+                tx_context.connection,
+                base_count_query,
+                table=self.apps.name,
+                workspace_id=workspace_id,
+                mode=total_mode,
+            )
 
+        order = [(self.apps.c.name, False), (self.apps.c.id, False)]
         columns = [
             self.apps.c[column_name]
-            for column_name in projection
+            for column_name in projection or []
             if column_name in self.apps.c
         ]
-        query = (
-            select(*columns if len(columns) > 0 else self.apps.c)
-            .where(self.apps.c.workspace_id == workspace_id)
-            .order_by(self.apps.c.name.asc())
-            .offset(offset)
-            .limit(limit)
+        columns = with_order_columns(columns, order)
+        query = select(*columns if len(columns) > 0 else self.apps.c).where(
+            self.apps.c.workspace_id == workspace_id
         )
 
         if filters:
             for field, value in filters.items():
                 query = query.where(self.apps.c[field] == value)
 
+        query = paginate(query, order, limit=limit, offset=offset, cursor=cursor)
         result = tx_context.connection.execute(query)
         apps = [PartialApplication(**record._asdict()) for record in result]
 
@@ -715,6 +959,7 @@ class ApplicationStoreSQL(ApplicationStore):
 
         o = app.model_dump()
         handle_db_operation(tx_context.connection, self.apps.insert(), o)
+        invalidate_counts(self.apps.name, app.workspace_id, tx_context)
 
         return app
 
@@ -732,30 +977,35 @@ class ApplicationStoreSQL(ApplicationStore):
         res = tx_context.connection.execute(q)
         if res.rowcount == 0:
             raise HTTPException(status_code=404, detail="App not found")
+        invalidate_counts(self.apps.name, workspace_id, tx_context)
         return None
 
     def update(
         self,
         application: Application,
         tx_context: TransactionContext,
-    ) -> Workspace:
+    ) -> Application:
         q = (
             self.apps.update()
             .where(self.apps.c.id == application.id)
+            .where(self.apps.c.workspace_id == application.workspace_id)
             .values({k: v for k, v in application.model_dump().items() if k != "id"})
         )
-        tx_context.connection.execute(q)
-        return application
+        row = update_returning(tx_context.connection, self.apps, q)
+        if row is None:
+            raise HTTPException(status_code=404, detail="App not found")
+        return Application(**row._asdict())
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         if workspace_id is None:
-            return None
+            return 0
 
-        q = self.apps.delete().where(self.apps.c.workspace_id == workspace_id)
-        tx_context.connection.execute(q)
-        return None
+        return delete_workspace_rows(tx_context, self.apps, workspace_id, limit)
 
 
 class DirectoryStoreSQL(DirectoryStore):
@@ -811,6 +1061,7 @@ class DirectoryStoreSQL(DirectoryStore):
             dir.id = generate()
         o = dir.model_dump()
         handle_db_operation(tx_context.connection, self.directories.insert(), o)
+        invalidate_counts(self.directories.name, dir.workspace_id, tx_context)
         return dir
 
     def delete(
@@ -827,6 +1078,7 @@ class DirectoryStoreSQL(DirectoryStore):
         res = tx_context.connection.execute(q)
         if res.rowcount == 0:
             raise HTTPException(status_code=404, detail="Directory not found")
+        invalidate_counts(self.directories.name, workspace_id, tx_context)
         return None
 
     def list(
@@ -837,40 +1089,49 @@ class DirectoryStoreSQL(DirectoryStore):
         limit=10,
         tx_context: TransactionContext = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialDirectory], int]:
-        base_count_query = (
-            select(func.count())
-            .select_from(self.directories)
-            .where(self.directories.c.workspace_id == workspace_id)
-        )
-
-        # Applying filters to the count query
-        if filters:
-            for field, value in filters.items():
-                base_count_query = base_count_query.where(
-                    self.directories.c[field] == value
-                )
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialDirectory], Optional[int]]:
+        total_count = None
+        if include_total:
+            base_count_query = (
+                select(func.count())
+                .select_from(self.directories)
+                .where(self.directories.c.workspace_id == workspace_id)
+            )
 
-        # Execute count query
-        total_count = tx_context.connection.execute(base_count_query).scalar_one()
+            # Applying filters to the count query
+            if filters:
+                for field, value in filters.items():
+                    base_count_query = base_count_query.where(
+                        self.directories.c[field] == value
+                    )
+
+            total_count = count_rows(
+                tx_context.connection,
+                base_count_query,
+                table=self.directories.name,
+                workspace_id=workspace_id,
+                mode=total_mode,
+            )
 
+        order = [(self.directories.c.name, False), (self.directories.c.id, False)]
         columns = [
             self.directories.c[column_name]
-            for column_name in projection
+            for column_name in projection or []
             if column_name in self.directories.c
         ]
-        query = (
-            select(*columns if len(columns) > 0 else self.directories.c)
-            .where(self.directories.c.workspace_id == workspace_id)
-            .order_by(self.directories.c.name.asc())
-            .offset(offset)
-            .limit(limit)
+        columns = with_order_columns(columns, order)
+        query = select(*columns if len(columns) > 0 else self.directories.c).where(
+            self.directories.c.workspace_id == workspace_id
         )
 
         if filters:
             for field, value in filters.items():
                 query = query.where(self.directories.c[field] == value)
 
+        query = paginate(query, order, limit=limit, offset=offset, cursor=cursor)
         result = tx_context.connection.execute(query)
         directories = []
         for record in result:
@@ -882,26 +1143,28 @@ class DirectoryStoreSQL(DirectoryStore):
         self,
         directory: Directory,
         tx_context: TransactionContext,
-    ) -> Workspace:
+    ) -> Directory:
         q = (
             self.directories.update()
             .where(self.directories.c.id == directory.id)
+            .where(self.directories.c.workspace_id == directory.workspace_id)
             .values({k: v for k, v in directory.model_dump().items() if k != "id"})
         )
-        tx_context.connection.execute(q)
-        return directory
+        row = update_returning(tx_context.connection, self.directories, q)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Directory not found")
+        return Directory(**row._asdict())
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ) -> None:
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         if workspace_id is None:
-            return None
+            return 0
 
-        q = self.directories.delete().where(
-            self.directories.c.workspace_id == workspace_id
-        )
-        tx_context.connection.execute(q)
-        return None
+        return delete_workspace_rows(tx_context, self.directories, workspace_id, limit)
 
 
 class RuleStoreSQL(RuleStore):
@@ -970,27 +1233,24 @@ class RuleStoreSQL(RuleStore):
         handle_db_operation(tx_context.connection, self.rules.insert(), o)
 
         rule_ctx = {
-            "id": generate(),
             "workspace_id": rule.workspace_id,
             "rule_id": rule.id,
+            "application_id": None,
+            "directory_id": None,
         }
+        rows = [
+            {**rule_ctx, "id": generate(), "application_id": app_id}
+            for app_id in rule.application_ids or []
+        ] + [
+            {**rule_ctx, "id": generate(), "directory_id": dir_id}
+            for dir_id in rule.directory_ids or []
+        ]
+        # a rule that applies to everything still gets a context row
+        if not rows:
+            rows.append({**rule_ctx, "id": generate()})
 
-        for app_id in rule.application_ids or []:
-            rctx = {**rule_ctx, "application_id": app_id}
-            handle_db_operation(
-                tx_context.connection, self.rules_context.insert(), rctx
-            )
-
-        for dir_id in rule.directory_ids or []:
-            rctx = {**rule_ctx, "directory_id": dir_id}
-            handle_db_operation(
-                tx_context.connection, self.rules_context.insert(), rctx
-            )
-
-        if not rule.directory_ids and not rule.application_ids:
-            handle_db_operation(
-                tx_context.connection, self.rules_context.insert(), rule_ctx
-            )
+        handle_db_operation(tx_context.connection, self.rules_context.insert(), rows)
+        invalidate_counts(self.rules.name, rule.workspace_id, tx_context)
 
         return rule
 
@@ -1014,27 +1274,31 @@ class RuleStoreSQL(RuleStore):
         res = tx_context.connection.execute(q)
         if res.rowcount == 0:
             raise HTTPException(status_code=404, detail="rule not found")
+        invalidate_counts(self.rules.name, workspace_id, tx_context)
 
         return None
 
     def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
-    ):
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
         if workspace_id is None:
-            return None
+            return 0
 
-        subq = (
-            select(self.rules.c.id)
-            .where(self.rules.c.workspace_id == workspace_id)
-            .subquery()
-        )
+        subq = select(self.rules.c.id).where(self.rules.c.workspace_id == workspace_id)
+        if limit is not None:
+            # pin the batch, a limited subquery may pick other rows the second time
+            subq = tx_context.connection.execute(subq.limit(limit)).scalars().all()
+            if not subq:
+                return 0
 
+        invalidate_counts(self.rules.name, workspace_id, tx_context)
         ctxq = self.rules_context.delete().where(self.rules_context.c.rule_id.in_(subq))
-        tx_context.connection.execute(ctxq)
+        deleted = tx_context.connection.execute(ctxq).rowcount
         q = self.rules.delete().where(self.rules.c.id.in_(subq))
-        tx_context.connection.execute(q)
-
-        return None
+        return deleted + tx_context.connection.execute(q).rowcount
 
     def list(
         self,
@@ -1044,62 +1308,82 @@ class RuleStoreSQL(RuleStore):
         limit=10,
         tx_context: TransactionContext = None,
         projection: List[str] = [],
-    ) -> tuple[list[PartialRule], int]:
-        base_count_query = (
-            select(func.count(distinct(self.rules.c.id)))
-            .select_from(self.rules)
-            .join(self.rules_context, self.rules_context.c.rule_id == self.rules.c.id)
-            .where(self.rules.c.workspace_id == workspace_id)
-        )
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+        total_mode: CountModes = CountModes.exact,
+    ) -> tuple[list[PartialRule], Optional[int]]:
+        total_count = None
+        if include_total:
+            base_count_query = (
+                select(func.count())
+                .select_from(self.rules)
+                .where(self.rules.c.workspace_id == workspace_id)
+            )
+
+            # Applying filters to the count query
+            if filters:
+                for field, value in filters.items():
+                    base_count_query = base_count_query.where(
+                        self.rules.c[field] == value
+                    )
+
+            total_count = count_rows(
+                tx_context.connection,
+                base_count_query,
+                table=self.rules.name,
+                workspace_id=workspace_id,
+                mode=total_mode,
+            )
 
-        # Applying filters to the count query
+        # page over rules, a rule spans as many context rows as it has links
+        order = [(self.rules.c.created_at, False), (self.rules.c.id, False)]
+        page_query = select(self.rules.c.id).where(
+            self.rules.c.workspace_id == workspace_id
+        )
         if filters:
             for field, value in filters.items():
-                base_count_query = base_count_query.where(self.rules.c[field] == value)
-
-        # Execute count query
-        total_count = tx_context.connection.execute(base_count_query).scalar_one()
+                page_query = page_query.where(self.rules.c[field] == value)
+        page = paginate(
+            page_query, order, limit=limit, offset=offset, cursor=cursor
+        ).subquery()
 
         columns = [
-            self.rules.c.get(column_name, self.rules_context.c.get(column_name))
-            for column_name in projection
-            if column_name in self.rules.c or column_name in self.rules_context.c
+            self.rules.c[column_name]
+            for column_name in projection or []
+            if column_name in self.rules.c
         ]
+        columns = with_order_columns(columns, order) or list(self.rules.c)
+
+        # context ids are aggregated per rule, one row per rule
+        dialect = tx_context.connection.dialect.name
+        aggregates = []
+        for column, field in (
+            (self.rules_context.c.application_id, "application_ids"),
+            (self.rules_context.c.directory_id, "directory_ids"),
+        ):
+            if not projection or field in projection or column.name in projection:
+                aggregates.append(_aggregate_ids(column, dialect).label(field))
 
-        # TODO: if this is slow, we'll need to check if the join is needed (filter of projection need it)
         query = (
-            select(
-                *columns if len(columns) > 0 else (self.rules.c, self.rules_context.c)
+            select(*columns, *aggregates)
+            .select_from(self.rules)
+            .join(page, page.c.id == self.rules.c.id)
+            .outerjoin(
+                self.rules_context, self.rules_context.c.rule_id == self.rules.c.id
             )
-            .join(self.rules_context, self.rules_context.c.rule_id == self.rules.c.id)
-            .where(self.rules.c.workspace_id == workspace_id)
-            .offset(offset)
-            .limit(limit)
+            .group_by(*columns)
+            .order_by(self.rules.c.created_at.asc(), self.rules.c.id.asc())
         )
 
-        if filters:
-            for field, value in filters.items():
-                query = query.where(self.rules.c[field] == value)
-
-        def append_to_rule(r: PartialRule, record):
-            if hasattr(record, "application_id") and record.application_id is not None:
-                r.application_ids = (r.application_ids or []) + [record.application_id]
-
-            if hasattr(record, "directory_id") and record.directory_id is not None:
-                r.directory_ids = (r.directory_ids or []) + [record.directory_id]
+        rules = []
+        for record in tx_context.connection.execute(query):
+            r = record._asdict()
+            for field in ("application_ids", "directory_ids"):
+                if field in r:
+                    r[field] = _split_ids(r[field])
+            rules.append(PartialRule(**r))
 
-        result = tx_context.connection.execute(query)
-        rules: dict[str, PartialRule] = {}
-        for record in result:
-            if record.id in rules:
-                r = rules[record.id]
-                append_to_rule(r, record)
-            else:
-                r = PartialRule(**record._asdict())
-                append_to_rule(r, record)
-                rules[record.id] = r
-
-        return rules.values(), total_count
+        return rules, total_count
 
     def update(
         self,
@@ -1109,12 +1393,20 @@ class RuleStoreSQL(RuleStore):
         q = (
             self.rules.update()
             .where(self.rules.c.id == rule.id)
+            .where(self.rules.c.workspace_id == rule.workspace_id)
             .values(
                 {k: v for k, v in rule.model_dump().items() if k in RULE_MUTABLE_FIELDS}
             )
         )
-        tx_context.connection.execute(q)
-        return rule
+        row = update_returning(tx_context.connection, self.rules, q)
+        if row is None:
+            raise HTTPException(status_code=404, detail="rule not found")
+        # the context is not mutable, it is carried over from the given rule
+        return Rule(
+            **row._asdict(),
+            application_ids=rule.application_ids,
+            directory_ids=rule.directory_ids,
+        )
 
 
 class CheckpointStoreSQL(CheckpointStore):
@@ -1125,6 +1417,7 @@ class CheckpointStoreSQL(CheckpointStore):
     metadata: MetaData = metadata
     checkpoints: Table = checkpoint_table
     writes: Table = checkpoint_writes_table
+    blobs: Table = checkpoint_blobs_table
     engine: Engine
 
     @classmethod
@@ -1134,9 +1427,28 @@ class CheckpointStoreSQL(CheckpointStore):
     def create_tables(self, engine: Engine):
         self.metadata.create_all(engine)
 
-    def __init__(self, engine: Engine):
-        super().__init__()
+    def __init__(
+        self,
+        engine: Engine,
+        keep_last: int = 0,
+        serde: Optional[SerializerProtocol] = None,
+        cache: Optional[LatestCheckpointCache] = None,
+        compact_interval: int = 0,
+    ):
+        # LangGraph's json serializer when no serde is given
+        super().__init__(serde=serde)
         self.engine = engine
+        # the retention aput applies to the thread it saves to, 0 keeps everything,
+        # at most once per compact_interval seconds per thread (0 on every save)
+        self.keep_last = keep_last
+        self._retained_lock = threading.Lock()
+        self._retained = (
+            TTLCache(maxsize=10000, ttl=compact_interval)
+            if compact_interval > 0
+            else None
+        )
+        # the latest checkpoint of threads, written through by aput and aput_writes
+        self.cache = cache
 
     @property
     def config_specs(self) -> list[ConfigurableFieldSpec]:
@@ -1158,121 +1470,492 @@ class CheckpointStoreSQL(CheckpointStore):
     def put(self, config: RunnableConfig, checkpoint: Checkpoint) -> RunnableConfig:
         raise NotImplementedError
 
-    async def alist(self, config: RunnableConfig) -> AsyncIterator[CheckpointTuple]:
-        with self.engine.connect() as conn:
-            thread_id = config["configurable"]["thread_id"]
-            workspace_id = config["configurable"]["workspace_id"]
-            query = (
-                select(self.checkpoints)
-                .where(self.checkpoints.c.workspace_id == workspace_id)
-                .where(self.checkpoints.c.thread_id == thread_id)
-                .order_by(self.checkpoints.c.checkpoint_id.desc())
+    def get_next_version(
+        self, current: Optional[Union[int, float]], channel: Any
+    ) -> float:
+        """
+        The version following current, unique so checkpoints forked from the same
+        parent (concurrent turns, retries, replays) do not store different values
+        under the same channel version blob. The ordinal is the integer part, a
+        float rather than a string keeps it comparable with the int versions
+        threads were saved with so far.
+        """
+        return _version_number(current or 0) + 1 + random.random()
+
+    def _list_query(
+        self,
+        config: RunnableConfig,
+        filter: Optional[dict[str, Any]],
+        before: Optional[RunnableConfig],
+        limit: Optional[int],
+    ) -> Select:
+        """
+        Selects the thread's checkpoints, newest first, of the namespace when the
+        config has one, older than before and matching filter on the scalar metadata
+        fields (see _metadata_fields). Rows saved before those fields were stored are
+        selected too, their metadata is matched in python (see _matches).
+        """
+        checkpoints = self.checkpoints
+        query = (
+            select(checkpoints)
+            .where(
+                checkpoints.c.workspace_id == config["configurable"]["workspace_id"],
+                checkpoints.c.thread_id == config["configurable"]["thread_id"],
+            )
+            .order_by(checkpoints.c.checkpoint_id.desc())
+        )
+        checkpoint_ns = config["configurable"].get("checkpoint_ns")
+        if checkpoint_ns is not None:
+            query = query.where(checkpoints.c.checkpoint_ns == checkpoint_ns)
+        if before is not None:
+            query = query.where(
+                checkpoints.c.checkpoint_id < before["configurable"]["checkpoint_id"]
             )
 
-            result = conn.execute(query).all()
-            tuples = []
-
-            for record in result:
-                rdict = record._asdict()
-                tuple = CheckpointTuple(
-                    {
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "checkpoint_ns": rdict["checkpoint_ns"],
-                            "checkpoint_id": rdict["checkpoint_id"],
-                            "workspace_id": workspace_id,
-                        }
-                    },
-                    self.serde.loads(rdict["checkpoint"]),
-                    self.serde.loads(rdict["metadata"])
-                    if rdict["metadata"] is not None
-                    else {},
-                    {
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "workspace_id": workspace_id,
-                            "checkpoint_ns": rdict["checkpoint_ns"],
-                            "checkpoint_id": rdict["parent_checkpoint_id"],
-                        }
-                    }
-                    if rdict.get("parent_checkpoint_id")
-                    else None,
-                )
-
-                tuples.append(tuple)
+        fields = checkpoints.c.metadata_fields
+        conditions = []
+        for key, value in (filter or {}).items():
+            if isinstance(value, bool):
+                conditions.append(fields[key].as_boolean() == value)
+            elif isinstance(value, int):
+                conditions.append(fields[key].as_integer() == value)
+            elif isinstance(value, float):
+                conditions.append(fields[key].as_float() == value)
+            elif isinstance(value, str):
+                conditions.append(fields[key].as_string() == value)
+        if conditions:
+            query = query.where(or_(fields.is_(None), and_(*conditions)))
+        # filtered rows may still be dropped in python, the limit is applied there
+        if limit is not None and not filter:
+            query = query.limit(limit)
+        return query
+
+    def _metadata_fields(self, metadata: CheckpointMetadata) -> dict[str, Any]:
+        """The top level scalar values of metadata (source, step...), filterable in SQL"""
+        return {
+            k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))
+        }
 
-            return tuples
+    def _matches(
+        self, rows: list[Row], filter: Optional[dict[str, Any]]
+    ) -> list[Tuple[Row, CheckpointMetadata, Checkpoint]]:
+        """
+        The rows whose metadata matches filter, with their metadata and checkpoint
+        (its channel values are loaded later, for the tuples actually consumed)
+        """
+        matches = []
+        for row in rows:
+            metadata = (
+                self.serde.loads(row.metadata) if row.metadata is not None else {}
+            )
+            if filter and any(metadata.get(k) != v for k, v in filter.items()):
+                continue
+            matches.append((row, metadata, self.serde.loads(row.checkpoint)))
+        return matches
 
-    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+    def _list_tuple(
+        self,
+        config: RunnableConfig,
+        row: Row,
+        metadata: CheckpointMetadata,
+        checkpoint: Checkpoint,
+        blobs: dict[Tuple[str, str, str], Row],
+    ) -> CheckpointTuple:
         thread_id = config["configurable"]["thread_id"]
         workspace_id = config["configurable"]["workspace_id"]
-        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-        checkpoint_id = config["configurable"].get("checkpoint_id")
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                    "workspace_id": workspace_id,
+                }
+            },
+            self._with_channel_values(checkpoint, row.checkpoint_ns, blobs),
+            metadata,
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "workspace_id": workspace_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.parent_checkpoint_id,
+                }
+            }
+            if row.parent_checkpoint_id
+            else None,
+        )
+
+    def _list(
+        self,
+        config: RunnableConfig,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = self._list_query(config, filter, before, limit)
+        listed = 0
         with self.engine.connect() as conn:
-            if checkpoint_id:
-                query = (
-                    select(self.checkpoints)
-                    .where(self.checkpoints.c.workspace_id == workspace_id)
-                    .where(self.checkpoints.c.thread_id == thread_id)
-                    .where(self.checkpoints.c.checkpoint_ns == checkpoint_ns)
-                    .where(self.checkpoints.c.checkpoint_id == checkpoint_id)
-                )
-            else:
-                query = (
-                    select(self.checkpoints)
-                    .where(self.checkpoints.c.workspace_id == workspace_id)
-                    .where(self.checkpoints.c.thread_id == thread_id)
-                    .where(self.checkpoints.c.checkpoint_ns == checkpoint_ns)
-                    .order_by(self.checkpoints.c.checkpoint_id.desc())
+            result = conn.execution_options(yield_per=LIST_BATCH_SIZE).execute(query)
+            for rows in result.partitions():
+                matches = self._matches(rows, filter)
+                blobs = self._blobs_by_key(
+                    self._blobs(
+                        conn,
+                        self._blobs_query(
+                            config, [(row.checkpoint_ns, c) for row, _, c in matches]
+                        ),
+                    )
                 )
+                for row, metadata, checkpoint in matches:
+                    if limit is not None and listed >= limit:
+                        return
+                    listed += 1
+                    yield self._list_tuple(config, row, metadata, checkpoint, blobs)
+
+    async def alist(
+        self,
+        config: RunnableConfig,
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint_tuple in self._list(config, filter, before, limit):
+            yield checkpoint_tuple
+
+    def _blobs_query(
+        self, config: RunnableConfig, checkpoints: list[Tuple[str, Checkpoint]]
+    ) -> Optional[Select]:
+        """
+        Selects the channel values the (checkpoint_ns, checkpoint) refer to by
+        version, None when none of them has a versioned channel
+        """
+        keys = {
+            (checkpoint_ns, channel, str(version))
+            for checkpoint_ns, checkpoint in checkpoints
+            for channel, version in checkpoint["channel_versions"].items()
+        }
+        if not keys:
+            return None
+        blobs = self.blobs
+        return select(
+            blobs.c.checkpoint_ns, blobs.c.channel, blobs.c.version, blobs.c.blob
+        ).where(
+            blobs.c.workspace_id == config["configurable"]["workspace_id"],
+            blobs.c.thread_id == config["configurable"]["thread_id"],
+            tuple_(blobs.c.checkpoint_ns, blobs.c.channel, blobs.c.version).in_(keys),
+        )
 
-            # find pending writes
-            pwrites_query = (
-                select(self.writes)
-                .where(self.checkpoints.c.workspace_id == workspace_id)
-                .where(self.checkpoints.c.thread_id == thread_id)
-                .where(self.checkpoints.c.checkpoint_ns == checkpoint_ns)
+    def _blobs(self, connection: Connection, query: Optional[Select]) -> list[Row]:
+        return connection.execute(query).all() if query is not None else []
+
+    def _blobs_by_key(self, blobs: list[Row]) -> dict[Tuple[str, str, str], Row]:
+        return {(row.checkpoint_ns, row.channel, row.version): row for row in blobs}
+
+    def _with_channel_values(
+        self,
+        checkpoint: Checkpoint,
+        checkpoint_ns: str,
+        blobs: dict[Tuple[str, str, str], Row],
+    ) -> Checkpoint:
+        """
+        The checkpoint with the values of its versioned channels, checkpoints saved
+        before values were stored by version still have all of them inline
+        """
+        channel_values = dict(checkpoint["channel_values"])
+        for channel, version in checkpoint["channel_versions"].items():
+            row = blobs.get((checkpoint_ns, channel, str(version)))
+            if row is None:
+                continue
+            if row.blob is None:
+                channel_values.pop(channel, None)
+            else:
+                channel_values[channel] = self.serde.loads(row.blob)
+        return {**checkpoint, "channel_values": channel_values}
+
+    def _tuple_query(self, config: RunnableConfig) -> Select:
+        """
+        Selects a checkpoint (the thread's latest when no id is given) left joined
+        with its own pending writes, a row per write, so both come in one round trip
+        and the lookup stays on the (workspace_id, thread_id, checkpoint_ns,
+        checkpoint_id) prefix of both tables' keys however long the thread is.
+        """
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        checkpoint = select(self.checkpoints).where(
+            self.checkpoints.c.workspace_id == config["configurable"]["workspace_id"],
+            self.checkpoints.c.thread_id == config["configurable"]["thread_id"],
+            self.checkpoints.c.checkpoint_ns
+            == config["configurable"].get("checkpoint_ns", ""),
+        )
+        if checkpoint_id:
+            checkpoint = checkpoint.where(
+                self.checkpoints.c.checkpoint_id == checkpoint_id
             )
+        else:
+            checkpoint = checkpoint.order_by(
+                self.checkpoints.c.checkpoint_id.desc()
+            ).limit(1)
+        checkpoint = checkpoint.subquery("checkpoint")
+
+        writes = self.writes
+        on = and_(
+            writes.c.workspace_id == checkpoint.c.workspace_id,
+            writes.c.thread_id == checkpoint.c.thread_id,
+            writes.c.checkpoint_ns == checkpoint.c.checkpoint_ns,
+            writes.c.checkpoint_id == checkpoint.c.checkpoint_id,
+        )
+        return (
+            select(
+                checkpoint,
+                writes.c.task_id,
+                writes.c.idx,
+                writes.c.channel,
+                writes.c.blob,
+            )
+            .select_from(checkpoint.outerjoin(writes, on))
+            .order_by(writes.c.task_id, writes.c.idx)
+        )
+
+    def _rows_tuple(
+        self,
+        config: RunnableConfig,
+        rows: list[Row],
+        checkpoint: Checkpoint,
+        blobs: list[Row],
+    ) -> CheckpointTuple:
+        """
+        Builds the checkpoint tuple out of the rows of _tuple_query, the checkpoint
+        they hold and the values of its versioned channels
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        value = rows[0]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": value.checkpoint_id,
+                }
+            },
+            checkpoint=self._with_channel_values(
+                checkpoint, checkpoint_ns, self._blobs_by_key(blobs)
+            ),
+            metadata=self.serde.loads(value.metadata)
+            if value.metadata is not None
+            else {},
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": value.parent_checkpoint_id,
+                }
+            }
+            if value.parent_checkpoint_id
+            else None,
+            # a checkpoint without writes comes back as a single row of nulls
+            pending_writes=[
+                (row.task_id, row.channel, self.serde.loads(row.blob))
+                for row in rows
+                if row.task_id is not None
+            ],
+        )
+
+    def _cache_key(self, config: RunnableConfig) -> ThreadKey:
+        configurable = config["configurable"]
+        return (
+            configurable["workspace_id"],
+            configurable["thread_id"],
+            configurable.get("checkpoint_ns", ""),
+        )
+
+    def _cached(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self.cache is None:
+            return None
+        return self.cache.get(
+            self._cache_key(config), config["configurable"].get("checkpoint_id")
+        )
 
-            pwrites = conn.execute(pwrites_query).all()
-
-            value = conn.execute(query).fetchone()
-            if value:
-                vdict = value._asdict()
-                return CheckpointTuple(
-                    config={
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "checkpoint_ns": checkpoint_ns,
-                            "checkpoint_id": vdict["checkpoint_id"],
-                        }
-                    },
-                    checkpoint=self.serde.loads(vdict["checkpoint"]),
-                    metadata=self.serde.loads(vdict["metadata"])
-                    if vdict["metadata"] is not None
-                    else {},
-                    parent_config={
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "checkpoint_ns": checkpoint_ns,
-                            "checkpoint_id": vdict["parent_checkpoint_id"],
-                        }
+    def _cache_loaded(
+        self,
+        config: RunnableConfig,
+        rows: list[Row],
+        blobs: list[Row],
+        checkpoint_tuple: CheckpointTuple,
+    ):
+        """Caches the latest checkpoint of a thread read from the rows of _tuple_query"""
+        if self.cache is None or config["configurable"].get("checkpoint_id"):
+            return
+        written = [row for row in rows if row.task_id is not None]
+        self.cache.put(
+            self._cache_key(config),
+            checkpoint_tuple,
+            base_size=len(rows[0].checkpoint) + len(rows[0].metadata or b""),
+            channel_sizes={
+                row.channel: len(row.blob) for row in blobs if row.blob is not None
+            },
+            writes=[
+                (row.task_id, row.idx, row.channel, value)
+                for row, (_, _, value) in zip(written, checkpoint_tuple.pending_writes)
+            ],
+            writes_size=sum(len(row.blob) for row in written),
+            notify=False,
+        )
+
+    def _cache_saved(
+        self,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        record: dict,
+        blobs: list[dict],
+        saved: RunnableConfig,
+    ):
+        """Caches a checkpoint just saved as the latest of its thread"""
+        if self.cache is None:
+            return
+        configurable = {
+            "thread_id": record["thread_id"],
+            "checkpoint_ns": record["checkpoint_ns"],
+        }
+        self.cache.put(
+            self._cache_key(saved),
+            CheckpointTuple(
+                config={
+                    "configurable": {
+                        **configurable,
+                        "checkpoint_id": record["checkpoint_id"],
                     }
-                    if vdict["parent_checkpoint_id"]
-                    else None,
-                    pending_writes=[
-                        (row.task_id, row.channel, self.serde.loads(row.blob))
-                        for row in pwrites
-                    ],
-                )
+                },
+                checkpoint=checkpoint,
+                metadata=metadata,
+                parent_config={
+                    "configurable": {
+                        **configurable,
+                        "checkpoint_id": record["parent_checkpoint_id"],
+                    }
+                }
+                if record["parent_checkpoint_id"]
+                else None,
+            ),
+            base_size=len(record["checkpoint"]) + len(record["metadata"]),
+            channel_sizes={
+                blob["channel"]: len(blob["blob"])
+                for blob in blobs
+                if blob["blob"] is not None
+            },
+        )
 
-    async def aput(
+    def _cache_writes(
+        self,
+        config: RunnableConfig,
+        records: list[dict],
+        writes: List[Tuple[str, Any]],
+    ):
+        """Adds writes just saved to their checkpoint if it is cached"""
+        if self.cache is None or not records:
+            return
+        self.cache.put_writes(
+            self._cache_key(config),
+            records[0]["checkpoint_id"],
+            [
+                (record["task_id"], record["idx"], record["channel"], value)
+                for record, (_, value) in zip(records, writes)
+            ],
+            sum(len(record["blob"]) for record in records),
+        )
+
+    def _freshness_query(
+        self, config: RunnableConfig, cached: CheckpointTuple
+    ) -> Select:
+        """
+        The id of the thread's latest checkpoint and the number of writes of the
+        cached one, what another process saving to the thread changes. Reads the
+        (workspace_id, thread_id, checkpoint_ns, checkpoint_id) prefix of both keys.
+        """
+        checkpoints, writes = self.checkpoints, self.writes
+        workspace_id, thread_id, checkpoint_ns = self._cache_key(config)
+        latest = (
+            select(checkpoints.c.checkpoint_id)
+            .where(
+                checkpoints.c.workspace_id == workspace_id,
+                checkpoints.c.thread_id == thread_id,
+                checkpoints.c.checkpoint_ns == checkpoint_ns,
+            )
+            .order_by(checkpoints.c.checkpoint_id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        written = (
+            select(func.count())
+            .select_from(writes)
+            .where(
+                writes.c.workspace_id == workspace_id,
+                writes.c.thread_id == thread_id,
+                writes.c.checkpoint_ns == checkpoint_ns,
+                writes.c.checkpoint_id
+                == cached.config["configurable"]["checkpoint_id"],
+            )
+            .scalar_subquery()
+        )
+        return select(latest.label("checkpoint_id"), written.label("writes"))
+
+    def _fresh(self, config: RunnableConfig, cached: CheckpointTuple, row: Row) -> bool:
+        """
+        Whether the cached checkpoint is still the one asked for (the latest unless
+        config has a checkpoint_id) with all of its writes, drops it otherwise
+        """
+        fresh = len(cached.pending_writes) == row.writes and (
+            config["configurable"].get("checkpoint_id") is not None
+            or row.checkpoint_id == cached.config["configurable"]["checkpoint_id"]
+        )
+        if not fresh:
+            self.cache.invalidate(*self._cache_key(config))
+        return fresh
+
+    def _get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._cached(config)
+        if cached is not None:
+            with self.engine.connect() as conn:
+                row = conn.execute(self._freshness_query(config, cached)).one()
+            if self._fresh(config, cached, row):
+                return cached
+        return self._load_tuple(config)
+
+    def _load_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(self._tuple_query(config)).all()
+            if not rows:
+                return None
+            checkpoint = self.serde.loads(rows[0].checkpoint)
+            blobs = self._blobs(
+                conn,
+                self._blobs_query(config, [(rows[0].checkpoint_ns, checkpoint)]),
+            )
+        checkpoint_tuple = self._rows_tuple(config, rows, checkpoint, blobs)
+        self._cache_loaded(config, rows, blobs, checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._get_tuple(config)
+
+    def _checkpoint_record(
         self,
         config: RunnableConfig,
         checkpoint: Checkpoint,
         metadata: CheckpointMetadata,
-        new_versions: ChannelVersions = None,
-    ) -> RunnableConfig:
+        new_versions: Optional[ChannelVersions],
+    ) -> Tuple[dict, list[dict], RunnableConfig]:
+        """
+        The checkpoints row of checkpoint, the checkpoints_blobs rows of the channel
+        versions it introduces and the config of the saved checkpoint, which its
+        writes are stored against.
+
+        Versioned channels are stored once per version and referred to by the
+        checkpoints that follow, so a channel that did not change (the conversation
+        so far) is not written again on every step. Values without a version (e.g.
+        a checkpoint built by hand) stay inline.
+        """
         configurable = config["configurable"].copy()
         thread_id = configurable.pop("thread_id")
         checkpoint_ns = configurable.pop("checkpoint_ns", "")
@@ -1282,31 +1965,48 @@ class CheckpointStoreSQL(CheckpointStore):
         checkpoint_id = checkpoint["id"]
         workspace_id = configurable.pop("workspace_id")
 
+        versions = checkpoint["channel_versions"]
+        if new_versions is None:
+            new_versions = versions
+        values = checkpoint["channel_values"]
+        blobs = [
+            {
+                "workspace_id": workspace_id,
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "channel": channel,
+                "version": str(version),
+                "blob": self.serde.dumps(values[channel])
+                if channel in values
+                else None,
+            }
+            for channel, version in new_versions.items()
+        ]
+        inline = {k: v for k, v in values.items() if k not in versions}
+
         record = {
             "thread_id": thread_id,
             "workspace_id": workspace_id,
             "checkpoint_ns": checkpoint_ns,
             "checkpoint_id": checkpoint_id,
             "parent_checkpoint_id": parent_checkpoint_id,
-            "checkpoint": self.serde.dumps(checkpoint),
+            "checkpoint": self.serde.dumps({**checkpoint, "channel_values": inline}),
             "metadata": self.serde.dumps(metadata),
+            "metadata_fields": self._metadata_fields(metadata),
         }
-
-        with self.engine.connect() as conn:
-            conn.execute(self.checkpoints.insert(), record)
-            conn.commit()
-
-        return {
+        saved = {
             "configurable": {
                 "thread_id": thread_id,
                 "checkpoint_ns": checkpoint_ns,
-                "checkpoint_id": parent_checkpoint_id,
+                "checkpoint_id": checkpoint_id,
+                "workspace_id": workspace_id,
             }
         }
+        return record, blobs, saved
 
-    async def aput_writes(
+    def _writes_records(
         self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str
-    ) -> None:
+    ) -> list[dict]:
         configurable = config["configurable"].copy()
         thread_id = configurable.pop("thread_id")
         checkpoint_ns = configurable.pop("checkpoint_ns")
@@ -1314,7 +2014,7 @@ class CheckpointStoreSQL(CheckpointStore):
             "checkpoint_id", configurable.pop("thread_ts", None)
         )
         workspace_id = configurable.pop("workspace_id")
-        records = [
+        return [
             {
                 "workspace_id": workspace_id,
                 "thread_id": thread_id,
@@ -1327,24 +2027,348 @@ class CheckpointStoreSQL(CheckpointStore):
             }
             for idx, (channel, value) in enumerate(writes)
         ]
+
+    def _put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: Optional[ChannelVersions] = None,
+    ) -> RunnableConfig:
+        record, blobs, saved = self._checkpoint_record(
+            config, checkpoint, metadata, new_versions
+        )
+        with self.engine.connect() as conn:
+            if blobs:
+                conn.execute(self.blobs.insert(), blobs)
+            conn.execute(self.checkpoints.insert(), record)
+            if self._should_retain(saved):
+                self._retain(conn, saved)
+            conn.commit()
+        self._cache_saved(checkpoint, metadata, record, blobs, saved)
+        return saved
+
+    def _put_writes(
+        self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str
+    ) -> None:
+        records = self._writes_records(config, writes, task_id)
         with self.engine.connect() as conn:
             conn.execute(self.writes.insert().values(records))
             conn.commit()
+        self._cache_writes(config, records, writes)
 
-    def delete_for_workspace(
-        self, workspace_id: str, tx_context: TransactionContext = None
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions = None,
+    ) -> RunnableConfig:
+        return self._put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self, config: RunnableConfig, writes: List[Tuple[str, Any]], task_id: str
     ) -> None:
-        if workspace_id is None:
-            return None
+        self._put_writes(config, writes, task_id)
+
+    def _should_retain(self, saved: RunnableConfig) -> bool:
+        """Whether saving the checkpoint applies the retention to its thread"""
+        if not self.keep_last:
+            return False
+        if self._retained is None:
+            return True
+        key = (
+            saved["configurable"]["workspace_id"],
+            saved["configurable"]["thread_id"],
+        )
+        with self._retained_lock:
+            if key in self._retained:
+                return False
+            self._retained[key] = True
+        return True
+
+    def _retain(self, connection: Connection, saved: RunnableConfig):
+        """Applies the retention to the thread a checkpoint was just saved to"""
+        reclaimed = self._compact(
+            connection,
+            saved["configurable"]["workspace_id"],
+            saved["configurable"]["thread_id"],
+            self.keep_last,
+        )
+        retention_metrics.observe("inline", reclaimed)
+
+    def _compact(
+        self, connection: Connection, workspace_id: str, thread_id: str, keep_last: int
+    ) -> dict[str, int]:
+        reclaimed = {"checkpoints": 0, "writes": 0, "blobs": 0, "bytes": 0}
+        checkpoints, writes = self.checkpoints, self.writes
+        in_thread = and_(
+            checkpoints.c.workspace_id == workspace_id,
+            checkpoints.c.thread_id == thread_id,
+        )
+        latest = connection.execute(
+            select(checkpoints.c.checkpoint_ns, func.max(checkpoints.c.checkpoint_id))
+            .where(in_thread)
+            .group_by(checkpoints.c.checkpoint_ns)
+        ).all()
+        if not latest:
+            return reclaimed
+
+        def is_latest(table: Table):
+            return or_(
+                *(
+                    and_(table.c.checkpoint_ns == ns, table.c.checkpoint_id == id)
+                    for ns, id in latest
+                )
+            )
 
-        q = self.checkpoints.delete().where(
-            self.checkpoints.c.workspace_id == workspace_id
+        def older_than_latest(table: Table):
+            # by id rather than "not the latest", checkpoints saved since latest was
+            # read (by a concurrent step) have greater ids and are never matched
+            return or_(
+                *(
+                    and_(table.c.checkpoint_ns == ns, table.c.checkpoint_id < id)
+                    for ns, id in latest
+                )
+            )
+
+        # the oldest of the keep_last newest checkpoints of the thread
+        oldest_kept = connection.execute(
+            select(checkpoints.c.checkpoint_id)
+            .where(in_thread)
+            .order_by(checkpoints.c.checkpoint_id.desc())
+            .offset(max(keep_last, 1) - 1)
+            .limit(1)
+        ).scalar()
+        if oldest_kept is not None:
+            deleted, size = delete_returning_size(
+                connection,
+                checkpoints,
+                and_(
+                    in_thread,
+                    checkpoints.c.checkpoint_id < oldest_kept,
+                    ~is_latest(checkpoints),
+                ),
+                func.length(checkpoints.c.checkpoint)
+                + func.coalesce(func.length(checkpoints.c.metadata), 0),
+            )
+            reclaimed["checkpoints"] = deleted
+            reclaimed["bytes"] += size
+            if deleted:
+                deleted, size = self._delete_unreferenced_blobs(
+                    connection, workspace_id, thread_id
+                )
+                reclaimed["blobs"] = deleted
+                reclaimed["bytes"] += size
+
+        # pending writes matter to the step that resumes from the latest checkpoint
+        # only, those of superseded (and just deleted) checkpoints go
+        deleted, size = delete_returning_size(
+            connection,
+            writes,
+            and_(
+                writes.c.workspace_id == workspace_id,
+                writes.c.thread_id == thread_id,
+                older_than_latest(writes),
+            ),
+            func.coalesce(func.length(writes.c.blob), 0),
         )
-        tx_context.connection.execute(q)
+        reclaimed["writes"] = deleted
+        reclaimed["bytes"] += size
+        return reclaimed
+
+    def _delete_unreferenced_blobs(
+        self, connection: Connection, workspace_id: str, thread_id: str
+    ) -> tuple[int, int]:
+        """
+        Deletes the channel values no checkpoint left in the thread refers to.
+        Versions do not order the values of a thread, forks (concurrent turns,
+        replays) keep referring to versions older than those of the checkpoints
+        saved after them, so the references are read from every checkpoint kept.
+
+        The values are listed before the checkpoints: a value is saved with the
+        first checkpoint referring to it, one listed is referred to by a checkpoint
+        read next, and values saved meanwhile are not deleted.
+        """
+        checkpoints, blobs = self.checkpoints, self.blobs
+        blobs_in_thread = and_(
+            blobs.c.workspace_id == workspace_id, blobs.c.thread_id == thread_id
+        )
+        stored = connection.execute(
+            select(blobs.c.checkpoint_ns, blobs.c.channel, blobs.c.version).where(
+                blobs_in_thread
+            )
+        ).all()
+        if not stored:
+            return 0, 0
+
+        referenced = set()
+        for ns, checkpoint in connection.execute(
+            select(checkpoints.c.checkpoint_ns, checkpoints.c.checkpoint).where(
+                checkpoints.c.workspace_id == workspace_id,
+                checkpoints.c.thread_id == thread_id,
+            )
+        ):
+            for channel, version in self.serde.loads(checkpoint)[
+                "channel_versions"
+            ].items():
+                referenced.add((ns, channel, str(version)))
+
+        unreferenced = [tuple(key) for key in stored if tuple(key) not in referenced]
+        if not unreferenced:
+            return 0, 0
+        return delete_returning_size(
+            connection,
+            blobs,
+            and_(
+                blobs_in_thread,
+                tuple_(blobs.c.checkpoint_ns, blobs.c.channel, blobs.c.version).in_(
+                    unreferenced
+                ),
+            ),
+            func.coalesce(func.length(blobs.c.blob), 0),
+        )
+
+    def compact_thread(
+        self,
+        workspace_id: str,
+        thread_id: str,
+        keep_last: int,
+        tx_context: TransactionContext,
+    ) -> dict[str, int]:
+        return self._compact(tx_context.connection, workspace_id, thread_id, keep_last)
+
+    def list_compactable_threads(
+        self,
+        keep_last: int,
+        after: Optional[tuple[str, str]],
+        limit: int,
+        tx_context: TransactionContext,
+    ) -> list[tuple[str, str]]:
+        checkpoints, writes = self.checkpoints, self.writes
+        too_long = (
+            select(checkpoints.c.workspace_id, checkpoints.c.thread_id)
+            .group_by(checkpoints.c.workspace_id, checkpoints.c.thread_id)
+            .having(func.count() > max(keep_last, 1))
+        )
+        superseded_writes = (
+            select(writes.c.workspace_id, writes.c.thread_id)
+            .group_by(writes.c.workspace_id, writes.c.thread_id, writes.c.checkpoint_ns)
+            .having(func.count(writes.c.checkpoint_id.distinct()) > 1)
+        )
+        threads = union(too_long, superseded_writes).subquery("threads")
+        q = (
+            select(threads.c.workspace_id, threads.c.thread_id)
+            .order_by(threads.c.workspace_id, threads.c.thread_id)
+            .limit(limit)
+        )
+        if after is not None:
+            q = q.where(
+                or_(
+                    threads.c.workspace_id > after[0],
+                    and_(
+                        threads.c.workspace_id == after[0],
+                        threads.c.thread_id > after[1],
+                    ),
+                )
+            )
+        return [tuple(row) for row in tx_context.connection.execute(q)]
+
+    def delete_for_workspace(
+        self,
+        workspace_id: str,
+        tx_context: TransactionContext = None,
+        limit: Optional[int] = None,
+    ) -> int:
+        if workspace_id is None:
+            return 0
+
+        # checkpoints have composite keys, batches are made of whole threads
+        deleted = 0
+        for table in (self.checkpoints, self.writes, self.blobs):
+            deleted += delete_workspace_rows(
+                tx_context, table, workspace_id, limit, table.c.thread_id
+            )
+        if self.cache is not None:
+            self.cache.invalidate(workspace_id)
+        return deleted
+
+
+def _version_number(version) -> int:
+    """The ordinal of a channel version, plain ints or "<ordinal>.<suffix>" strings"""
+    return int(str(version).split(".")[0])
+
+
+def _aggregate_ids(column: Column, dialect: str):
+    if dialect == "postgresql":
+        return func.array_agg(column).filter(column.isnot(None))
+    # sqlite and others, group_concat skips nulls
+    return func.group_concat(column, ",")
 
-        qwrites = self.writes.delete().where(self.writes.c.workspace_id == workspace_id)
-        tx_context.connection.execute(qwrites)
+
+def _split_ids(value) -> Optional[list[str]]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value.split(",")
+    return list(value)
+
+
+def update_returning(
+    connection: Connection, table: Table, stmt: Update
+) -> Optional[Row]:
+    """
+    Executes an UPDATE and returns the updated row (None when nothing matched) in a
+    single round trip with UPDATE ... RETURNING, backends that lack it get the row
+    selected back by the same criteria.
+    """
+    if connection.dialect.update_returning:
+        return connection.execute(stmt.returning(*table.c)).first()
+
+    if connection.execute(stmt).rowcount == 0:
         return None
+    return connection.execute(select(table).where(stmt.whereclause).limit(1)).first()
+
+
+def delete_returning_size(
+    connection: Connection, table: Table, where, size
+) -> tuple[int, int]:
+    """
+    Deletes the rows of table matching where, returns how many were deleted and
+    the sum of the size expression over them (with DELETE ... RETURNING where the
+    backend has it).
+    """
+    if connection.dialect.delete_returning:
+        sizes = connection.execute(table.delete().where(where).returning(size))
+        sizes = sizes.scalars().all()
+        return len(sizes), sum(s or 0 for s in sizes)
+
+    total = connection.execute(
+        select(func.coalesce(func.sum(size), 0)).where(where)
+    ).scalar()
+    return connection.execute(table.delete().where(where)).rowcount, total
+
+
+def delete_workspace_rows(
+    tx_context: TransactionContext,
+    table: Table,
+    workspace_id: str,
+    limit: Optional[int] = None,
+    key: Optional[Column] = None,
+) -> int:
+    """
+    Deletes the workspace's rows of table, when a limit is given only up to limit
+    rows (picked by key, the table's id by default) so large workspaces can be
+    deleted in short transactions. Returns the number of deleted rows.
+    """
+    where = table.c.workspace_id == workspace_id
+    q = table.delete().where(where)
+    if limit is not None:
+        key = table.c.id if key is None else key
+        q = q.where(key.in_(select(key).where(where).distinct().limit(limit)))
+    deleted = tx_context.connection.execute(q).rowcount
+    invalidate_counts(table.name, workspace_id, tx_context)
+    return deleted
 
 
 def handle_db_operation(connection: Connection, db_operation, params):
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+
+log = logging.getLogger(__name__)
+
+
+def _fetch_configuration(timeout: int):
+    def _fetch(uri: str) -> dict[str, Any]:
+        resp = requests.get(uri, timeout=timeout)
+        if resp.status_code != 200:
+            raise Exception(
+                f"Could not fetch openid configuration, status: {resp.status_code}"
+            )
+        return resp.json()
+
+    return _fetch
+
+
+class OIDCDiscovery:
+    """
+    Lazily resolves the OpenID Connect discovery document.
+
+    The document is persisted to cache_file so restarts don't depend on the IdP,
+    a cached document older than lifespan seconds is served while it is refreshed in
+    the background and a failed refresh keeps serving the last known document.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        cache_file: Optional[str] = None,
+        lifespan: int = 3600,
+        timeout: int = 10,
+        fetch: Optional[Callable[[str], dict[str, Any]]] = None,
+    ):
+        self.uri = uri
+        self.cache_file = cache_file
+        self.lifespan = lifespan
+        self._fetch = fetch or _fetch_configuration(timeout)
+        self._configuration: Optional[dict[str, Any]] = None
+        # wall clock, as it is persisted along with the document
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        # serializes writes of the cache file, readers never wait on it
+        self._file_lock = threading.Lock()
+        self._written_at = 0.0
+        self._refreshing_in_background = False
+        self._stats = {"fetches": 0, "fetch_errors": 0, "file_loads": 0}
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.copy()
+            stats["age"] = (
+                time.time() - self._fetched_at
+                if self._configuration is not None
+                else None
+            )
+        return stats
+
+    def _load_cache_file(self) -> bool:
+        if not self.cache_file:
+            return False
+
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            log.warning("ignoring unreadable openid configuration cache: %s", e)
+            return False
+
+        # the cache may have been written for a different IdP
+        if cached.get("uri") != self.uri or "configuration" not in cached:
+            return False
+
+        self._configuration = cached["configuration"]
+        self._fetched_at = cached.get("fetched_at", 0.0)
+        self._stats["file_loads"] += 1
+        return True
+
+    def _write_cache_file(self, configuration: dict[str, Any], fetched_at: float):
+        if not self.cache_file:
+            return
+
+        data = {
+            "uri": self.uri,
+            "fetched_at": fetched_at,
+            "configuration": configuration,
+        }
+        with self._file_lock:
+            # a slower concurrent refresh must not replace a newer document
+            if fetched_at < self._written_at:
+                return
+            self._written_at = fetched_at
+            try:
+                dirname = os.path.dirname(os.path.abspath(self.cache_file))
+                os.makedirs(dirname, exist_ok=True)
+                # write then rename so concurrent workers never read a partial file
+                fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.cache_file)
+            except OSError as e:
+                log.warning("failed to persist openid configuration: %s", e)
+
+    def refresh(self) -> dict[str, Any]:
+        try:
+            configuration = self._fetch(self.uri)
+        except Exception as e:
+            with self._lock:
+                self._stats["fetch_errors"] += 1
+                if self._configuration is None:
+                    raise
+                log.warning(
+                    "failed to refresh openid configuration, serving stale: %s", e
+                )
+                return self._configuration
+
+        with self._lock:
+            self._configuration = configuration
+            self._fetched_at = fetched_at = time.time()
+            self._stats["fetches"] += 1
+        # disk I/O, get() and stats() are not held up by it
+        self._write_cache_file(configuration, fetched_at)
+        return configuration
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing_in_background:
+                return
+            self._refreshing_in_background = True
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("background openid configuration refresh failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing_in_background = False
+
+        threading.Thread(target=_run, name="oidc-refresh", daemon=True).start()
+
+    def get(self) -> dict[str, Any]:
+        with self._lock:
+            if self._configuration is None:
+                self._load_cache_file()
+            configuration, fetched_at = self._configuration, self._fetched_at
+
+        if configuration is None:
+            # only one caller fetches on a cold start, the others wait for it
+            with self._fetch_lock:
+                if self._configuration is not None:
+                    return self._configuration
+                return self.refresh()
+
+        if time.time() - fetched_at >= self.lifespan:
+            self._refresh_in_background()
+
+        return configuration
+
+    def _age(self) -> Optional[float]:
+        with self._lock:
+            if self._configuration is None:
+                self._load_cache_file()
+            if self._configuration is None:
+                return None
+            return time.time() - self._fetched_at
+
+    async def run_refresher(self, retry_interval: int = 30):
+        """Keeps the document fresh, meant to run as a task during the app lifespan"""
+        while True:
+            try:
+                age = self._age()
+                if age is None or age >= self.lifespan:
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                log.warning("openid configuration refresh failed: %s", e)
+
+            age = self._age()
+            if age is None or age >= self.lifespan:
+                delay = min(retry_interval, self.lifespan)
+            else:
+                delay = self.lifespan - age
+            await asyncio.sleep(delay)
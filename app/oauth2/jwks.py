@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import jwt
+import requests
+from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError
+
+log = logging.getLogger(__name__)
+
+
+def _fetch_with_session(session: requests.Session, timeout: int):
+    def _fetch(uri: str) -> dict[str, Any]:
+        try:
+            resp = session.get(uri, timeout=timeout)
+            resp.raise_for_status()
+            return resp.json()
+        except requests.RequestException as e:
+            raise PyJWKClientConnectionError(
+                f'Fail to fetch data from the url, err: "{e}"'
+            )
+
+    return _fetch
+
+
+class JWKSCache:
+    """
+    Process wide cache of the IdP signing keys, indexed by kid.
+
+    Keys are refreshed in the background once they get close to expiry, an unknown
+    kid triggers a refetch (at most once every min_refetch_interval seconds) to pick up
+    rotated keys and stale keys are served if the IdP is unreachable.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        lifespan: int = 360,
+        refresh_ahead: float = 0.2,
+        min_refetch_interval: int = 30,
+        timeout: int = 10,
+        fetch: Optional[Callable[[str], dict[str, Any]]] = None,
+    ):
+        self.uri = uri
+        self.lifespan = lifespan
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self._fetch = fetch or _fetch_with_session(requests.Session(), timeout)
+        self._keys: Optional[dict[str, jwt.PyJWK]] = None
+        self._fetched_at = 0.0
+        self._last_attempt_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing_in_background = False
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "refresh_errors": 0,
+            "unknown_kid_refetches": 0,
+        }
+
+    def _inc(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.copy()
+            stats["keys"] = len(self._keys) if self._keys is not None else 0
+            stats["age"] = (
+                time.monotonic() - self._fetched_at if self._keys is not None else None
+            )
+        return stats
+
+    def _refresh(self, fetched_before: Optional[float] = None):
+        with self._refresh_lock:
+            # another thread may have refreshed while we were waiting for the lock
+            if fetched_before is not None and self._fetched_at > fetched_before:
+                return
+
+            self._last_attempt_at = time.monotonic()
+            try:
+                data = self._fetch(self.uri)
+                jwk_set = jwt.PyJWKSet.from_dict(data)
+            except jwt.exceptions.PyJWTError as e:
+                self._inc("refresh_errors")
+                if self._keys is None:
+                    raise
+                log.warning("failed to refresh jwks, serving stale keys: %s", e)
+                return
+
+            keys = {
+                key.key_id: key
+                for key in jwk_set.keys
+                if key.key_id is not None and key.public_key_use in ("sig", None)
+            }
+            with self._lock:
+                self._keys = keys
+                self._fetched_at = time.monotonic()
+                self._stats["refreshes"] += 1
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing_in_background:
+                return
+            self._refreshing_in_background = True
+
+        def _run():
+            try:
+                self._inc("background_refreshes")
+                self._refresh()
+            except Exception as e:
+                log.warning("background jwks refresh failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing_in_background = False
+
+        threading.Thread(target=_run, name="jwks-refresh", daemon=True).start()
+
+    def get_signing_key(self, kid: str) -> jwt.PyJWK:
+        with self._lock:
+            keys, fetched_at = self._keys, self._fetched_at
+
+        age = time.monotonic() - fetched_at
+        if keys is None or age >= self.lifespan:
+            self._refresh(fetched_before=fetched_at)
+        elif age >= self.lifespan * (1 - self.refresh_ahead):
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is not None:
+            self._inc("hits")
+            return key
+
+        self._inc("misses")
+        # the IdP may have rotated its keys, refetch but don't let bogus kids hammer it
+        last_attempt = self._last_attempt_at
+        if (
+            last_attempt is None
+            or time.monotonic() - last_attempt >= self.min_refetch_interval
+        ):
+            self._inc("unknown_kid_refetches")
+            self._refresh(fetched_before=self._fetched_at)
+            key = self._keys.get(kid)
+
+        if key is None:
+            raise PyJWKClientError(
+                f'Unable to find a signing key that matches: "{kid}"'
+            )
+
+        return key
+
+    def get_signing_key_from_jwt(self, token: str) -> jwt.PyJWK:
+        header = jwt.get_unverified_header(token)
+        return self.get_signing_key(header.get("kid"))
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from cachetools import LRUCache
+
+# rough per entry overhead (key, tuple, dict) on top of the claims payload
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class _Entry(NamedTuple):
+    claims: dict[str, Any]
+    expires_at: float
+    size: int
+
+
+class _LRUCache(LRUCache):
+    def __init__(self, maxsize, getsizeof=None, on_evict=None):
+        super().__init__(maxsize=maxsize, getsizeof=getsizeof)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        if self._on_evict is not None:
+            self._on_evict()
+        return item
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    Caches the claims of tokens that passed signature and claims verification,
+    keyed by a hash of the token, until the token expires (minus leeway).
+
+    The cache is LRU evicted and bounded by the estimated memory of its entries.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, leeway: int = 30):
+        self.leeway = leeway
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._cache = _LRUCache(
+            maxsize=max_bytes,
+            getsizeof=lambda entry: entry.size,
+            on_evict=self._on_evict,
+        )
+
+    def _on_evict(self):
+        self._stats["evictions"] += 1
+
+    def get(self, token: str) -> Optional[dict[str, Any]]:
+        key = hash_token(token)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            if time.time() >= entry.expires_at:
+                del self._cache[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            return dict(entry.claims)
+
+    def put(self, token: str, claims: dict[str, Any]):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+
+        expires_at = exp - self.leeway
+        if expires_at <= time.time():
+            return
+
+        size = len(json.dumps(claims, default=str)) + ENTRY_OVERHEAD_BYTES
+        entry = _Entry(claims=dict(claims), expires_at=expires_at, size=size)
+        with self._lock:
+            try:
+                self._cache[hash_token(token)] = entry
+            except ValueError:
+                # a single entry larger than the whole cache
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.copy()
+            stats["entries"] = len(self._cache)
+            stats["bytes"] = self._cache.currsize
+            stats["max_bytes"] = self._cache.maxsize
+        return stats
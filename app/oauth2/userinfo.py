@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from typing import Any, NamedTuple, Optional
+
+import httpx
+from cachetools import TLRUCache
+from fastapi import HTTPException, status
+
+from .token_cache import hash_token
+
+log = logging.getLogger(__name__)
+
+
+class _Cached(NamedTuple):
+    userinfo: Optional[dict[str, Any]]
+    error: Optional[str]
+    expires_at: float
+
+
+class UserInfoClient:
+    """
+    Resolves the userinfo of access tokens over a pooled keep-alive connection.
+
+    Concurrent lookups of the same token are coalesced into a single upstream call,
+    successful lookups are cached up to ttl seconds (never beyond the token's expiry)
+    and failures are cached for negative_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: int = 300,
+        negative_ttl: int = 10,
+        maxsize: int = 1000,
+        timeout: float = 10,
+        max_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache = TLRUCache(
+            maxsize=maxsize, ttu=lambda _k, v, _now: v.expires_at, timer=time.monotonic
+        )
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout, limits=self._limits, transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict[str, Any]:
+        stats = self._stats.copy()
+        stats["entries"] = len(self._cache)
+        stats["inflight"] = len(self._inflight)
+        return stats
+
+    def _ttl_for(self, token_exp: Optional[float]) -> float:
+        if token_exp is None:
+            return self.ttl
+        return max(0, min(self.ttl, token_exp - time.time()))
+
+    async def _fetch(self, endpoint: str, access_token: str) -> dict[str, Any]:
+        try:
+            resp = await self._get_client().get(
+                endpoint, headers={"Authorization": f"Bearer {access_token}"}
+            )
+        except httpx.HTTPError as err:
+            raise ValueError(f"userinfo request failed: {err}")
+
+        if resp.status_code != 200:
+            raise ValueError(f"userinfo request failed with status {resp.status_code}")
+
+        return resp.json()
+
+    def _unwrap(self, cached: _Cached) -> dict[str, Any]:
+        if cached.error is not None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail=cached.error
+            )
+        return cached.userinfo
+
+    async def get(
+        self, endpoint: str, access_token: str, token_exp: Optional[float] = None
+    ) -> dict[str, Any]:
+        key = hash_token(access_token)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._stats["hits" if cached.error is None else "negative_hits"] += 1
+            return self._unwrap(cached)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            cached = await asyncio.shield(inflight)
+            if cached is None:
+                # the lookup was cancelled, look it up again
+                return await self.get(endpoint, access_token, token_exp)
+            return self._unwrap(cached)
+
+        self._stats["misses"] += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            userinfo = await self._fetch(endpoint, access_token)
+            ttl = self._ttl_for(token_exp)
+            cached = _Cached(
+                userinfo=userinfo, error=None, expires_at=time.monotonic() + ttl
+            )
+        except Exception as err:
+            log.debug("Failed to fetch userinfo: %s", err)
+            self._stats["errors"] += 1
+            cached = _Cached(
+                userinfo=None,
+                error=f"{err}",
+                expires_at=time.monotonic() + self.negative_ttl,
+            )
+        except BaseException:
+            # cancelled (e.g. its client went away), not to leave the coalesced
+            # callers waiting
+            fut.set_result(None)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if cached.expires_at > time.monotonic():
+            self._cache[key] = cached
+        fut.set_result(cached)
+        return self._unwrap(cached)
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Column, DateTime, Select, and_, or_
+
+# (column, descending)
+OrderKey = tuple[Column, bool]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: Sequence[OrderKey]) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(order):
+            raise ValueError("unexpected number of values")
+        return [
+            datetime.fromisoformat(v)
+            if v is not None and isinstance(col.type, DateTime)
+            else v
+            for (col, _), v in zip(order, values)
+        ]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"invalid cursor: {e}"
+        )
+
+
+def _after(order: Sequence[OrderKey], values: Sequence[Any]):
+    # (a, b) > (x, y) expanded as a > x OR (a = x AND b > y), per column direction
+    clauses = []
+    for i, (col, desc) in enumerate(order):
+        eq = [order[j][0] == values[j] for j in range(i)]
+        cmp = col < values[i] if desc else col > values[i]
+        clauses.append(and_(*eq, cmp))
+    return or_(*clauses)
+
+
+def paginate(
+    query: Select,
+    order: Sequence[OrderKey],
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> Select:
+    """
+    Orders the query by the given keys and selects a page either after the cursor
+    (keyset pagination) or by offset when no cursor is given.
+    """
+    query = query.order_by(*[col.desc() if desc else col.asc() for col, desc in order])
+    if cursor:
+        query = query.where(_after(order, decode_cursor(cursor, order)))
+    elif offset:
+        query = query.offset(offset)
+    return query.limit(limit)
+
+
+def next_cursor(items: Iterable[Any], limit: int, keys: Sequence[str]) -> Optional[str]:
+    """Cursor of the page following items, None when items is the last page"""
+    items = list(items)
+    if limit <= 0 or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, k) for k in keys])
+
+
+def with_order_columns(
+    columns: list[Column], order: Sequence[OrderKey]
+) -> list[Column]:
+    """Makes sure a projection includes the columns a cursor is built from"""
+    if not columns:
+        return columns
+    names = {c.name for c in columns}
+    return columns + [col for col, _ in order if col.name not in names]
@@ -0,0 +1,101 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# upper bounds (ms) of the wait time histogram buckets, the last bucket is open ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """
+    Tracks how long callers wait to get a connection from an engine's pool, together
+    with the pool gauges this tells whether stalls come from pool exhaustion.
+    """
+
+    def __init__(self, name: str, engine: Engine | AsyncEngine):
+        self.name = name
+        self._pool = (
+            engine.sync_engine.pool if isinstance(engine, AsyncEngine) else engine.pool
+        )
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._timeouts = 0
+
+    def observe(self, wait_ms: float):
+        with self._lock:
+            self._buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self._count += 1
+            self._sum_ms += wait_ms
+            self._max_ms = max(self._max_ms, wait_ms)
+
+    @contextmanager
+    def measure(self):
+        started = time.perf_counter()
+        try:
+            yield
+        except PoolTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise
+        self.observe((time.perf_counter() - started) * 1000)
+
+    def _gauge(self, name: str) -> Optional[int]:
+        # not every pool implementation (e.g. sqlite's) exposes all of the gauges
+        fn = getattr(self._pool, name, None)
+        return fn() if callable(fn) else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = {
+                f"le_{le}ms": count for le, count in zip(WAIT_BUCKETS_MS, self._buckets)
+            }
+            buckets["inf"] = self._buckets[-1]
+            wait = {
+                "count": self._count,
+                "avg_ms": self._sum_ms / self._count if self._count else 0.0,
+                "max_ms": self._max_ms,
+                "timeouts": self._timeouts,
+                "histogram": buckets,
+            }
+
+        return {
+            "pool": type(self._pool).__name__,
+            "size": self._gauge("size"),
+            "checked_in": self._gauge("checkedin"),
+            "checked_out": self._gauge("checkedout"),
+            "overflow": self._gauge("overflow"),
+            "wait": wait,
+        }
+
+
+_registry: dict[int, PoolMetrics] = {}
+
+
+def register(name: str, engine: Engine | AsyncEngine) -> PoolMetrics:
+    metrics = PoolMetrics(name, engine)
+    _registry[id(engine)] = metrics
+    return metrics
+
+
+@contextmanager
+def measure_checkout(engine: Engine | AsyncEngine):
+    """Times the enclosed connect() when the engine is a registered one"""
+    metrics = _registry.get(id(engine))
+    if metrics is None:
+        yield
+        return
+    with metrics.measure():
+        yield
+
+
+def stats() -> dict:
+    return {m.name: m.stats() for m in _registry.values()}
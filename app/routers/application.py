@@ -8,6 +8,7 @@ from pydantic import BaseModel, ValidationError
 from app.authz import Permissions, is_admin_or_has_scopes
 
 from ..auth import get_current_workspace
+from ..counts import CountModes
 from ..models import (
     Application,
     JsonPatchDocument,
@@ -17,8 +18,10 @@ from ..models import (
     Workspace,
 )
 from ..models_stores import ApplicationStore
-from ..services import factory_app_store, get_service, pagination_params
-from ..sql import SQLAlchemyTransactionContext
+from ..models_stores_async import AsyncApplicationStore
+from ..pagination import next_cursor
+from ..services import factory_async_app_store, get_service, pagination_params
+from ..sql import AsyncSQLAlchemyTransactionContext, SQLAlchemyTransactionContext
 
 logger = logging.getLogger(__name__)
 
@@ -100,12 +103,12 @@ async def delete(
     application_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
     application_store: Annotated[
-        ApplicationStore, Depends(get_service(ApplicationStore))
+        AsyncApplicationStore, Depends(get_service(AsyncApplicationStore))
     ],
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.DELETE_APPLICATIONS.value])),
 ):
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        application_store.delete(
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        await application_store.delete(
             app_id=application_id,
             workspace_id=workspace.id,
             tx_context=tx_context,
@@ -129,13 +132,13 @@ async def update_application(
     application_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
     application_store: Annotated[
-        ApplicationStore, Depends(get_service(ApplicationStore))
+        AsyncApplicationStore, Depends(get_service(AsyncApplicationStore))
     ],
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_APPLICATIONS.value])),
 ):
     try:
-        with SQLAlchemyTransactionContext().manage() as tx_context:
-            app = application_store.get_by_id(
+        async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+            app = await application_store.get_by_id(
                 app_id=application_id, workspace_id=workspace.id, tx_context=tx_context
             )
             if not app:
@@ -146,7 +149,7 @@ async def update_application(
             patch = jsonpatch.JsonPatch(body_dict["patch"])
             app_updated_dict = patch.apply(app_dict)
             app_updated = Application(**app_updated_dict)
-            application = application_store.update(
+            application = await application_store.update(
                 application=app_updated, tx_context=tx_context
             )
             return application
@@ -162,25 +165,29 @@ class ApplicationList(PaginatedListBase):
 async def list(
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
     list_params: dict = Depends(pagination_params),
-    app_store: ApplicationStore = Depends(factory_app_store),
+    app_store: AsyncApplicationStore = Depends(factory_async_app_store),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.READ_APPLICATIONS.value])),
 ):
     limit = list_params.get("limit", 10)
     offset = list_params.get("offset", 0)
     projection = list_params.get("projection", None)
-    with SQLAlchemyTransactionContext().manage() as tx_context:
+    async with AsyncSQLAlchemyTransactionContext(read_only=True).manage() as tx_context:
         try:
-            items, count = app_store.list(
+            items, count = await app_store.list(
                 workspace_id=workspace.id,
                 tx_context=tx_context,
                 limit=limit,
                 offset=offset,
                 projection=projection,
+                cursor=list_params.get("cursor"),
+                include_total=list_params["include_total"],
+                total_mode=list_params.get("total_mode", CountModes.exact),
             )
             return ApplicationList(
                 items=items,
                 offset=offset,
                 total=count,
+                next_cursor=next_cursor(items, limit, app_store.cursor_keys),
             )
         except ValidationError as e:
             raise HTTPException(status_code=422, detail=e.errors())
@@ -5,7 +5,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, ValidationError
 
 from app.authz import Permissions, is_admin_or_has_scopes
+from app.counts import CountModes
 from app.data_fetching.utils import Doc, prepare_metadata_ids_content
+from app.ext_vector_store import invalidate_document_counts
 from app.models import Document, PaginatedListBase, Workspace
 from app.services import pagination_params
 from app.sql import SQLAlchemyTransactionContext, doc_store_engine
@@ -34,6 +36,7 @@ class AddContentResponse(BaseModel):
 @router.put("", response_model=AddContentResponse)
 async def update(
     body: AddContentBody,
+    workspace: Annotated[Workspace, Depends(get_current_workspace)],
     ovstore=Depends(setup_workspace_vstore),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_CONTENT.value])),
 ):
@@ -47,6 +50,7 @@ async def update(
         )
 
     inserted_ids = ovstore.add_texts(texts=texts, metadatas=metadata, ids=ids)
+    invalidate_document_counts(workspace.id)
     # convert ids to strings (SQLite returns int)
     inserted_ids = [str(i) for i in inserted_ids]
     return AddContentResponse(ok=True, ids=inserted_ids)
@@ -55,11 +59,13 @@ async def update(
 @router.post("", response_model=AddContentResponse)
 async def add(
     body: AddContentBody,
+    workspace: Annotated[Workspace, Depends(get_current_workspace)],
     ovstore=Depends(setup_workspace_vstore),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_CONTENT.value])),
 ):
     texts, metadata, ids = prepare_metadata_ids_content(body.docs)
     inserted_ids = ovstore.add_texts(texts=texts, metadatas=metadata, ids=ids)
+    invalidate_document_counts(workspace.id)
     # convert ids to strings (SQLite returns int)
     inserted_ids = [str(i) for i in inserted_ids]
     return AddContentResponse(ok=True, ids=inserted_ids)
@@ -72,11 +78,13 @@ class RemoveContentBody(BaseModel):
 @router.post("/.delete", status_code=status.HTTP_204_NO_CONTENT)
 async def remove(
     body: RemoveContentBody,
+    workspace: Annotated[Workspace, Depends(get_current_workspace)],
     ovstore=Depends(setup_workspace_vstore),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.DELETE_CONTENT.value])),
 ):
     try:
         delete_ids(ovstore=ovstore, ids=body.ids)
+        invalidate_document_counts(workspace.id)
     except NotImplementedError:
         raise HTTPException(
             detail=f"delete not implemented for type {get_protocol(settings.VSTORE_URI)}",
@@ -153,6 +161,8 @@ async def list(
                 directory=directory,
                 app_names=app_names,
                 projection=projection,
+                include_total=list_params["include_total"],
+                total_mode=list_params.get("total_mode", CountModes.exact),
             )
             return DocumentList(
                 items=[store_doc_to_api_doc(doc) for doc in docs],
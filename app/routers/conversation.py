@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from enum import Enum
 from typing import Annotated, List, Optional
@@ -12,6 +13,7 @@ from app.authz import AdminOrScopes, Permissions, is_admin_or_has_scopes
 from app.utils.strings import str_to_filters
 
 from ..auth import get_current_active_user, get_current_workspace
+from ..counts import CountModes
 from ..llm.conversation import (
     add_messages,
     create_agent_for_access_request_conversation,
@@ -37,13 +39,20 @@ from ..models import (
     Workspace,
 )
 from ..models_stores import ChatMessageStore, ConversationStore
+from ..models_stores_async import AsyncConversationStore
+from ..pagination import next_cursor
 from ..services import (
-    factory_app_store,
+    factory_async_app_store,
+    factory_async_conversation_store,
     factory_conversation_store,
     factory_message_store,
     pagination_params,
 )
-from ..sql import SQLAlchemyTransactionContext
+from ..sql import (
+    AsyncSQLAlchemyTransactionContext,
+    SQLAlchemyTransactionContext,
+    unit_of_work,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -156,6 +165,8 @@ def list(
     list_params: dict = Depends(pagination_params),
     conversation_store: ConversationStore = Depends(factory_conversation_store),
     links: List[str] = Query(None),
+    # caps the number of (latest) messages embedded per conversation
+    messages_limit: Optional[int] = Query(None, ge=1),
     admin_or_scope: AdminOrScopes = Depends(
         is_admin_or_has_scopes(scopes=[Permissions.READ_CONVERSATIONS.value])
     ),
@@ -164,11 +175,12 @@ def list(
     offset = list_params.get("offset", 0)
     projection = list_params.get("projection", [])
     q_filter = list_params.get("q", "")
+    cursor = list_params.get("cursor")
     base_filters = {} if admin_or_scope.is_admin else {"assignee": current_user.email}
     q_filters = str_to_filters(q_filter)
     filters = q_filters | base_filters
 
-    with SQLAlchemyTransactionContext().manage() as tx_context:
+    with SQLAlchemyTransactionContext(read_only=True).manage() as tx_context:
         try:
             items, count = conversation_store.list(
                 workspace_id=workspace.id,
@@ -178,8 +190,17 @@ def list(
                 offset=offset,
                 filters=filters,
                 projection=projection,
+                cursor=cursor,
+                include_total=list_params["include_total"],
+                total_mode=list_params.get("total_mode", CountModes.exact),
+                messages_limit=messages_limit,
+            )
+            return ConversationList(
+                items=items,
+                offset=offset,
+                total=count,
+                next_cursor=next_cursor(items, limit, conversation_store.cursor_keys),
             )
-            return ConversationList(items=items, offset=offset, total=count)
         except ValidationError as e:
             raise HTTPException(status_code=422, detail=e.errors())
 
@@ -199,7 +220,9 @@ async def conversation(
     body: ConversationBody,
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
     workspace: Annotated[Workspace | None, Depends(get_current_workspace)],
-    conversation_store: ConversationStore = Depends(factory_conversation_store),
+    conversation_store: AsyncConversationStore = Depends(
+        factory_async_conversation_store
+    ),
     message_store: ChatMessageStore = Depends(factory_message_store),
     admin_or_scope: AdminOrScopes = Depends(
         is_admin_or_has_scopes(scopes=[Permissions.UPDATE_CONVERSATIONS.value])
@@ -207,24 +230,23 @@ async def conversation(
 ):
     workspace_id = workspace.id
 
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-
-        def _add_messages(ai_content: str):
-            # Open a new TX because the main tx gets closed after the response is sent which is before the cb is invoked
-            with SQLAlchemyTransactionContext().manage() as tx_context:
-                chat_history = LangchainChatMessageHistory(
-                    conversation_id=conversation_id,
-                    workspace_id=workspace_id,
-                    tx_context=tx_context,
-                    store=message_store,
-                )
-                add_messages(
-                    chat_history=chat_history,
-                    user_input=body.input,
-                    ai_content=ai_content,
-                )
+    def _add_messages(ai_content: str):
+        # runs once the stream is over, in a worker thread
+        with SQLAlchemyTransactionContext().manage() as tx_context:
+            chat_history = LangchainChatMessageHistory(
+                conversation_id=conversation_id,
+                workspace_id=workspace_id,
+                tx_context=tx_context,
+                store=message_store,
+            )
+            add_messages(
+                chat_history=chat_history,
+                user_input=body.input,
+                ai_content=ai_content,
+            )
 
-        ar = conversation_store.get_by_id(
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        ar = await conversation_store.get_by_id(
             conversation_id=conversation_id,
             workspace_id=workspace_id,
             tx_context=tx_context,
@@ -249,44 +271,50 @@ async def conversation(
                 detail="not conversation owner",
             )
 
-        app_store = factory_app_store()
-        apps, _ = app_store.list(
+    # the app catalog does not depend on the turn, it can be read from a replica
+    async with AsyncSQLAlchemyTransactionContext(read_only=True).manage() as tx_context:
+        app_store = factory_async_app_store()
+        apps, _ = await app_store.list(
             workspace_id=workspace_id, limit=1000, tx_context=tx_context
         )
 
-        dc = {
-            USER_EMAIL_KEY: current_user.email,
-            WS_ID_KEY: ar.workspace_id,
-            CONVERSATION_ID_KEY: ar.id,
-            KNOWN_APPS_KEY: prepare_known_apps_str(apps=apps),
-        }
+    dc = {
+        USER_EMAIL_KEY: current_user.email,
+        WS_ID_KEY: ar.workspace_id,
+        CONVERSATION_ID_KEY: ar.id,
+        KNOWN_APPS_KEY: prepare_known_apps_str(apps=apps),
+    }
+
+    def _create_agent():
+        # tools look up their data while being created, in one unit of work
+        with unit_of_work():
+            return create_agent_for_access_request_conversation(
+                conversation=ar, ws=workspace, data_context=dc
+            )
 
-        agent_executor = create_agent_for_access_request_conversation(
-            conversation=ar, ws=workspace, data_context=dc
-        )
+    agent_executor, config = await asyncio.to_thread(_create_agent)
+
+    input = {
+        MEMORY_KEY: [HumanMessage(content=body.input)],
+        CONVERSATION_TYPE_KEY: ar.type.value,
+    }
+
+    async def _turn():
+        # no connection is held while the LLM streams, the graph's nodes run the
+        # tools in units of work of their own
+        outputs = []
+        async for chunk in streaming(
+            runnable=agent_executor,
+            config=config,
+            ctx=input,
+            event_transformer=sse_client_transformer,
+            callback=outputs.append,
+        ):
+            yield chunk
+        if outputs:
+            await asyncio.to_thread(_add_messages, outputs[-1])
 
-        config = {
-            "configurable": {
-                "thread_id": ar.id,
-                "workspace_id": ar.workspace_id,
-            }
-        }
-
-        input = {
-            MEMORY_KEY: [HumanMessage(content=body.input)],
-            CONVERSATION_TYPE_KEY: ar.type.value,
-        }
-
-        return StreamingResponse(
-            streaming(
-                runnable=agent_executor,
-                config=config,
-                ctx=input,
-                event_transformer=sse_client_transformer,
-                callback=_add_messages,
-            ),
-            media_type="text/event-stream",
-        )
+    return StreamingResponse(_turn(), media_type="text/event-stream")
 
 
 class CancelConvResp(BaseModel):
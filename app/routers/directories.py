@@ -15,6 +15,7 @@ from ..auth import (
     get_current_workspace,
     setup_workspace_vstore,
 )
+from ..counts import CountModes
 from ..models import (
     CurrentUser,
     Directory,
@@ -24,8 +25,10 @@ from ..models import (
     Workspace,
 )
 from ..models_stores import DirectoryStore
+from ..models_stores_async import AsyncDirectoryStore
+from ..pagination import next_cursor
 from ..services import get_service, pagination_params
-from ..sql import SQLAlchemyTransactionContext
+from ..sql import AsyncSQLAlchemyTransactionContext, SQLAlchemyTransactionContext
 
 logger = logging.getLogger(__name__)
 
@@ -115,11 +118,13 @@ def get(
 async def delete(
     directory_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    directory_store: Annotated[DirectoryStore, Depends(get_service(DirectoryStore))],
+    directory_store: Annotated[
+        AsyncDirectoryStore, Depends(get_service(AsyncDirectoryStore))
+    ],
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.DELETE_DIRECTORIES.value])),
 ):
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        directory_store.delete(
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        await directory_store.delete(
             directory_id=directory_id,
             workspace_id=workspace.id,
             tx_context=tx_context,
@@ -142,12 +147,14 @@ async def update_directory(
     body: DirectoryJsonPatchDocument,
     directory_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    directory_store: Annotated[DirectoryStore, Depends(get_service(DirectoryStore))],
+    directory_store: Annotated[
+        AsyncDirectoryStore, Depends(get_service(AsyncDirectoryStore))
+    ],
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_DIRECTORIES.value])),
 ):
     try:
-        with SQLAlchemyTransactionContext().manage() as tx_context:
-            dir = directory_store.get_by_id(
+        async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+            dir = await directory_store.get_by_id(
                 directory_id=directory_id,
                 workspace_id=workspace.id,
                 tx_context=tx_context,
@@ -160,7 +167,7 @@ async def update_directory(
             patch = jsonpatch.JsonPatch(body_dict["patch"])
             dir_updated_dict = patch.apply(dir_dict)
             dir_updated = Directory(**dir_updated_dict)
-            directory = directory_store.update(
+            directory = await directory_store.update(
                 directory=dir_updated, tx_context=tx_context
             )
             return directory
@@ -175,26 +182,32 @@ class DirectoryList(PaginatedListBase):
 @router.get("", response_model=DirectoryList, response_model_exclude_none=True)
 async def list(
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    directory_store: Annotated[DirectoryStore, Depends(get_service(DirectoryStore))],
+    directory_store: Annotated[
+        AsyncDirectoryStore, Depends(get_service(AsyncDirectoryStore))
+    ],
     list_params: dict = Depends(pagination_params),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.READ_DIRECTORIES.value])),
 ):
     limit = list_params.get("limit", 10)
     offset = list_params.get("offset", 0)
     projection = list_params.get("projection", None)
-    with SQLAlchemyTransactionContext().manage() as tx_context:
+    async with AsyncSQLAlchemyTransactionContext(read_only=True).manage() as tx_context:
         try:
-            items, count = directory_store.list(
+            items, count = await directory_store.list(
                 workspace_id=workspace.id,
                 tx_context=tx_context,
                 limit=limit,
                 offset=offset,
                 projection=projection,
+                cursor=list_params.get("cursor"),
+                include_total=list_params["include_total"],
+                total_mode=list_params.get("total_mode", CountModes.exact),
             )
             return DirectoryList(
                 items=items,
                 offset=offset,
                 total=count,
+                next_cursor=next_cursor(items, limit, directory_store.cursor_keys),
             )
         except ValidationError as e:
             raise HTTPException(status_code=422, detail=e.errors())
@@ -207,13 +220,15 @@ async def import_content(
     body: dict[str, Any],
     dir_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    directory_store: Annotated[DirectoryStore, Depends(get_service(DirectoryStore))],
+    directory_store: Annotated[
+        AsyncDirectoryStore, Depends(get_service(AsyncDirectoryStore))
+    ],
     background_tasks: BackgroundTasks,
     ovstore=Depends(setup_workspace_vstore),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_CONTENT.value])),
 ):
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        dir = directory_store.get_by_id(
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        dir = await directory_store.get_by_id(
             directory_id=dir_id, workspace_id=workspace.id, tx_context=tx_context
         )
 
@@ -1,5 +1,9 @@
 from fastapi import APIRouter
 
+from .. import pool_metrics
+from ..auth import auth_api
+from ..checkpoint_cache import checkpoint_cache
+from ..checkpoint_retention import retention_metrics
 from ..health.route import healthCheckRoute
 from ..health.service import HealthCheckFactory
 from ..health.sqlalchemy_service import HealthCheckSQL
@@ -21,3 +25,18 @@ _healthChecks.add(
 )
 
 router.add_api_route("/health", endpoint=healthCheckRoute(factory=_healthChecks))
+
+
+@router.get("/stats/auth")
+def auth_stats():
+    return auth_api.stats()
+
+
+@router.get("/stats/db")
+def db_stats():
+    return pool_metrics.stats()
+
+
+@router.get("/stats/checkpoints")
+def checkpoint_stats():
+    return {**retention_metrics.stats(), "cache": checkpoint_cache.stats()}
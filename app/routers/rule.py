@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field, ValidationError
 from app.authz import Permissions, is_admin_or_has_scopes
 
 from ..auth import get_current_active_user, get_current_workspace
+from ..counts import CountModes
 from ..models import (
     RULE_MUTABLE_FIELDS,
     CurrentUser,
@@ -21,8 +22,10 @@ from ..models import (
     Workspace,
 )
 from ..models_stores import RuleStore
+from ..models_stores_async import AsyncRuleStore
+from ..pagination import next_cursor
 from ..services import get_service, pagination_params
-from ..sql import SQLAlchemyTransactionContext
+from ..sql import AsyncSQLAlchemyTransactionContext, SQLAlchemyTransactionContext
 
 logger = logging.getLogger(__name__)
 
@@ -105,11 +108,11 @@ def get(
 async def delete(
     rule_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    rule_store: RuleStore = Depends(get_service(RuleStore)),
+    rule_store: AsyncRuleStore = Depends(get_service(AsyncRuleStore)),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_RULES.value])),
 ):
-    with SQLAlchemyTransactionContext().manage() as tx_context:
-        rule_store.delete(
+    async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+        await rule_store.delete(
             rule_id=rule_id,
             workspace_id=workspace.id,
             tx_context=tx_context,
@@ -132,12 +135,12 @@ async def update_rule(
     body: RuleJsonPatchDocument,
     rule_id: str,
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    rule_store: RuleStore = Depends(get_service(RuleStore)),
+    rule_store: AsyncRuleStore = Depends(get_service(AsyncRuleStore)),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_RULES.value])),
 ):
     try:
-        with SQLAlchemyTransactionContext().manage() as tx_context:
-            rule = rule_store.get_by_id(
+        async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
+            rule = await rule_store.get_by_id(
                 rule_id=rule_id, workspace_id=workspace.id, tx_context=tx_context
             )
             if not rule:
@@ -148,7 +151,7 @@ async def update_rule(
             patch = jsonpatch.JsonPatch(body_dict["patch"])
             rule_updated_dict = patch.apply(rule_dict)
             rule_updated = Rule(**rule_updated_dict)
-            ur = rule_store.update(rule=rule_updated, tx_context=tx_context)
+            ur = await rule_store.update(rule=rule_updated, tx_context=tx_context)
             return ur
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=e.errors())
@@ -162,25 +165,29 @@ class RuleList(PaginatedListBase):
 async def list(
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
     list_params: dict = Depends(pagination_params),
-    rule_store: RuleStore = Depends(get_service(RuleStore)),
+    rule_store: AsyncRuleStore = Depends(get_service(AsyncRuleStore)),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.READ_RULES.value])),
 ):
     limit = list_params.get("limit", 10)
     offset = list_params.get("offset", 0)
     projection = list_params.get("projection", None)
-    with SQLAlchemyTransactionContext().manage() as tx_context:
+    async with AsyncSQLAlchemyTransactionContext(read_only=True).manage() as tx_context:
         try:
-            items, count = rule_store.list(
+            items, count = await rule_store.list(
                 workspace_id=workspace.id,
                 tx_context=tx_context,
                 limit=limit,
                 offset=offset,
                 projection=projection,
+                cursor=list_params.get("cursor"),
+                include_total=list_params["include_total"],
+                total_mode=list_params.get("total_mode", CountModes.exact),
             )
             return RuleList(
                 items=items,
                 offset=offset,
                 total=count,
+                next_cursor=next_cursor(items, limit, rule_store.cursor_keys),
             )
         except ValidationError as e:
             raise HTTPException(status_code=422, detail=e.errors())
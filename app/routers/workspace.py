@@ -16,32 +16,13 @@ from ..auth import (
     CurrentUser,
     get_current_active_user,
     get_current_workspace,
-    setup_workspace_vstore,
 )
-from ..models import JsonPatchDocument, PatchOperation, Workspace
-from ..models_stores import (
-    ApplicationStore,
-    ChatMessageStore,
-    CheckpointStore,
-    ConversationStore,
-    DirectoryStore,
-    RuleStore,
-    WorkspaceStore,
-)
-from ..services import (
-    factory_app_store,
-    factory_checkpointer,
-    factory_conversation_store,
-    factory_dir_store,
-    factory_message_store,
-    factory_rule_store,
-    factory_vault,
-    get_service,
-)
-from ..sql import SQLAlchemyTransactionContext
-from ..tx import TransactionContext
-from ..vault.api import VaultAPI
-from ..vector_store import delete_store
+from ..models import JsonPatchDocument, PatchOperation, Workspace, WorkspacePurge
+from ..models_stores import WorkspacePurgeStore, WorkspaceStore
+from ..models_stores_async import AsyncWorkspaceStore
+from ..services import get_service
+from ..sql import AsyncSQLAlchemyTransactionContext, SQLAlchemyTransactionContext
+from ..workspace_purge import WorkspacePurger
 
 logger = logging.getLogger(__name__)
 
@@ -117,108 +98,76 @@ def get(
         return ws
 
 
-def wipe_workspace(
-    workspace: Workspace,
+@router.delete(
+    "/{workspace_id}",
+    response_model=WorkspacePurge,
+    response_model_exclude={"requested_by"},
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def delete(
+    workspace_id: str,
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
-    tx_context: TransactionContext,
-    workspace_store: WorkspaceStore,
-    msg_store: ChatMessageStore,
-    conversation_store: ConversationStore,
-    app_store: ApplicationStore,
-    dir_store: DirectoryStore,
-    rule_store: RuleStore,
-    checkpoint_store: CheckpointStore,
     background_tasks: BackgroundTasks,
-    ovstore,
+    workspace_store: Annotated[WorkspaceStore, Depends(get_service(WorkspaceStore))],
+    purger: Annotated[WorkspacePurger, Depends(get_service(WorkspacePurger))],
+    _=Depends(is_admin_or_has_scopes(scopes=[Permissions.DELETE_WORKSPACES.value])),
 ):
-    delete_store(ovstore=ovstore)
-    msg_store.delete_for_workspace(workspace_id=workspace.id, tx_context=tx_context)
-    conversation_store.delete_for_workspace(
-        workspace_id=workspace.id, tx_context=tx_context
-    )
-    app_store.delete_for_workspace(workspace_id=workspace.id, tx_context=tx_context)
-    dir_store.delete_for_workspace(workspace_id=workspace.id, tx_context=tx_context)
-    rule_store.delete_for_workspace(workspace_id=workspace.id, tx_context=tx_context)
-    checkpoint_store.delete_for_workspace(
-        workspace_id=workspace.id, tx_context=tx_context
-    )
+    """
+    Marks the workspace as deleting and deletes its data in the background, the
+    progress is reported by GET /workspaces/{workspace_id}/purge.
+    """
+    with SQLAlchemyTransactionContext().manage() as tx_context:
+        workspace = None
+        if current_user.workspace_id is not None:
+            workspace = workspace_store.get_by_id(
+                workspace_id=current_user.workspace_id, tx_context=tx_context
+            )
+        if workspace is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="workspace not found",
+            )
+        # Do we still need this check?
+        if current_user.email != workspace.created_by or workspace_id != workspace.id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authorized to delete this workspace",
+            )
 
-    vault: VaultAPI = factory_vault()
-    ws_secrets = vault.list_secrets(workspace_id=workspace.id)
-    for name in ws_secrets:
-        vault.delete_secret(workspace_id=workspace.id, path=name)
+        purge = purger.request(
+            workspace=workspace, current_user=current_user, tx_context=tx_context
+        )
 
-    workspace_store.delete(
-        workspace=workspace,
-        current_user=current_user,
-        background_tasks=background_tasks,
-        tx_context=tx_context,
-    )
+    background_tasks.add_task(purger.run, workspace.id)
+    return purge
 
 
-@router.delete("/{workspace_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete(
+@router.get(
+    "/{workspace_id}/purge",
+    response_model=WorkspacePurge,
+    response_model_exclude={"requested_by"},
+)
+def get_purge(
     workspace_id: str,
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
-    workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    background_tasks: BackgroundTasks,
-    workspace_store: Annotated[WorkspaceStore, Depends(get_service(WorkspaceStore))],
-    msg_store: Annotated[ChatMessageStore, Depends(factory_message_store)],
-    conversation_store: Annotated[
-        ConversationStore, Depends(factory_conversation_store)
+    purge_store: Annotated[
+        WorkspacePurgeStore, Depends(get_service(WorkspacePurgeStore))
     ],
-    app_store: Annotated[ApplicationStore, Depends(factory_app_store)],
-    dir_store: Annotated[DirectoryStore, Depends(factory_dir_store)],
-    rule_store: Annotated[RuleStore, Depends(factory_rule_store)],
-    checkpoint_store: Annotated[CheckpointStore, Depends(factory_checkpointer)],
-    ovstore=Depends(setup_workspace_vstore),
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.DELETE_WORKSPACES.value])),
 ):
-    # Do we still need this check?
-    if current_user.email != workspace.created_by or workspace_id != workspace.id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authorized to delete this workspace",
-        )
-
+    # polled right after DELETE returned 202, a lagging replica would not have the
+    # purge (or its latest step) yet, read it from the primary
     with SQLAlchemyTransactionContext().manage() as tx_context:
-        current_ws = workspace_store.get_by_id(
-            workspace_id=workspace_id, tx_context=tx_context
+        purge = purge_store.get(workspace_id, tx_context=tx_context)
+    # the workspace may be gone already, membership is checked against the purge
+    if purge is None or current_user.workspace_id not in (
+        purge.workspace_id,
+        purge.external_id,
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="workspace purge not found"
         )
-        if current_ws is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="workspace not found",
-            )
-        try:
-            wipe_workspace(
-                workspace=current_ws,
-                current_user=current_user,
-                tx_context=tx_context,
-                workspace_store=workspace_store,
-                conversation_store=conversation_store,
-                background_tasks=background_tasks,
-                msg_store=msg_store,
-                app_store=app_store,
-                dir_store=dir_store,
-                rule_store=rule_store,
-                checkpoint_store=checkpoint_store,
-                ovstore=ovstore,
-            )
-        except Exception as e:
-            if hasattr(e, "orig") and e.orig is not None:
-                error_info = str(e.orig)
-                if "foreign key" in error_info.lower():
-                    raise HTTPException(
-                        status_code=status.HTTP_412_PRECONDITION_FAILED,
-                        detail="constraint violation.",
-                    )
-            else:
-                # For other types of IntegrityErrors, you might want to handle them differently
-                logger.exception("Failed to delete workspace", exc_info=e)
-                raise HTTPException(
-                    status_code=400, detail="Database operation failed."
-                )
+    return purge
 
 
 class WorkspacePatchOperation(PatchOperation):
@@ -244,17 +193,19 @@ async def update_org(
     workspace_id: str,
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
     workspace: Annotated[Workspace, Depends(get_current_workspace)],
-    workspace_store: Annotated[WorkspaceStore, Depends(get_service(WorkspaceStore))],
+    workspace_store: Annotated[
+        AsyncWorkspaceStore, Depends(get_service(AsyncWorkspaceStore))
+    ],
     _=Depends(is_admin_or_has_scopes(scopes=[Permissions.UPDATE_WORKSPACES.value])),
 ):
     try:
-        with SQLAlchemyTransactionContext().manage() as tx_context:
+        async with AsyncSQLAlchemyTransactionContext().manage() as tx_context:
             ws_dict = workspace.model_dump()
             body_dict = body.model_dump()
             patch = jsonpatch.JsonPatch(body_dict["patch"])
             ws_updated_dict = patch.apply(ws_dict)
             ws_updated = Workspace(**ws_updated_dict)
-            workspace = workspace_store.update(
+            workspace = await workspace_store.update(
                 workspace=ws_updated, tx_context=tx_context
             )
             return workspace
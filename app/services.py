@@ -1,10 +1,11 @@
-from typing import List
+from typing import Annotated, List
 
 import injector
 from fastapi import Query
 
 from app.registration_provider import RegistrationProviderInterface
 
+from .counts import CountModes
 from .models_stores import (
     ApplicationStore,
     ChatMessageStore,
@@ -15,6 +16,13 @@ from .models_stores import (
     UserStore,
     WorkspaceStore,
 )
+from .models_stores_async import (
+    AsyncApplicationStore,
+    AsyncConversationStore,
+    AsyncDirectoryStore,
+    AsyncRuleStore,
+    AsyncWorkspaceStore,
+)
 from .vault.api import VaultAPI
 
 _service_registry: injector.Injector = None
@@ -82,6 +90,26 @@ def factory_rule_store():
     return service_registry().get(RuleStore)
 
 
+def factory_async_ws_store():
+    return service_registry().get(AsyncWorkspaceStore)
+
+
+def factory_async_conversation_store():
+    return service_registry().get(AsyncConversationStore)
+
+
+def factory_async_app_store():
+    return service_registry().get(AsyncApplicationStore)
+
+
+def factory_async_dir_store():
+    return service_registry().get(AsyncDirectoryStore)
+
+
+def factory_async_rule_store():
+    return service_registry().get(AsyncRuleStore)
+
+
 def factory_vault():
     return service_registry().get(VaultAPI)
 
@@ -92,8 +120,29 @@ def factory_reg_provider():
 
 async def pagination_params(
     q: str | None = None,
-    offset: int = 0,
+    offset: int | None = None,
     limit: int = 10,
     projection: List[str] = Query([]),
+    cursor: str | None = None,
+    include_total: Annotated[
+        bool | None,
+        Query(
+            description="Count the matching items into total, defaults to true "
+            "when an offset is sent and to false otherwise"
+        ),
+    ] = None,
+    total_mode: CountModes = CountModes.exact,
 ):
-    return {"q": q, "offset": offset, "limit": limit, "projection": projection}
+    # totals cost an extra count query, computed on demand, or for clients still
+    # paging by offset
+    if include_total is None:
+        include_total = offset is not None
+    return {
+        "q": q,
+        "offset": offset or 0,
+        "limit": limit,
+        "projection": projection,
+        "cursor": cursor,
+        "include_total": include_total,
+        "total_mode": total_mode,
+    }
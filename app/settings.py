@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -5,6 +8,20 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
     ENV: str = "production"
     DB_URI: str
+    # defaults to DB_URI with its asyncio driver (asyncpg, aiosqlite)
+    ASYNC_DB_URI: str = ""
+    # read only store operations go to this replica when set (sync and asyncio)
+    DB_REPLICA_URI: str = ""
+    # logs every statement, development only
+    DB_ECHO: bool = False
+    # pool sizing of each engine (ignored for sqlite), timeout and recycle in seconds
+    DB_POOL_SIZE: int = 10
+    DB_POOL_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10
+    DB_POOL_RECYCLE: int = 1800
+    # postgres statement_timeout and lock_timeout in ms (0 disables)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_LOCK_TIMEOUT_MS: int = 5000
     VSTORE_URI: str
     VSTORE_EMBEDDING: str = "openai"
     # default to empty as in mem vault does not require a value
@@ -12,6 +29,56 @@ class Settings(BaseSettings):
     # oauth
     OAUTH2_OPENID_CONFIGURATION: str
     OAUTH2_AUDIENCE: str
+    # the discovery document is persisted here (empty to disable) and refreshed in
+    # the background once older than lifespan seconds
+    OAUTH2_OPENID_CONFIGURATION_CACHE_FILE: str = os.path.join(
+        tempfile.gettempdir(), "accessbot-openid-configuration.json"
+    )
+    OAUTH2_OPENID_CONFIGURATION_LIFESPAN: int = 3600
+    # seconds the signing keys are considered fresh
+    OAUTH2_JWKS_LIFESPAN: int = 360
+    # min seconds between refetches triggered by an unknown kid
+    OAUTH2_JWKS_MIN_REFETCH_INTERVAL: int = 30
+    # verified tokens are cached until they expire (minus leeway seconds)
+    OAUTH2_TOKEN_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    OAUTH2_TOKEN_CACHE_LEEWAY: int = 30
+    # userinfo is cached up to ttl seconds (never past the token's expiry), failures
+    # for negative ttl seconds
+    OAUTH2_USERINFO_CACHE_TTL: int = 300
+    OAUTH2_USERINFO_NEGATIVE_CACHE_TTL: int = 10
+    OAUTH2_USERINFO_MAX_CONNECTIONS: int = 20
+    # workspaces are cached per request and process wide for ttl seconds (0 disables)
+    WORKSPACE_CACHE_TTL: int = 60
+    WORKSPACE_CACHE_MAXSIZE: int = 1000
+    # workspaces are deleted in the background, batch size rows per table and
+    # transaction, a running purge not updated for stale after seconds is taken over
+    WORKSPACE_PURGE_BATCH_SIZE: int = 1000
+    WORKSPACE_PURGE_STALE_AFTER: int = 300
+    # list totals computed in the cached mode are kept up to ttl seconds (0 disables)
+    COUNT_CACHE_TTL: int = 60
+    COUNT_CACHE_MAXSIZE: int = 10000
+    # graph checkpoints are saved with the asyncio engine, offload serde moves their
+    # (de)serialization to a worker thread (pays off for large checkpoints only)
+    CHECKPOINT_ASYNC: bool = True
+    CHECKPOINT_OFFLOAD_SERDE: bool = False
+    # checkpoints kept per thread (plus the latest of every namespace, 0 keeps all),
+    # applied when saving if inline (at most once per inline interval seconds per
+    # thread, 0 on every save) and by a compaction every interval seconds (0
+    # disables) batch size threads per transaction
+    CHECKPOINT_KEEP_LAST: int = 20
+    CHECKPOINT_COMPACT_INLINE: bool = True
+    CHECKPOINT_COMPACT_INLINE_INTERVAL: int = 60
+    CHECKPOINT_COMPACT_INTERVAL: int = 3600
+    CHECKPOINT_COMPACT_BATCH_SIZE: int = 100
+    # "tagged" (msgpack, compressed from compress min bytes, 0 disables) or "json"
+    # (LangGraph's default), either reads rows written by the other
+    CHECKPOINT_SERDE: str = "tagged"
+    CHECKPOINT_COMPRESS_MIN_BYTES: int = 2048
+    # the latest checkpoint of threads is cached per process up to max bytes (0
+    # disables) for ttl seconds, hits are checked against the database for what
+    # other processes saved since
+    CHECKPOINT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHECKPOINT_CACHE_TTL: int = 300
     # llm
     LLM_MODEL: str = "openai://gpt-4o"
     SMALL_LLM_MODEL: str = "openai://gpt-4o-mini"
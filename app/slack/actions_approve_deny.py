@@ -1,8 +1,8 @@
-import asyncio
 import copy
 
 from slack_sdk import WebClient
 
+from ..event_loop import run_on_main_loop
 from ..llm.conversation import make_conversation
 from ..services import factory_conversation_store, factory_user_store
 from ..sql import SQLAlchemyTransactionContext
@@ -57,7 +57,7 @@ def approve_or_deny(
                 input=conv_text,
                 tx_context=tx_context,
             )
-            _ = asyncio.new_event_loop().run_until_complete(co_routine)
+            _ = run_on_main_loop(co_routine)
 
         role_name = message_payload["requested_role"]
         requester = message_payload["requester_email"]
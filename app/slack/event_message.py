@@ -1,7 +1,6 @@
-import asyncio
-
 from slack_sdk import WebClient
 
+from ..event_loop import run_on_main_loop
 from ..llm.conversation import make_conversation
 from ..models import Conversation, ConversationStatuses, Workspace
 from ..models_stores import ConversationStore, UserStore
@@ -107,7 +106,7 @@ def answer(client: WebClient, event, logger, say, context):
                 input=event["text"],
                 tx_context=tx_context,
             )
-            result = asyncio.new_event_loop().run_until_complete(co_routine)
+            result = run_on_main_loop(co_routine)
             say(
                 blocks=[
                     {
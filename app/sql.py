@@ -1,28 +1,121 @@
 import logging
-from contextlib import contextmanager
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import URL, Connection, Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
+from . import pool_metrics
 from .settings import settings
-from .tx import TransactionContext
+from .tx import AsyncTransactionContext, TransactionContext
 
 logger = logging.getLogger(__name__)
 
 CONNECT_TIMEOUT = 10
 
-sqlalchemy_engine = create_engine(
-    settings.DB_URI,
-    echo=True,  # Set to False in production
-    pool_pre_ping=True,
-    # connect_args={"connect_timeout": 10},
-)
 
-doc_store_engine = create_engine(
-    settings.VSTORE_URI,
-    echo=True,  # Set to False in production
-    pool_pre_ping=True,
-    # connect_args={"connect_timeout": 10}
-)
+def engine_options(url: URL) -> dict:
+    """Pool sizing and server side timeouts of an engine, as configured in settings"""
+    options = {"echo": settings.DB_ECHO, "pool_pre_ping": True}
+    # sqlite uses a single connection (memory) or file locks, there is nothing to size
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.get_backend_name() == "postgresql":
+        timeouts = {
+            "statement_timeout": settings.DB_STATEMENT_TIMEOUT_MS,
+            "lock_timeout": settings.DB_LOCK_TIMEOUT_MS,
+        }
+        timeouts = {k: str(v) for k, v in timeouts.items() if v > 0}
+        if timeouts and url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": timeouts}
+        elif timeouts:
+            options["connect_args"] = {
+                "options": " ".join(f"-c {k}={v}" for k, v in timeouts.items())
+            }
+    return options
+
+
+def enable_sqlite_savepoints(engine: Engine):
+    """
+    pysqlite defers BEGIN until the first DML, so a SAVEPOINT would start (and its
+    RELEASE commit) a transaction of its own, emit BEGIN ourselves instead.
+    See https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+    """
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def _create_engine(uri: str):
+    url = make_url(uri)
+    engine = create_engine(url, **engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        enable_sqlite_savepoints(engine)
+    return engine
+
+
+sqlalchemy_engine = _create_engine(settings.DB_URI)
+doc_store_engine = _create_engine(settings.VSTORE_URI)
+pool_metrics.register("db", sqlalchemy_engine)
+pool_metrics.register("doc_store", doc_store_engine)
+
+# read only transaction contexts go to the replica when one is configured
+replica_engine: Optional[Engine] = None
+if settings.DB_REPLICA_URI:
+    replica_engine = _create_engine(settings.DB_REPLICA_URI)
+    pool_metrics.register("db_replica", replica_engine)
+
+
+# drivers of the sync engines and their asyncio counterparts
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_db_url(uri: str) -> URL:
+    url = make_url(uri)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername)
+
+
+_async_engine: Optional[AsyncEngine] = None
+_async_replica_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """The asyncio engine, created on first use so sync only processes never need it"""
+    global _async_engine
+    if _async_engine is None:
+        url = async_db_url(settings.ASYNC_DB_URI or settings.DB_URI)
+        _async_engine = create_async_engine(url, **engine_options(url))
+        pool_metrics.register("async_db", _async_engine)
+    return _async_engine
+
+
+def get_async_replica_engine() -> Optional[AsyncEngine]:
+    global _async_replica_engine
+    if _async_replica_engine is None and settings.DB_REPLICA_URI:
+        url = async_db_url(settings.DB_REPLICA_URI)
+        _async_replica_engine = create_async_engine(url, **engine_options(url))
+        pool_metrics.register("async_db_replica", _async_replica_engine)
+    return _async_replica_engine
 
 
 def create_tables():
@@ -33,43 +126,243 @@ def create_tables():
     metadata.create_all(sqlalchemy_engine)
 
 
+class UnitOfWork:
+    """
+    Scope of a request or of one step of a graph run (see unit_of_work), the
+    transaction contexts started within it share what it knows about the run.
+    Commits happen when each outermost transaction context exits, a unit of work
+    never defers them: a context started within another one runs a transaction
+    of its own, committed (and visible to everyone) when it exits, unless it asks
+    to join the outer one with savepoint=True.
+    Connections are checked out when a transaction starts and returned to the
+    pool when it ends, none is held in between (e.g. while the LLM streams).
+    """
+
+    def __init__(self):
+        # set once a read write transaction committed, later reads of the unit of
+        # work are pinned to the primary so they never miss it on a lagging replica
+        self.wrote = False
+
+
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "unit_of_work", default=None
+)
+_current_tx: ContextVar[Optional["SQLAlchemyTransactionContext"]] = ContextVar(
+    "current_tx", default=None
+)
+
+
+def _run_callbacks(callbacks: list[Callable[[], None]]):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("transaction callback failed")
+
+
+def _pinned_to_primary() -> bool:
+    uow = _unit_of_work.get()
+    return uow is not None and uow.wrote
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Scopes a unit of work to the enclosed block (and the tasks and threads it
+    spawns), a nested unit of work reuses the enclosing one.
+    """
+    current = _unit_of_work.get()
+    if current is not None:
+        yield current
+        return
+
+    uow = UnitOfWork()
+    token = _unit_of_work.set(uow)
+    try:
+        yield uow
+    finally:
+        try:
+            _unit_of_work.reset(token)
+        except ValueError:
+            pass  # closed from another context, e.g. an async generator finalizer
+
+
 class SQLAlchemyTransactionContext(TransactionContext):
-    def __init__(self, engine=None):
+    """
+    A transaction on a connection of its own, committed when the context exits.
+    With savepoint=True a context managed within another one (same engine and
+    thread) joins it with a savepoint instead, its writes are then only visible
+    once the outer context commits and a failure rolls back to the savepoint.
+
+    read_only contexts go to the replica (if any), callers opt in where they do
+    not need to see their own recent writes. Within a unit of work that already
+    wrote they stay on the primary.
+    """
+
+    def __init__(self, engine=None, read_only: bool = False, savepoint: bool = False):
+        self.read_only = read_only
+        self.savepoint = savepoint
         if engine is not None:
             self.engine = engine
+        elif read_only and replica_engine is not None and not _pinned_to_primary():
+            self.engine = replica_engine
         else:
             self.engine = sqlalchemy_engine
         self.connection = None
         self.transaction = None
+        self._owns_connection = True
+        self._thread_id = None
+        # the context this one joined with a savepoint
+        self._outer = None
+        self._callbacks = []
+
+    def _can_join(self, outer: Optional["SQLAlchemyTransactionContext"]) -> bool:
+        # connections are not thread safe, threads never join each other
+        return (
+            self.savepoint
+            and outer is not None
+            and outer.engine is self.engine
+            and outer._thread_id == threading.get_ident()
+            and outer.transaction is not None
+            and outer.transaction.is_active
+        )
 
     def start(self):
-        self.connection = self.engine.connect()
-        self.transaction = self.connection.begin()
+        self._thread_id = threading.get_ident()
+        outer = _current_tx.get()
+        if self._can_join(outer):
+            self._owns_connection = False
+            self._outer = outer
+            self.connection = outer.connection
+            self.transaction = self.connection.begin_nested()
+        else:
+            with pool_metrics.measure_checkout(self.engine):
+                self.connection = self.engine.connect()
+            self.transaction = self.connection.begin()
+
+    def after_transaction(self, callback: Callable[[], None]):
+        # a savepoint is not the end of the transaction, its outer context's is
+        if self._outer is not None:
+            self._outer.after_transaction(callback)
+        else:
+            self._callbacks.append(callback)
 
     def commit(self):
         if self.transaction and not self.transaction.is_active:
             return  # Avoid committing if the transaction is already deassociated
         self.transaction.commit()
-        self.connection.close()
-        logger.debug("commit: tx committed, conn closed")
+        if self._owns_connection:
+            self.connection.close()
+        uow = _unit_of_work.get()
+        if uow is not None and not self.read_only:
+            uow.wrote = True
+        logger.debug("commit: tx committed, conn released")
 
     def rollback(self):
         if self.transaction and not self.transaction.is_active:
             return  # Avoid rolling back if the transaction is already deassociated
 
         self.transaction.rollback()
-        self.connection.close()
-        logger.debug("rollback: tx rollbacked, conn closed")
+        if self._owns_connection:
+            self.connection.close()
+        logger.debug("rollback: tx rollbacked, conn released")
 
     @contextmanager
     def manage(self):
+        token = None
         try:
             self.start()
+            token = _current_tx.set(self)
             yield self
             self.commit()
         except Exception:
-            self.rollback()
+            if self.transaction is not None:
+                self.rollback()
             raise
         finally:
-            if self.connection is not None:
+            if token is not None:
+                _current_tx.reset(token)
+            if self.connection is not None and self._owns_connection:
                 self.connection.close()
+            callbacks, self._callbacks = self._callbacks, []
+            _run_callbacks(callbacks)
+
+
+class AsyncSQLAlchemyTransactionContext(AsyncTransactionContext):
+    def __init__(self, engine: Optional[AsyncEngine] = None, read_only: bool = False):
+        self.read_only = read_only
+        if engine is None and read_only and not _pinned_to_primary():
+            engine = get_async_replica_engine()
+        self.engine = engine if engine is not None else get_async_engine()
+        self.connection = None
+        self.transaction = None
+        self._callbacks = []
+
+    def after_transaction(self, callback: Callable[[], None]):
+        self._callbacks.append(callback)
+
+    async def start(self):
+        with pool_metrics.measure_checkout(self.engine):
+            self.connection = await self.engine.connect()
+        self.transaction = await self.connection.begin()
+
+    async def commit(self):
+        if self.transaction and not self.transaction.is_active:
+            return
+        await self.transaction.commit()
+        await self.connection.close()
+        logger.debug("commit: tx committed, conn closed")
+
+    async def rollback(self):
+        if self.transaction and not self.transaction.is_active:
+            return
+
+        await self.transaction.rollback()
+        await self.connection.close()
+        logger.debug("rollback: tx rollbacked, conn closed")
+
+    @asynccontextmanager
+    async def manage(self):
+        try:
+            await self.start()
+            yield self
+            await self.commit()
+        except Exception:
+            if self.transaction is not None:
+                await self.rollback()
+            raise
+        finally:
+            if self.connection is not None:
+                await self.connection.close()
+            callbacks, self._callbacks = self._callbacks, []
+            _run_callbacks(callbacks)
+
+
+class ConnectionTransactionContext(TransactionContext):
+    """
+    Exposes the sync connection of an async transaction (see AsyncConnection.run_sync)
+    to the sync stores, the transaction itself is owned by the async context.
+    """
+
+    def __init__(
+        self,
+        connection: Connection,
+        owner: Optional[AsyncTransactionContext] = None,
+    ):
+        self.connection = connection
+        self.owner = owner
+
+    def after_transaction(self, callback: Callable[[], None]):
+        if self.owner is not None:
+            self.owner.after_transaction(callback)
+        else:
+            callback()
+
+    def start(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
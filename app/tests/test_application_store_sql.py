@@ -1,8 +1,10 @@
 import pytest
+from fastapi import HTTPException
 from sqlalchemy.engine import create_engine
 
 from app.models import Application
 from app.models_stores_sql import ApplicationStoreSQL
+from app.pagination import next_cursor
 from app.sql import SQLAlchemyTransactionContext
 
 
@@ -47,3 +49,73 @@ class TestWorkspaceStoreSQL:
             lws = self.test_store.get_by_name("fquery", "1", tx_context=tx_context)
             assert lws is not None
             assert lws.id == pws.id
+
+
+@pytest.fixture(scope="class")
+def apps_db(request):
+    engine = create_engine("sqlite:///:memory:")
+    test_store = ApplicationStoreSQL()
+    test_store.create_tables(engine)
+    with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+        for i in range(7):
+            test_store.insert(
+                Application(workspace_id="1", name=f"app{i}", aliases=[]),
+                tx_context=tx_context,
+            )
+    request.cls.engine = engine
+    request.cls.test_store = test_store
+
+
+@pytest.mark.usefixtures("apps_db")
+class TestApplicationStoreSQLPagination:
+    def test_cursor_pagination(self):
+        names, cursor = [], None
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            while True:
+                apps, total = self.test_store.list(
+                    workspace_id="1",
+                    limit=3,
+                    cursor=cursor,
+                    include_total=False,
+                    tx_context=tx_context,
+                )
+                assert total is None
+                names += [a.name for a in apps]
+                cursor = next_cursor(apps, 3, self.test_store.cursor_keys)
+                if cursor is None:
+                    break
+
+        assert names == [f"app{i}" for i in range(7)]
+
+    def test_cursor_includes_keys_missing_from_projection(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            apps, total = self.test_store.list(
+                workspace_id="1", limit=2, projection=["aliases"], tx_context=tx_context
+            )
+            assert total == 7
+            cursor = next_cursor(apps, 2, self.test_store.cursor_keys)
+            apps, _ = self.test_store.list(
+                workspace_id="1", limit=2, cursor=cursor, tx_context=tx_context
+            )
+            assert [a.name for a in apps] == ["app2", "app3"]
+
+    def test_invalid_cursor(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            with pytest.raises(HTTPException) as exc_info:
+                self.test_store.list(
+                    workspace_id="1", cursor="not-a-cursor", tx_context=tx_context
+                )
+            assert exc_info.value.status_code == 400
+
+    def test_update_returns_persisted_row(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            app = self.test_store.get_by_name("app0", "1", tx_context=tx_context)
+            app.aliases = ["zero"]
+            updated = self.test_store.update(app, tx_context=tx_context)
+            assert updated.aliases == ["zero"]
+            assert updated.created_at == app.created_at
+
+            app.workspace_id = "2"
+            with pytest.raises(HTTPException) as exc_info:
+                self.test_store.update(app, tx_context=tx_context)
+            assert exc_info.value.status_code == 404
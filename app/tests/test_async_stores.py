@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.engine import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Application
+from app.models_stores_async import AsyncApplicationStore
+from app.models_stores_sql import ApplicationStoreSQL
+from app.sql import AsyncSQLAlchemyTransactionContext, async_db_url
+
+
+@pytest.fixture(scope="class")
+def async_db(request, tmp_path_factory):
+    # in memory sqlite databases are per connection, share a file between engines
+    uri = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    store = ApplicationStoreSQL()
+    store.create_tables(create_engine(uri))
+
+    request.cls.engine = create_async_engine(async_db_url(uri))
+    request.cls.store = AsyncApplicationStore(store)
+    yield
+    asyncio.run(request.cls.engine.dispose())
+
+
+@pytest.mark.usefixtures("async_db")
+class TestAsyncStores:
+    def test_async_db_url(self):
+        assert async_db_url("sqlite:///:memory:").drivername == "sqlite+aiosqlite"
+        url = async_db_url("postgresql://u:p@localhost/db")
+        assert url.drivername == "postgresql+asyncpg"
+        assert url.database == "db"
+
+    def test_insert_and_get(self):
+        async def run():
+            ctx = AsyncSQLAlchemyTransactionContext(engine=self.engine)
+            async with ctx.manage() as tx_context:
+                app = await self.store.insert(
+                    Application(workspace_id="1", name="jira", aliases=["jr"]),
+                    tx_context=tx_context,
+                )
+            ctx = AsyncSQLAlchemyTransactionContext(engine=self.engine)
+            async with ctx.manage() as tx_context:
+                by_id = await self.store.get_by_id(app.id, "1", tx_context=tx_context)
+                by_alias = await self.store.get_by_name("jr", "1", tx_context)
+                apps, total = await self.store.list(
+                    workspace_id="1", tx_context=tx_context
+                )
+            return app, by_id, by_alias, apps, total
+
+        app, by_id, by_alias, apps, total = asyncio.run(run())
+        assert by_id.id == app.id
+        assert by_alias.id == app.id
+        assert [a.id for a in apps] == [app.id]
+        assert total == 1
+
+    def test_rollback_on_error(self):
+        async def run():
+            ctx = AsyncSQLAlchemyTransactionContext(engine=self.engine)
+            with pytest.raises(HTTPException):
+                async with ctx.manage() as tx_context:
+                    await self.store.insert(
+                        Application(workspace_id="2", name="okta", aliases=[]),
+                        tx_context=tx_context,
+                    )
+                    raise HTTPException(status_code=400)
+
+            ctx = AsyncSQLAlchemyTransactionContext(engine=self.engine)
+            async with ctx.manage() as tx_context:
+                return await self.store.get_by_name("okta", "2", tx_context)
+
+        assert asyncio.run(run()) is None
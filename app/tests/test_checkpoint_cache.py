@@ -0,0 +1,254 @@
+import asyncio
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import CheckpointTuple, empty_checkpoint
+from langgraph.graph import StateGraph
+from langgraph.graph.message import add_messages
+from sqlalchemy import event
+from sqlalchemy.engine import create_engine
+
+from app.checkpoint_cache import LatestCheckpointCache
+from app.models_stores_sql import CheckpointStoreSQL
+from app.sql import SQLAlchemyTransactionContext
+
+
+def _config(thread_id: str) -> dict:
+    return {
+        "configurable": {
+            "workspace_id": "1",
+            "thread_id": thread_id,
+            "checkpoint_ns": "",
+        }
+    }
+
+
+def _tuple(step: int) -> CheckpointTuple:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"step": step}
+    checkpoint["channel_versions"] = {"step": step}
+    config = {"configurable": {"thread_id": "t", "checkpoint_id": checkpoint["id"]}}
+    return CheckpointTuple(config, checkpoint, {"step": step})
+
+
+class TestLatestCheckpointCache:
+    def test_put_and_get(self):
+        cache = LatestCheckpointCache()
+        key = ("1", "t", "")
+        saved = _tuple(1)
+        cache.put(key, saved, base_size=100, channel_sizes={"step": 10})
+
+        cached = cache.get(key)
+        assert cached.checkpoint == saved.checkpoint
+        assert cache.get(key, saved.checkpoint["id"]).metadata == {"step": 1}
+        # updated in place by LangGraph, the cached one stays as saved
+        cached.checkpoint["channel_versions"]["step"] = 2
+        assert cache.get(key).checkpoint["channel_versions"] == {"step": 1}
+        assert cache.get(key, "other") is None
+        assert cache.get(("1", "other", "")) is None
+
+        stats = cache.stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 2
+        assert stats["hit_rate"] == 0.6
+        assert stats["bytes"] == 100 + 10 + 1024
+
+    def test_writes(self):
+        cache = LatestCheckpointCache()
+        key = ("1", "t", "")
+        saved = _tuple(1)
+        cache.put(key, saved, base_size=100, channel_sizes={})
+        cache.put_writes(key, saved.checkpoint["id"], [("b", 0, "c", 1)], 10)
+        cache.put_writes(key, saved.checkpoint["id"], [("a", 1, "c", 3)], 10)
+        cache.put_writes(key, saved.checkpoint["id"], [("a", 0, "c", 2)], 10)
+        # writes of another checkpoint
+        cache.put_writes(key, "other", [("a", 2, "c", 4)], 10)
+        assert cache.get(key).pending_writes == [
+            ("a", "c", 2),
+            ("a", "c", 3),
+            ("b", "c", 1),
+        ]
+        assert cache.stats()["bytes"] == 100 + 30 + 1024
+
+    def test_older_checkpoint_not_cached(self):
+        cache = LatestCheckpointCache()
+        key = ("1", "t", "")
+        older, newer = _tuple(1), _tuple(2)
+        cache.put(key, newer, base_size=1, channel_sizes={})
+        cache.put(key, older, base_size=1, channel_sizes={}, notify=False)
+        assert cache.get(key).metadata == {"step": 2}
+
+    def test_eviction_by_memory(self):
+        cache = LatestCheckpointCache(max_bytes=10 * 1024)
+        for i in range(10):
+            cache.put(("1", f"t{i}", ""), _tuple(i), base_size=1024, channel_sizes={})
+        stats = cache.stats()
+        assert stats["entries"] == 5
+        assert stats["evictions"] == 5
+        assert stats["bytes"] <= stats["max_bytes"]
+        assert cache.get(("1", "t0", "")) is None
+        assert cache.get(("1", "t9", "")) is not None
+
+        # larger than the whole cache, never cached
+        cache.put(("1", "t9", ""), _tuple(10), base_size=20 * 1024, channel_sizes={})
+        assert cache.get(("1", "t9", "")) is None
+
+    def test_invalidate(self):
+        cache = LatestCheckpointCache()
+        for key in [
+            ("1", "t1", ""),
+            ("1", "t1", "s"),
+            ("1", "t2", ""),
+            ("2", "t1", ""),
+        ]:
+            cache.put(key, _tuple(1), base_size=1, channel_sizes={})
+
+        cache.invalidate("1", "t1", "s")
+        assert cache.get(("1", "t1", "s")) is None
+        assert cache.get(("1", "t1", "")) is not None
+        cache.invalidate("1", "t1")
+        assert cache.get(("1", "t1", "")) is None
+        assert cache.get(("1", "t2", "")) is not None
+        cache.invalidate("1")
+        assert cache.get(("1", "t2", "")) is None
+        assert cache.get(("2", "t1", "")) is not None
+        assert cache.stats()["invalidations"] == 3
+
+    def test_subscribe(self):
+        published = []
+        cache = LatestCheckpointCache()
+        cache.subscribe(published.append)
+        cache.subscribe(lambda key: 1 / 0)
+        saved = _tuple(1)
+        cache.put(("1", "t", ""), saved, base_size=1, channel_sizes={})
+        cache.put_writes(("1", "t", ""), saved.checkpoint["id"], [], 0)
+        # read from the database, nothing to tell other processes
+        cache.put(("1", "u", ""), saved, base_size=1, channel_sizes={}, notify=False)
+        assert published == [("1", "t", ""), ("1", "t", "")]
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    turns: int
+
+
+def _turn(state: State) -> dict:
+    return {"messages": [AIMessage(content="ok")], "turns": state.get("turns", 0) + 1}
+
+
+@pytest.fixture
+def cached_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    store = CheckpointStoreSQL(engine=engine, cache=LatestCheckpointCache())
+    store.create_tables(engine)
+    return store
+
+
+class TestCheckpointStoreCache:
+    def test_write_through(self, cached_store):
+        store = cached_store
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["a"], "turns": 1}
+        checkpoint["channel_versions"] = {"messages": 1, "turns": 1}
+        saved = asyncio.run(store.aput(_config("t1"), checkpoint, {"step": 1}))
+        asyncio.run(store.aput_writes(saved, [("messages", "b"), ("turns", 2)], "task"))
+
+        cached = asyncio.run(store.aget_tuple(_config("t1")))
+        store.cache = None
+        loaded = asyncio.run(store.aget_tuple(_config("t1")))
+        assert cached == loaded
+        assert cached.pending_writes == [
+            ("task", "messages", "b"),
+            ("task", "turns", 2),
+        ]
+
+    def test_loaded_once(self, cached_store):
+        store = cached_store
+        store.cache = None
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"turns": 1}
+        checkpoint["channel_versions"] = {"turns": 1}
+        saved = asyncio.run(store.aput(_config("t1"), checkpoint, {}))
+        asyncio.run(store.aput_writes(saved, [("turns", 2)], "task"))
+
+        store.cache = LatestCheckpointCache()
+        statements = []
+        event.listen(
+            store.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        first = asyncio.run(store.aget_tuple(_config("t1")))
+        queried = len(statements)
+        assert asyncio.run(store.aget_tuple(_config("t1"))) == first
+        assert asyncio.run(store.aget_tuple(saved)) == first
+        # a hit only checks it is still fresh
+        checks = statements[queried:]
+        assert len(checks) == 2
+        assert all("checkpoints_blobs" not in statement for statement in checks)
+        assert first.pending_writes == [("task", "turns", 2)]
+        assert store.cache.stats()["hits"] == 2
+
+    def test_saved_by_another_process(self, cached_store):
+        store = cached_store
+        other = CheckpointStoreSQL(engine=store.engine, cache=LatestCheckpointCache())
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"turns": 1}
+        checkpoint["channel_versions"] = {"turns": 1}
+        saved = asyncio.run(store.aput(_config("t1"), checkpoint, {"step": 1}))
+        assert asyncio.run(store.aget_tuple(_config("t1"))).metadata == {"step": 1}
+
+        # the other process writes to the checkpoint cached here, then continues
+        asyncio.run(other.aput_writes(saved, [("turns", 2)], "task"))
+        latest = asyncio.run(store.aget_tuple(_config("t1")))
+        assert latest.pending_writes == [("task", "turns", 2)]
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"turns": 2}
+        checkpoint["channel_versions"] = {"turns": 2}
+        asyncio.run(other.aput(saved, checkpoint, {"step": 2}))
+
+        assert asyncio.run(store.aget_tuple(_config("t1"))).metadata == {"step": 2}
+        assert store.cache.stats()["invalidations"] == 2
+
+    def test_graph(self, cached_store):
+        store = cached_store
+        workflow = StateGraph(State)
+        workflow.add_node("turn", _turn)
+        workflow.set_entry_point("turn")
+        workflow.set_finish_point("turn")
+        graph = workflow.compile(checkpointer=store)
+        config = _config("t1")
+
+        async def run():
+            for i in range(3):
+                await graph.ainvoke(
+                    {"messages": [HumanMessage(content=f"q{i}")]}, config
+                )
+            return await graph.aget_state(config)
+
+        state = asyncio.run(run())
+        assert state.values["turns"] == 3
+        assert [m.content for m in state.values["messages"]] == [
+            "q0",
+            "ok",
+            "q1",
+            "ok",
+            "q2",
+            "ok",
+        ]
+        stats = store.cache.stats()
+        # the first turn of the thread misses, the following ones and the state hit
+        assert stats["misses"] == 1
+        assert stats["hits"] == 3
+
+        cached = state
+        store.cache = None
+        assert asyncio.run(graph.aget_state(config)).values == cached.values
+
+    def test_delete_for_workspace(self, cached_store):
+        store = cached_store
+        asyncio.run(store.aput(_config("t1"), empty_checkpoint(), {}))
+        with SQLAlchemyTransactionContext(engine=store.engine).manage() as tx:
+            store.delete_for_workspace("1", tx_context=tx)
+        assert asyncio.run(store.aget_tuple(_config("t1"))) is None
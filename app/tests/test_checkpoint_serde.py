@@ -0,0 +1,95 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from sqlalchemy.engine import create_engine
+
+from app.checkpoint_serde import JsonSerializer, TaggedSerializer, checkpoint_serde
+from app.models_stores_sql import CheckpointStoreSQL
+
+
+def _checkpoint(turns: int) -> dict:
+    checkpoint = empty_checkpoint()
+    messages = []
+    for i in range(turns):
+        messages += [
+            HumanMessage(content=f"please grant me access to repo {i}"),
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "request", "args": {"app": i}, "id": f"c{i}"}],
+            ),
+            ToolMessage(content="requested", tool_call_id=f"c{i}"),
+            AIMessage(content=f"I have requested access to repo {i} for you."),
+        ]
+    checkpoint["channel_values"] = {"messages": messages, "app_id": "a1"}
+    checkpoint["channel_versions"] = {"messages": turns, "app_id": 1}
+    return checkpoint
+
+
+class TestTaggedSerializer:
+    def test_roundtrip(self):
+        serde = TaggedSerializer(compress_min_bytes=0)
+        checkpoint = _checkpoint(3)
+        data = serde.dumps(checkpoint)
+        assert data[0] == 0x01
+        loaded = serde.loads(data)
+        assert loaded == checkpoint
+        assert isinstance(loaded["channel_values"]["messages"][1], AIMessage)
+        assert serde.loads(serde.dumps(b"raw")) == b"raw"
+
+    def test_compression(self):
+        serde = TaggedSerializer(compress_min_bytes=1024)
+        small, large = _checkpoint(1), _checkpoint(50)
+        assert serde.dumps(small)[0] == 0x01
+        data = serde.dumps(large)
+        assert data[0] == 0x81
+        assert len(data) < len(TaggedSerializer(compress_min_bytes=0).dumps(large))
+        assert serde.loads(data) == large
+
+    def test_mixed_formats(self):
+        checkpoint = _checkpoint(2)
+        legacy = JsonPlusSerializer().dumps(checkpoint)
+        tagged = TaggedSerializer(compress_min_bytes=64).dumps(checkpoint)
+        for serde in (TaggedSerializer(), JsonSerializer()):
+            assert serde.loads(legacy) == checkpoint
+            assert serde.loads(tagged) == checkpoint
+        # the json serializer writes what LangGraph's default one reads
+        json = JsonSerializer().dumps({"step": 1})
+        assert JsonPlusSerializer().loads(json) == {"step": 1}
+
+    def test_checkpoint_serde(self):
+        assert isinstance(checkpoint_serde("tagged", 10), TaggedSerializer)
+        assert checkpoint_serde("tagged", 10).compress_min_bytes == 10
+        assert isinstance(checkpoint_serde("json", 10), JsonSerializer)
+
+    def test_store_with_mixed_rows(self):
+        engine = create_engine("sqlite:///:memory:")
+        store = CheckpointStoreSQL(engine=engine)
+        store.create_tables(engine)
+        config = {
+            "configurable": {"workspace_id": "1", "thread_id": "t", "checkpoint_ns": ""}
+        }
+        # saved with LangGraph's default serializer
+        checkpoint = _checkpoint(1)
+        saved = asyncio.run(store.aput(config, checkpoint, {"step": 1}))
+
+        store.serde = TaggedSerializer(compress_min_bytes=256)
+        checkpoint = _checkpoint(10)
+        saved = asyncio.run(
+            store.aput(saved, checkpoint, {"step": 2}, {"messages": 10})
+        )
+        asyncio.run(store.aput_writes(saved, [("messages", ["x"])], "task"))
+
+        async def listed():
+            return [t async for t in store.alist(config)]
+
+        listed = asyncio.run(listed())
+        assert [t.metadata["step"] for t in listed] == [2, 1]
+        assert listed[0].checkpoint["channel_values"] == checkpoint["channel_values"]
+        assert (
+            listed[1].checkpoint["channel_values"] == _checkpoint(1)["channel_values"]
+        )
+        assert asyncio.run(store.aget_tuple(config)).pending_writes == [
+            ("task", "messages", ["x"])
+        ]
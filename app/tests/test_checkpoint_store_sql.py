@@ -0,0 +1,594 @@
+import asyncio
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph
+from langgraph.graph.message import add_messages
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.checkpoint_cache import LatestCheckpointCache
+from app.checkpoint_retention import CheckpointCompactor, retention_metrics
+from app.models_stores_async import AsyncCheckpointStoreSQL
+from app.models_stores_sql import CheckpointStoreSQL
+from app.sql import SQLAlchemyTransactionContext, async_db_url
+
+
+def _config(thread_id: str, checkpoint_id: str = None) -> dict:
+    configurable = {"workspace_id": "1", "thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _listed(store: CheckpointStoreSQL, config: dict, **kwargs) -> list:
+    async def run():
+        return [t async for t in store.alist(config, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def _step(store: CheckpointStoreSQL, config: dict, step: int) -> dict:
+    """Saves a checkpoint and its writes the way a graph step does"""
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"step": step}
+    saved = asyncio.run(store.aput(config, checkpoint, {"step": step}, {}))
+    asyncio.run(
+        store.aput_writes(saved, [("messages", f"m{step}"), ("next", step)], "task")
+    )
+    return saved
+
+
+@pytest.fixture(scope="class")
+def setup_database(request):
+    engine = create_engine("sqlite:///:memory:")
+    store = CheckpointStoreSQL(engine=engine)
+    store.create_tables(engine)
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    request.cls.store = store
+    request.cls.statements = statements
+
+
+@pytest.mark.usefixtures("setup_database")
+class TestCheckpointStoreSQL:
+    def test_aput_returns_saved_checkpoint(self):
+        checkpoint = empty_checkpoint()
+        saved = asyncio.run(self.store.aput(_config("t0"), checkpoint, {}, {}))
+        assert saved["configurable"]["checkpoint_id"] == checkpoint["id"]
+        assert saved["configurable"]["workspace_id"] == "1"
+
+    def test_latest_with_own_writes(self):
+        config = _config("t1")
+        for step in range(5):
+            config = _step(self.store, config, step)
+
+        self.statements.clear()
+        latest = asyncio.run(self.store.aget_tuple(_config("t1")))
+        # one round trip for the checkpoint and its writes
+        assert len(self.statements) == 1
+        assert latest.checkpoint["channel_values"] == {"step": 4}
+        assert latest.metadata == {"step": 4}
+        assert latest.pending_writes == [
+            ("task", "messages", "m4"),
+            ("task", "next", 4),
+        ]
+        assert latest.parent_config is not None
+
+        parent_id = latest.parent_config["configurable"]["checkpoint_id"]
+        parent = asyncio.run(self.store.aget_tuple(_config("t1", parent_id)))
+        assert parent.checkpoint["channel_values"] == {"step": 3}
+        assert [w[2] for w in parent.pending_writes] == ["m3", 3]
+
+    def test_checkpoint_without_writes(self):
+        checkpoint = empty_checkpoint()
+        asyncio.run(self.store.aput(_config("t2"), checkpoint, {}, {}))
+        saved = asyncio.run(self.store.aget_tuple(_config("t2")))
+        assert saved.checkpoint["id"] == checkpoint["id"]
+        assert saved.pending_writes == []
+        assert saved.parent_config is None
+
+    def test_missing(self):
+        assert asyncio.run(self.store.aget_tuple(_config("nope"))) is None
+        assert asyncio.run(self.store.aget_tuple(_config("t1", "nope"))) is None
+
+
+@pytest.fixture(params=[False, True], ids=["inline_serde", "offload_serde"])
+def async_store(request, tmp_path):
+    # in memory sqlite databases are per connection, share a file between engines
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(uri)
+    async_engine = create_async_engine(async_db_url(uri))
+    store = AsyncCheckpointStoreSQL(
+        engine=engine, async_engine=async_engine, offload_serde=request.param
+    )
+    store.create_tables(engine)
+    yield store
+    asyncio.run(async_engine.dispose())
+
+
+class TestAsyncCheckpointStoreSQL:
+    def test_put_and_get(self, async_store):
+        async def run():
+            config = _config("t1")
+            for step in range(3):
+                checkpoint = empty_checkpoint()
+                checkpoint["channel_values"] = {"step": step}
+                config = await async_store.aput(config, checkpoint, {"step": step})
+                await async_store.aput_writes(config, [("messages", step)], "task")
+
+            latest = await async_store.aget_tuple(_config("t1"))
+            assert latest.checkpoint["channel_values"] == {"step": 2}
+            assert latest.pending_writes == [("task", "messages", 2)]
+            parent_id = latest.parent_config["configurable"]["checkpoint_id"]
+            parent = await async_store.aget_tuple(_config("t1", parent_id))
+            assert parent.metadata == {"step": 1}
+
+            listed = [t async for t in async_store.alist(_config("t1"))]
+            assert [t.metadata["step"] for t in listed] == [2, 1, 0]
+            assert await async_store.aget_tuple(_config("nope")) is None
+
+        asyncio.run(run())
+
+    def test_cache(self, async_store):
+        async_store.cache = LatestCheckpointCache()
+
+        async def run():
+            saved = await async_store.aput(_config("t1"), empty_checkpoint(), {})
+            await async_store.aput_writes(saved, [("messages", 1)], "task")
+            return await async_store.aget_tuple(_config("t1"))
+
+        cached = asyncio.run(run())
+        assert async_store.cache.stats()["hits"] == 1
+        async_store.cache = None
+        assert asyncio.run(async_store.aget_tuple(_config("t1"))) == cached
+
+    def test_other_loop_uses_sync_engine(self, async_store, monkeypatch):
+        sync_gets = []
+        get_tuple = async_store._load_tuple
+        monkeypatch.setattr(
+            async_store,
+            "_load_tuple",
+            lambda config: sync_gets.append(config) or get_tuple(config),
+        )
+        bound, other = asyncio.new_event_loop(), asyncio.new_event_loop()
+        try:
+            saved = bound.run_until_complete(
+                async_store.aput(_config("t2"), empty_checkpoint(), {})
+            )
+            got = other.run_until_complete(async_store.aget_tuple(_config("t2")))
+        finally:
+            bound.close()
+            other.close()
+        assert len(sync_gets) == 1
+        assert (
+            got.config["configurable"]["checkpoint_id"]
+            == (saved["configurable"]["checkpoint_id"])
+        )
+
+
+def _saved(store: CheckpointStoreSQL, thread_id: str) -> tuple[list[int], set[str]]:
+    """The steps of the thread's checkpoints and the ids of those with writes"""
+    listed = _listed(store, _config(thread_id))
+    with store.engine.connect() as conn:
+        writes = conn.execute(
+            store.writes.select().where(store.writes.c.thread_id == thread_id)
+        ).all()
+    return [t.metadata["step"] for t in listed], {w.checkpoint_id for w in writes}
+
+
+@pytest.fixture
+def retention_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    store = CheckpointStoreSQL(engine=engine)
+    store.create_tables(engine)
+    return store
+
+
+class TestCheckpointRetention:
+    def test_inline(self, retention_store):
+        store = retention_store
+        # a subgraph checkpoint saved early in the thread stays as the latest of
+        # its namespace
+        sub = {"configurable": {**_config("t1")["configurable"], "checkpoint_ns": "s"}}
+        _step(store, sub, -1)
+
+        store.keep_last = 3
+        before = retention_metrics.stats()["reclaimed"].get("inline", {})
+        config = _config("t1")
+        for step in range(6):
+            config = _step(store, config, step)
+
+        steps, written = _saved(store, "t1")
+        assert steps == [5, 4, 3]
+        assert [t.metadata["step"] for t in _listed(store, sub)] == [-1]
+        latest = asyncio.run(store.aget_tuple(_config("t1")))
+        assert len(latest.pending_writes) == 2
+        sub_latest = asyncio.run(store.aget_tuple(sub))
+        assert len(sub_latest.pending_writes) == 2
+        assert written == {
+            latest.config["configurable"]["checkpoint_id"],
+            sub_latest.config["configurable"]["checkpoint_id"],
+        }
+
+        after = retention_metrics.stats()["reclaimed"]["inline"]
+        assert after["checkpoints"] - before.get("checkpoints", 0) == 3
+        assert after["bytes"] > before.get("bytes", 0)
+
+    def test_background(self, retention_store):
+        store = retention_store
+        for thread_id in ("t1", "t2", "t3"):
+            config = _config(thread_id)
+            for step in range(5):
+                config = _step(store, config, step)
+        short = _step(store, _config("t4"), 0)
+
+        with SQLAlchemyTransactionContext(engine=store.engine).manage() as tx:
+            threads = store.list_compactable_threads(2, None, 10, tx_context=tx)
+        assert threads == [("1", "t1"), ("1", "t2"), ("1", "t3")]
+
+        compactor = CheckpointCompactor(
+            store, keep_last=2, batch_size=2, interval=0, engine=store.engine
+        )
+        totals = compactor.compact()
+        assert totals["threads"] == 3
+        assert totals["checkpoints"] == 9
+        # the writes of every checkpoint but the latest one
+        assert totals["writes"] == 3 * 4 * 2
+        assert totals["bytes"] > 0
+        last = retention_metrics.stats()["last_compaction"]
+        assert last["checkpoints"] == 9
+
+        for thread_id in ("t1", "t2", "t3"):
+            assert _saved(store, thread_id)[0] == [4, 3]
+        assert _saved(store, "t4") == (
+            [0],
+            {short["configurable"]["checkpoint_id"]},
+        )
+        # nothing left to reclaim
+        assert compactor.compact()["threads"] == 0
+
+    def test_inline_throttled_per_thread(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        store = CheckpointStoreSQL(engine=engine, keep_last=1, compact_interval=60)
+        store.create_tables(engine)
+        for thread_id in ("t1", "t2"):
+            config = _config(thread_id)
+            for step in range(3):
+                config = _step(store, config, step)
+        # retained when the first checkpoint of the thread was saved only
+        assert _saved(store, "t1")[0] == [2, 1, 0]
+        assert _saved(store, "t2")[0] == [2, 1, 0]
+
+    def test_writes_saved_while_compacting(self, retention_store):
+        store = retention_store
+        config = _config("t1")
+        for step in range(2):
+            config = _step(store, config, step)
+
+        concurrent = []
+
+        def step_before_writes_deleted(conn, cursor, statement, *args):
+            if (
+                statement.startswith("DELETE FROM checkpoints_writes")
+                and not concurrent
+            ):
+                concurrent.append(_step(store, config, 2))
+
+        event.listen(store.engine, "before_cursor_execute", step_before_writes_deleted)
+        with SQLAlchemyTransactionContext(engine=store.engine).manage() as tx:
+            reclaimed = store.compact_thread("1", "t1", 10, tx_context=tx)
+        event.remove(store.engine, "before_cursor_execute", step_before_writes_deleted)
+
+        # the writes of the first step only, not those of the step saved meanwhile
+        assert reclaimed["writes"] == 2
+        assert _saved(store, "t1") == (
+            [2, 1, 0],
+            {
+                config["configurable"]["checkpoint_id"],
+                concurrent[0]["configurable"]["checkpoint_id"],
+            },
+        )
+
+    def test_forked_branch_keeps_its_values(self, retention_store):
+        store = retention_store
+
+        def save(parent, values, versions, new_versions):
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = values
+            checkpoint["channel_versions"] = versions
+            return asyncio.run(store.aput(parent, checkpoint, {}, new_versions))
+
+        v1 = store.get_next_version(None, None)
+        c1 = save(
+            _config("t1"), {"messages": ["a"]}, {"messages": v1}, {"messages": v1}
+        )
+        v2 = store.get_next_version(v1, None)
+        c2 = save(c1, {"messages": ["a", "b"]}, {"messages": v2}, {"messages": v2})
+        v3 = store.get_next_version(v2, None)
+        save(c2, {"messages": ["a", "b", "c"]}, {"messages": v3}, {"messages": v3})
+        # replayed from the first checkpoint, messages unchanged
+        turns = store.get_next_version(None, None)
+        fork = save(
+            c1,
+            {"messages": ["a"], "turns": 1},
+            {"messages": v1, "turns": turns},
+            {"turns": turns},
+        )
+
+        with SQLAlchemyTransactionContext(engine=store.engine).manage() as tx:
+            reclaimed = store.compact_thread("1", "t1", 2, tx_context=tx)
+        assert reclaimed["checkpoints"] == 2
+        # the value of v2 only, v1 is still referred to by the fork
+        assert reclaimed["blobs"] == 1
+        saved = asyncio.run(store.aget_tuple(fork))
+        assert saved.checkpoint["channel_values"] == {"messages": ["a"], "turns": 1}
+
+
+class TestCheckpointListing:
+    def test_before_and_limit(self, retention_store):
+        store = retention_store
+        config = _config("t1")
+        for step in range(5):
+            config = _step(store, config, step)
+
+        listed = _listed(store, _config("t1"), limit=2)
+        assert [t.metadata["step"] for t in listed] == [4, 3]
+        listed = _listed(store, _config("t1"), before=listed[-1].config, limit=2)
+        assert [t.metadata["step"] for t in listed] == [2, 1]
+        assert [t.checkpoint["channel_values"] for t in listed] == [
+            {"step": 2},
+            {"step": 1},
+        ]
+
+    def test_filter(self, retention_store):
+        store = retention_store
+        config = _config("t1")
+        for step in range(4):
+            checkpoint = empty_checkpoint()
+            source = "input" if step % 2 else "loop"
+            config = asyncio.run(
+                store.aput(config, checkpoint, {"source": source, "step": step}, {})
+            )
+        # saved before the metadata fields were stored
+        checkpoint = empty_checkpoint()
+        with store.engine.begin() as conn:
+            conn.execute(
+                store.checkpoints.insert(),
+                {
+                    "workspace_id": "1",
+                    "thread_id": "t1",
+                    "checkpoint_ns": "",
+                    "checkpoint_id": checkpoint["id"],
+                    "checkpoint": store.serde.dumps(checkpoint),
+                    "metadata": store.serde.dumps({"source": "input", "step": 9}),
+                },
+            )
+
+        listed = _listed(store, _config("t1"), filter={"source": "input"})
+        assert [t.metadata["step"] for t in listed] == [9, 3, 1]
+        listed = _listed(store, _config("t1"), filter={"source": "input"}, limit=2)
+        assert [t.metadata["step"] for t in listed] == [9, 3]
+        listed = _listed(store, _config("t1"), filter={"source": "loop", "step": 2})
+        assert [t.metadata["step"] for t in listed] == [2]
+        assert _listed(store, _config("t1"), filter={"source": "update"}) == []
+
+    def test_lazy(self, retention_store, monkeypatch):
+        store = retention_store
+        config = _config("t1")
+        for step in range(30):
+            config = _step(store, config, step)
+
+        loads = []
+        serde_loads = store.serde.loads
+        monkeypatch.setattr(
+            store.serde, "loads", lambda data: loads.append(data) or serde_loads(data)
+        )
+        monkeypatch.setattr("app.models_stores_sql.LIST_BATCH_SIZE", 5)
+
+        async def first():
+            listed = store.alist(_config("t1"))
+            try:
+                return await listed.__anext__()
+            finally:
+                await listed.aclose()
+
+        assert asyncio.run(first()).metadata["step"] == 29
+        # the checkpoints and metadata of the first batch only
+        assert len(loads) == 2 * 5
+
+    def test_async_store(self, async_store):
+        async def run():
+            config = _config("t1")
+            for step in range(4):
+                config = await async_store.aput(
+                    config, empty_checkpoint(), {"step": step}
+                )
+            return [
+                t.metadata["step"]
+                async for t in async_store.alist(
+                    _config("t1"), filter={"step": 2}, limit=1
+                )
+            ], [
+                t.metadata["step"]
+                async for t in async_store.alist(_config("t1"), before=config)
+            ]
+
+        assert asyncio.run(run()) == ([2], [2, 1, 0])
+
+    def test_state_history(self, retention_store):
+        graph = _graph(retention_store)
+        config = _config("t1")
+
+        async def run():
+            for i in range(2):
+                await graph.ainvoke(
+                    {"messages": [HumanMessage(content=f"q{i}")]}, config
+                )
+            return [
+                s.values.get("turns")
+                async for s in graph.aget_state_history(
+                    config, filter={"source": "loop"}, limit=3
+                )
+            ]
+
+        # the loop steps of the second turn, then the last one of the first
+        assert asyncio.run(run()) == [2, 1, 1]
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    turns: int
+
+
+def _turn(state: State) -> dict:
+    return {"messages": [AIMessage(content="ok")], "turns": state.get("turns", 0) + 1}
+
+
+def _graph(store: CheckpointStoreSQL):
+    workflow = StateGraph(State)
+    workflow.add_node("turn", _turn)
+    workflow.set_entry_point("turn")
+    workflow.set_finish_point("turn")
+    return workflow.compile(checkpointer=store)
+
+
+def _count(store: CheckpointStoreSQL, table) -> int:
+    with store.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+class TestCheckpointChannelBlobs:
+    def test_unchanged_channels_not_rewritten(self, retention_store):
+        store = retention_store
+        config = _config("t1")
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["a", "b"], "turns": 1}
+        checkpoint["channel_versions"] = {"messages": 1, "turns": 1}
+        saved = asyncio.run(
+            store.aput(config, checkpoint, {}, {"messages": 1, "turns": 1})
+        )
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["a", "b"], "turns": 2}
+        checkpoint["channel_versions"] = {"messages": 1, "turns": 2}
+        asyncio.run(store.aput(saved, checkpoint, {}, {"turns": 2}))
+
+        # messages is stored once, referred to by both checkpoints
+        assert _count(store, store.blobs) == 3
+        latest = asyncio.run(store.aget_tuple(_config("t1")))
+        assert latest.checkpoint["channel_values"] == {
+            "messages": ["a", "b"],
+            "turns": 2,
+        }
+        with store.engine.connect() as conn:
+            row = conn.execute(select(store.checkpoints.c.checkpoint)).first()
+        assert store.serde.loads(row.checkpoint)["channel_values"] == {}
+
+        listed = _listed(store, _config("t1"))
+        assert [t.checkpoint["channel_values"]["turns"] for t in listed] == [2, 1]
+
+    def test_inline_values(self, retention_store):
+        store = retention_store
+        # saved before values were stored by version, or built by hand without
+        # versions, the values are inline
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["a"]}
+        checkpoint["channel_versions"] = {"messages": 3}
+        record = {
+            "workspace_id": "1",
+            "thread_id": "t1",
+            "checkpoint_ns": "",
+            "checkpoint_id": checkpoint["id"],
+            "checkpoint": store.serde.dumps(checkpoint),
+            "metadata": store.serde.dumps({}),
+        }
+        with store.engine.begin() as conn:
+            conn.execute(store.checkpoints.insert(), record)
+        saved = asyncio.run(store.aget_tuple(_config("t1")))
+        assert saved.checkpoint["channel_values"] == {"messages": ["a"]}
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["b"]}
+        asyncio.run(store.aput(_config("t2"), checkpoint, {}))
+        saved = asyncio.run(store.aget_tuple(_config("t2")))
+        assert saved.checkpoint["channel_values"] == {"messages": ["b"]}
+        assert _count(store, store.blobs) == 0
+
+    def test_forks(self, retention_store):
+        store = retention_store
+        versions = {"messages": store.get_next_version(None, None)}
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": ["a"]}
+        checkpoint["channel_versions"] = versions
+        parent = asyncio.run(store.aput(_config("t1"), checkpoint, {}, versions))
+
+        # two turns (or a retry) continuing the same checkpoint
+        forks = {}
+        for value in ["b", "c"]:
+            versions = {
+                "messages": store.get_next_version(
+                    checkpoint["channel_versions"]["messages"], None
+                )
+            }
+            fork = empty_checkpoint()
+            fork["channel_values"] = {"messages": ["a", value]}
+            fork["channel_versions"] = versions
+            saved = asyncio.run(store.aput(parent, fork, {}, versions))
+            forks[saved["configurable"]["checkpoint_id"]] = value
+
+        assert _count(store, store.blobs) == 3
+        for checkpoint_id, value in forks.items():
+            saved = asyncio.run(store.aget_tuple(_config("t1", checkpoint_id)))
+            assert saved.checkpoint["channel_values"] == {"messages": ["a", value]}
+            assert (
+                saved.parent_config["configurable"]["checkpoint_id"]
+                == parent["configurable"]["checkpoint_id"]
+            )
+            assert int(saved.checkpoint["channel_versions"]["messages"]) == 2
+        # follows the versions of threads saved with ints
+        assert 3 < store.get_next_version(3, None) < 5
+
+    def test_graph(self, retention_store):
+        store = retention_store
+        store.keep_last = 2
+        graph = _graph(store)
+        config = _config("t1")
+
+        async def run():
+            for i in range(4):
+                await graph.ainvoke(
+                    {"messages": [HumanMessage(content=f"q{i}")]}, config
+                )
+            return await graph.aget_state(config)
+
+        state = asyncio.run(run())
+        assert state.values["turns"] == 4
+        assert [m.content for m in state.values["messages"]] == [
+            "q0",
+            "ok",
+            "q1",
+            "ok",
+            "q2",
+            "ok",
+            "q3",
+            "ok",
+        ]
+        # the values the two kept checkpoints refer to, older versions are gone
+        assert _count(store, store.checkpoints) == 2
+        with store.engine.connect() as conn:
+            versions = conn.execute(
+                select(store.blobs.c.channel, func.count())
+                .where(store.blobs.c.channel.in_(["messages", "turns"]))
+                .group_by(store.blobs.c.channel)
+            ).all()
+        assert dict(versions) == {"messages": 2, "turns": 2}
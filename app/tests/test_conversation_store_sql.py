@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import create_engine
+
+from app.models import ChatMessage, Conversation, ConversationTypes
+from app.models_stores_sql import ChatMessageStoreSQL, ConversationStoreSQL
+from app.pagination import next_cursor
+from app.sql import SQLAlchemyTransactionContext
+
+
+@pytest.fixture(scope="class")
+def setup_database(request):
+    engine = create_engine("sqlite:///:memory:")
+    test_store = ConversationStoreSQL()
+    test_store.create_tables(engine)
+
+    created_at = datetime(2024, 1, 1)
+    with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+        for i in range(5):
+            test_store.insert(
+                Conversation(
+                    id=f"c{i}",
+                    workspace_id="1",
+                    assignee="a@b.c",
+                    type=ConversationTypes.data_owner,
+                    context={},
+                    # two conversations share a timestamp, the id breaks the tie
+                    created_at=created_at + timedelta(minutes=min(i, 3)),
+                ),
+                tx_context=tx_context,
+            )
+            for j in range(i):
+                ChatMessageStoreSQL().insert(
+                    ChatMessage(
+                        conversation_id=f"c{i}",
+                        workspace_id="1",
+                        type="human",
+                        content=f"m{j}",
+                        created_at=created_at + timedelta(seconds=j),
+                    ),
+                    tx_context=tx_context,
+                )
+
+    request.cls.engine = engine
+    request.cls.test_store = test_store
+
+
+@pytest.mark.usefixtures("setup_database")
+class TestConversationStoreSQL:
+    def test_cursor_pagination_newest_first(self):
+        ids, cursor = [], None
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            while True:
+                items, _ = self.test_store.list(
+                    workspace_id="1",
+                    limit=2,
+                    cursor=cursor,
+                    include_total=False,
+                    tx_context=tx_context,
+                )
+                ids += [c.id for c in items]
+                cursor = next_cursor(items, 2, self.test_store.cursor_keys)
+                if cursor is None:
+                    break
+
+        assert ids == ["c4", "c3", "c2", "c1", "c0"]
+
+    def test_offset_pagination_with_total(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            items, total = self.test_store.list(
+                workspace_id="1", limit=2, offset=2, tx_context=tx_context
+            )
+            assert total == 5
+            assert [c.id for c in items] == ["c2", "c1"]
+
+    def test_messages_loaded_in_one_query(self):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count)
+        try:
+            with SQLAlchemyTransactionContext(
+                engine=self.engine
+            ).manage() as tx_context:
+                items, _ = self.test_store.list(
+                    workspace_id="1",
+                    limit=10,
+                    links=["messages"],
+                    include_total=False,
+                    tx_context=tx_context,
+                )
+        finally:
+            event.remove(self.engine, "before_cursor_execute", count)
+
+        # one query for the page, one for all the messages
+        assert len(statements) == 2
+        assert {c.id: [m.content for m in c.messages] for c in items} == {
+            f"c{i}": [f"m{j}" for j in range(i)] for i in range(5)
+        }
+
+    def test_messages_limit_keeps_latest(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            items, _ = self.test_store.list(
+                workspace_id="1",
+                limit=10,
+                links=["messages"],
+                messages_limit=2,
+                tx_context=tx_context,
+            )
+            messages = {c.id: [m.content for m in c.messages] for c in items}
+            assert messages["c4"] == ["m2", "m3"]
+            assert messages["c1"] == ["m0"]
+            assert messages["c0"] == []
+
+    def test_get_by_id_with_messages(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            conv = self.test_store.get_by_id(
+                "1", "c3", tx_context=tx_context, links=["messages"]
+            )
+            assert [m.content for m in conv.messages] == ["m0", "m1", "m2"]
+
+    def test_update_returns_the_row_in_one_statement(self):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count)
+        try:
+            with SQLAlchemyTransactionContext(
+                engine=self.engine
+            ).manage() as tx_context:
+                conv = self.test_store.update(
+                    "1", "c0", {"context": {"k": "v"}}, tx_context=tx_context
+                )
+        finally:
+            event.remove(self.engine, "before_cursor_execute", count)
+
+        assert len(statements) == 1
+        assert "RETURNING" in statements[0]
+        assert conv.id == "c0"
+        assert conv.context == {"k": "v"}
+        assert conv.assignee == "a@b.c"
+
+    def test_update_without_returning(self, monkeypatch):
+        monkeypatch.setattr(self.engine.dialect, "update_returning", False)
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            conv = self.test_store.update(
+                "1", "c1", {"context": {"k": "w"}}, tx_context=tx_context
+            )
+            assert conv.context == {"k": "w"}
+            assert (
+                self.test_store.update(
+                    "2", "c1", {"context": {}}, tx_context=tx_context
+                )
+                is None
+            )
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import create_engine
+
+from app.counts import CountCache, CountModes, _Explain, count_cache
+from app.models import Application
+from app.models_stores_sql import ApplicationStoreSQL
+from app.services import pagination_params
+from app.sql import SQLAlchemyTransactionContext
+
+
+@pytest.fixture(scope="class")
+def setup_database(request):
+    engine = create_engine("sqlite:///:memory:")
+    test_store = ApplicationStoreSQL()
+    test_store.create_tables(engine)
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    request.cls.engine = engine
+    request.cls.test_store = test_store
+    request.cls.statements = statements
+
+
+@pytest.mark.usefixtures("setup_database")
+class TestListTotals:
+    def _list(self, workspace_id: str, **kwargs):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            return self.test_store.list(
+                workspace_id=workspace_id, tx_context=tx_context, **kwargs
+            )
+
+    def _counts(self) -> int:
+        return len([s for s in self.statements if "count(" in s])
+
+    def _insert(self, workspace_id: str, name: str):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            self.test_store.insert(
+                Application(workspace_id=workspace_id, name=name, aliases=[]),
+                tx_context=tx_context,
+            )
+
+    def test_without_total(self):
+        self._insert("1", "jira")
+        self.statements.clear()
+        apps, total = self._list("1", include_total=False)
+        assert total is None
+        assert len(apps) == 1
+        assert self._counts() == 0
+
+    def test_cached_total(self):
+        self._insert("2", "jira")
+        self.statements.clear()
+
+        assert self._list("2", total_mode=CountModes.cached)[1] == 1
+        assert self._list("2", total_mode=CountModes.cached)[1] == 1
+        assert self._counts() == 1
+        # filters are cached apart
+        filtered = self._list(
+            "2", filters={"name": "okta"}, total_mode=CountModes.cached
+        )
+        assert filtered[1] == 0
+
+        # a write to the workspace invalidates its counts
+        self._insert("2", "okta")
+        assert self._list("2", total_mode=CountModes.cached)[1] == 2
+        filtered = self._list(
+            "2", filters={"name": "okta"}, total_mode=CountModes.cached
+        )
+        assert filtered[1] == 1
+
+    def test_estimate_falls_back_to_cache(self):
+        self._insert("3", "jira")
+        self.statements.clear()
+        for _ in range(2):
+            assert self._list("3", total_mode=CountModes.estimate)[1] == 1
+        assert self._counts() == 1
+
+    def test_count_cached_before_commit(self):
+        self._insert("4", "jira")
+        assert self._list("4", total_mode=CountModes.cached)[1] == 1
+        table = self.test_store.apps.name
+        [key] = count_cache._cache[(table, "4")]
+
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            self.test_store.insert(
+                Application(workspace_id="4", name="okta", aliases=[]),
+                tx_context=tx_context,
+            )
+            # another request counts (and caches) before the insert commits
+            count_cache.put(table, "4", key, 1)
+        assert self._list("4", total_mode=CountModes.cached)[1] == 2
+
+
+class TestExplain:
+    def test_binds_like_the_statement(self):
+        apps = ApplicationStoreSQL().apps
+        query = select(func.count()).where(apps.c.workspace_id == "1")
+        compiled = _Explain(query).compile(dialect=postgresql.dialect())
+        assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT count(*)")
+        assert compiled.params == {"workspace_id_1": "1"}
+
+
+class TestCountCache:
+    def test_invalidate_is_per_workspace(self):
+        cache = CountCache()
+        cache.put("apps", "1", "q", 5)
+        cache.put("apps", "2", "q", 7)
+        cache.invalidate("apps", "1")
+        assert cache.get("apps", "1", "q") is None
+        assert cache.get("apps", "2", "q") == 7
+
+    def test_disabled(self):
+        cache = CountCache(ttl=0)
+        cache.put("apps", "1", "q", 5)
+        assert cache.get("apps", "1", "q") is None
+
+
+class TestPaginationParams:
+    def _include_total(self, **kwargs) -> bool:
+        return asyncio.run(pagination_params(projection=[], **kwargs))["include_total"]
+
+    def test_total_on_demand(self):
+        assert self._include_total() is False
+        assert self._include_total(cursor="c") is False
+        assert self._include_total(include_total=True) is True
+        # offset paging needs the total to know the pages
+        assert self._include_total(offset=0) is True
+        assert self._include_total(offset=20, include_total=False) is False
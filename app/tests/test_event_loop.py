@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import event_loop
+from app.event_loop import bind_main_loop, run_on_main_loop
+
+
+async def _running_loop():
+    return asyncio.get_running_loop()
+
+
+class TestRunOnMainLoop:
+    def test_from_worker_thread(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "_main_loop", None)
+        loop = asyncio.new_event_loop()
+        server = threading.Thread(target=loop.run_forever)
+        server.start()
+        try:
+            bind_main_loop(loop)
+            assert run_on_main_loop(_running_loop()) is loop
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            server.join()
+            loop.close()
+
+    def test_from_main_loop(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "_main_loop", None)
+
+        async def handler():
+            bind_main_loop()
+            run_on_main_loop(_running_loop())
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(handler())
+
+    def test_without_main_loop(self, monkeypatch):
+        monkeypatch.setattr(event_loop, "_main_loop", None)
+        assert run_on_main_loop(_running_loop()) is not None
@@ -0,0 +1,80 @@
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.exceptions import PyJWKClientError
+
+from app.oauth2.jwks import JWKSCache
+
+
+def _jwk(kid: str):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return private_key, jwk
+
+
+class FakeIdP:
+    def __init__(self, *jwks):
+        self.jwks = list(jwks)
+        self.calls = 0
+
+    def __call__(self, uri):
+        self.calls += 1
+        return {"keys": self.jwks}
+
+
+class TestJWKSCache:
+    def test_keys_are_cached(self):
+        private_key, jwk = _jwk("k1")
+        idp = FakeIdP(jwk)
+        cache = JWKSCache(uri="http://idp/jwks", fetch=idp)
+        token = jwt.encode(
+            {"sub": "1"}, private_key, algorithm="RS256", headers={"kid": "k1"}
+        )
+
+        for _ in range(5):
+            key = cache.get_signing_key_from_jwt(token)
+            assert jwt.decode(token, key=key.key, algorithms=["RS256"])["sub"] == "1"
+
+        assert idp.calls == 1
+        stats = cache.stats()
+        assert stats["hits"] == 5
+        assert stats["refreshes"] == 1
+
+    def test_unknown_kid_refetches_rotated_keys(self):
+        _, jwk1 = _jwk("k1")
+        _, jwk2 = _jwk("k2")
+        idp = FakeIdP(jwk1)
+        cache = JWKSCache(uri="http://idp/jwks", fetch=idp, min_refetch_interval=0)
+        cache.get_signing_key("k1")
+
+        idp.jwks.append(jwk2)
+        assert cache.get_signing_key("k2").key_id == "k2"
+        assert idp.calls == 2
+        assert cache.stats()["unknown_kid_refetches"] == 1
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        _, jwk = _jwk("k1")
+        idp = FakeIdP(jwk)
+        cache = JWKSCache(uri="http://idp/jwks", fetch=idp, min_refetch_interval=60)
+        cache.get_signing_key("k1")
+
+        for _ in range(3):
+            with pytest.raises(PyJWKClientError):
+                cache.get_signing_key("bogus")
+
+        assert idp.calls == 1
+        assert cache.stats()["misses"] == 3
+
+    def test_stale_keys_served_when_idp_is_down(self):
+        _, jwk = _jwk("k1")
+        idp = FakeIdP(jwk)
+        cache = JWKSCache(uri="http://idp/jwks", fetch=idp, lifespan=0)
+        cache.get_signing_key("k1")
+
+        def broken(uri):
+            raise jwt.exceptions.PyJWKClientConnectionError("down")
+
+        cache._fetch = broken
+        assert cache.get_signing_key("k1").key_id == "k1"
+        assert cache.stats()["refresh_errors"] == 1
@@ -0,0 +1,107 @@
+import json
+import time
+
+import pytest
+
+from app.oauth2.discovery import OIDCDiscovery
+
+URI = "http://idp/.well-known/openid-configuration"
+
+
+class FakeIdP:
+    def __init__(self, issuer: str = "http://idp"):
+        self.issuer = issuer
+        self.calls = 0
+        self.down = False
+
+    def __call__(self, uri):
+        self.calls += 1
+        if self.down:
+            raise Exception("idp is down")
+        return {"issuer": self.issuer, "jwks_uri": f"{self.issuer}/jwks"}
+
+
+class TestOIDCDiscovery:
+    def test_fetched_lazily_and_persisted(self, tmp_path):
+        cache_file = tmp_path / "oidc.json"
+        idp = FakeIdP()
+        discovery = OIDCDiscovery(uri=URI, cache_file=str(cache_file), fetch=idp)
+        assert idp.calls == 0
+
+        assert discovery.get()["issuer"] == "http://idp"
+        assert discovery.get()["issuer"] == "http://idp"
+        assert idp.calls == 1
+        assert json.loads(cache_file.read_text())["uri"] == URI
+
+    def test_cache_file_written_outside_the_lock(self, tmp_path, monkeypatch):
+        discovery = OIDCDiscovery(
+            uri=URI, cache_file=str(tmp_path / "oidc.json"), fetch=FakeIdP()
+        )
+        locked = []
+        dump = json.dump
+
+        def _dump(*args, **kwargs):
+            locked.append(discovery._lock.locked())
+            return dump(*args, **kwargs)
+
+        monkeypatch.setattr(json, "dump", _dump)
+        discovery.get()
+        assert locked == [False]
+
+    def test_cold_start_from_cache_file(self, tmp_path):
+        cache_file = tmp_path / "oidc.json"
+        OIDCDiscovery(uri=URI, cache_file=str(cache_file), fetch=FakeIdP()).get()
+
+        idp = FakeIdP()
+        idp.down = True
+        discovery = OIDCDiscovery(uri=URI, cache_file=str(cache_file), fetch=idp)
+        assert discovery.get()["issuer"] == "http://idp"
+        assert idp.calls == 0
+        assert discovery.stats()["file_loads"] == 1
+
+    def test_cache_file_of_other_idp_is_ignored(self, tmp_path):
+        cache_file = tmp_path / "oidc.json"
+        OIDCDiscovery(uri=URI, cache_file=str(cache_file), fetch=FakeIdP()).get()
+
+        idp = FakeIdP(issuer="http://other")
+        discovery = OIDCDiscovery(
+            uri="http://other/.well-known/openid-configuration",
+            cache_file=str(cache_file),
+            fetch=idp,
+        )
+        assert discovery.get()["issuer"] == "http://other"
+        assert idp.calls == 1
+
+    def test_stale_served_when_idp_is_down(self):
+        idp = FakeIdP()
+        discovery = OIDCDiscovery(uri=URI, fetch=idp, lifespan=0)
+        discovery.get()
+
+        idp.down = True
+        assert discovery.refresh()["issuer"] == "http://idp"
+        assert discovery.stats()["fetch_errors"] == 1
+
+    def test_raises_without_any_document(self):
+        idp = FakeIdP()
+        idp.down = True
+        discovery = OIDCDiscovery(uri=URI, fetch=idp)
+        with pytest.raises(Exception):
+            discovery.get()
+
+    def test_stale_document_is_refreshed_in_background(self):
+        idp = FakeIdP()
+        discovery = OIDCDiscovery(uri=URI, fetch=idp, lifespan=0)
+        discovery.get()
+        discovery.get()
+
+        deadline = time.monotonic() + 2
+        while idp.calls < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert idp.calls == 2
+
+
+def test_auth_module_imports_without_idp():
+    # the IdP in pytest.ini is unreachable, importing must not touch it
+    from app.auth import auth_api
+
+    assert auth_api.stats()["discovery"]["fetches"] == 0
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import make_url
+from sqlalchemy.engine import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.pool_metrics import PoolMetrics
+from app.sql import async_db_url, engine_options
+
+
+class TestEngineOptions:
+    def test_sqlite_is_not_sized(self):
+        options = engine_options(make_url("sqlite:///:memory:"))
+        assert "pool_size" not in options
+        assert options["echo"] is False
+
+    def test_postgres_timeouts(self):
+        options = engine_options(make_url("postgresql://u:p@localhost/db"))
+        assert options["pool_size"] > 0
+        assert "-c statement_timeout=" in options["connect_args"]["options"]
+        assert "-c lock_timeout=" in options["connect_args"]["options"]
+
+    def test_asyncpg_timeouts(self):
+        options = engine_options(async_db_url("postgresql://u:p@localhost/db"))
+        assert set(options["connect_args"]["server_settings"]) == {
+            "statement_timeout",
+            "lock_timeout",
+        }
+
+
+class TestPoolMetrics:
+    def test_stats(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'test.db'}",
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.01,
+        )
+        metrics = PoolMetrics("test", engine)
+
+        with metrics.measure():
+            conn = engine.connect()
+        stats = metrics.stats()
+        assert stats["size"] == 1
+        assert stats["checked_out"] == 1
+        assert stats["wait"]["count"] == 1
+
+        with pytest.raises(PoolTimeoutError):
+            with metrics.measure():
+                engine.connect()
+        conn.close()
+
+        stats = metrics.stats()
+        assert stats["checked_out"] == 0
+        assert stats["wait"]["timeouts"] == 1
+        assert sum(stats["wait"]["histogram"].values()) == 1
+
+    def test_histogram_buckets(self):
+        metrics = PoolMetrics("test", create_engine("sqlite:///:memory:"))
+        for wait_ms in (0.5, 7, 7, 20000):
+            metrics.observe(wait_ms)
+
+        wait = metrics.stats()["wait"]
+        assert wait["histogram"]["le_1ms"] == 1
+        assert wait["histogram"]["le_10ms"] == 2
+        assert wait["histogram"]["inf"] == 1
+        assert wait["max_ms"] == 20000
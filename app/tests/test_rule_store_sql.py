@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import create_engine
+
+from app.models import Rule, RuleTypes, ThenTypes
+from app.models_stores_sql import RuleStoreSQL
+from app.pagination import next_cursor
+from app.sql import SQLAlchemyTransactionContext
+
+
+@pytest.fixture(scope="class")
+def setup_database(request):
+    engine = create_engine("sqlite:///:memory:")
+    test_store = RuleStoreSQL()
+    test_store.create_tables(engine)
+
+    with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+        for i in range(5):
+            test_store.insert(
+                Rule(
+                    id=f"r{i}",
+                    workspace_id="1",
+                    created_by="foo",
+                    type=RuleTypes.auto_approve,
+                    when=f"rule {i}",
+                    then=ThenTypes.approve,
+                    # r0 applies to everything, others link to many apps or dirs
+                    application_ids=[f"a{j}" for j in range(i * 3)] if i % 2 else None,
+                    directory_ids=[f"d{j}" for j in range(i)]
+                    if i and not i % 2
+                    else None,
+                ),
+                tx_context=tx_context,
+            )
+
+    request.cls.engine = engine
+    request.cls.test_store = test_store
+
+
+@pytest.mark.usefixtures("setup_database")
+class TestRuleStoreSQL:
+    def test_list_pages_over_rules(self):
+        rules, cursor = [], None
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            while True:
+                page, total = self.test_store.list(
+                    workspace_id="1", limit=2, cursor=cursor, tx_context=tx_context
+                )
+                assert total == 5
+                assert len(page) <= 2
+                rules += page
+                cursor = next_cursor(page, 2, self.test_store.cursor_keys)
+                if cursor is None:
+                    break
+
+        by_id = {r.id: r for r in rules}
+        assert [r.id for r in rules] == ["r0", "r1", "r2", "r3", "r4"]
+        assert by_id["r0"].application_ids is None
+        assert by_id["r0"].directory_ids is None
+        assert sorted(by_id["r3"].application_ids) == sorted(f"a{j}" for j in range(9))
+        assert by_id["r3"].directory_ids is None
+        assert sorted(by_id["r4"].directory_ids) == ["d0", "d1", "d2", "d3"]
+
+    def test_list_is_a_single_query(self):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count)
+        try:
+            with SQLAlchemyTransactionContext(
+                engine=self.engine
+            ).manage() as tx_context:
+                rules, total = self.test_store.list(
+                    workspace_id="1",
+                    limit=9999,
+                    include_total=False,
+                    filters={"type": RuleTypes.auto_approve, "active": True},
+                    tx_context=tx_context,
+                )
+        finally:
+            event.remove(self.engine, "before_cursor_execute", count)
+
+        assert total is None
+        assert len(rules) == 5
+        assert len(statements) == 1
+
+    def test_get_by_id_after_bulk_insert(self):
+        with SQLAlchemyTransactionContext(engine=self.engine).manage() as tx_context:
+            rule = self.test_store.get_by_id("r1", "1", tx_context=tx_context)
+            assert sorted(rule.application_ids) == ["a0", "a1", "a2"]
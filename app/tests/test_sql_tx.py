@@ -0,0 +1,184 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import sql
+from app.sql import (
+    AsyncSQLAlchemyTransactionContext,
+    SQLAlchemyTransactionContext,
+    enable_sqlite_savepoints,
+    unit_of_work,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    enable_sqlite_savepoints(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    checkouts = []
+    event.listen(engine.pool, "checkout", lambda *args: checkouts.append(1))
+    engine.checkouts = checkouts
+    return engine
+
+
+def _insert(tx_context, x):
+    tx_context.connection.execute(text("INSERT INTO t VALUES (:x)"), {"x": x})
+
+
+def _values(engine):
+    with engine.connect() as conn:
+        return [r.x for r in conn.execute(text("SELECT x FROM t ORDER BY x"))]
+
+
+class TestSQLAlchemyTransactionContext:
+    def test_nested_commit_is_visible(self, engine):
+        with SQLAlchemyTransactionContext(engine=engine).manage() as outer:
+            with SQLAlchemyTransactionContext(engine=engine).manage() as inner:
+                assert inner.connection is not outer.connection
+                _insert(inner, 1)
+            # committed when the inner context exits, not when the outer one does
+            assert _values(engine) == [1]
+
+        assert _values(engine) == [1]
+
+    def test_savepoint_joins_outer(self, engine):
+        with SQLAlchemyTransactionContext(engine=engine).manage() as outer:
+            _insert(outer, 1)
+            ctx = SQLAlchemyTransactionContext(engine=engine, savepoint=True)
+            with ctx.manage() as inner:
+                assert inner.connection is outer.connection
+                _insert(inner, 2)
+            # released, only visible once the outer context commits
+            assert _values(engine) == []
+
+        assert _values(engine) == [1, 2]
+
+    def test_nested_rollback_is_scoped_to_savepoint(self, engine):
+        with SQLAlchemyTransactionContext(engine=engine).manage() as outer:
+            _insert(outer, 1)
+            with pytest.raises(ValueError):
+                ctx = SQLAlchemyTransactionContext(engine=engine, savepoint=True)
+                with ctx.manage() as inner:
+                    _insert(inner, 2)
+                    raise ValueError("boom")
+            _insert(outer, 3)
+
+        assert _values(engine) == [1, 3]
+
+    def test_outer_rollback(self, engine):
+        with pytest.raises(ValueError):
+            with SQLAlchemyTransactionContext(engine=engine).manage():
+                ctx = SQLAlchemyTransactionContext(engine=engine, savepoint=True)
+                with ctx.manage() as inner:
+                    _insert(inner, 1)
+                raise ValueError("boom")
+
+        assert _values(engine) == []
+
+    def test_after_transaction(self, engine):
+        seen = []
+        with SQLAlchemyTransactionContext(engine=engine).manage() as outer:
+            _insert(outer, 1)
+            ctx = SQLAlchemyTransactionContext(engine=engine, savepoint=True)
+            with ctx.manage() as inner:
+                _insert(inner, 2)
+                # called once the outer transaction commits, not the savepoint
+                inner.after_transaction(lambda: seen.append(_values(engine)))
+            assert seen == []
+        assert seen == [[1, 2]]
+
+        with pytest.raises(ValueError):
+            with SQLAlchemyTransactionContext(engine=engine).manage() as tx:
+                tx.after_transaction(lambda: seen.append("rolled back"))
+                raise ValueError("boom")
+        assert seen[-1] == "rolled back"
+
+
+class TestAsyncSQLAlchemyTransactionContext:
+    def test_start_failure_is_raised(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'no' / 'db'}")
+
+        async def run():
+            tx = AsyncSQLAlchemyTransactionContext(engine=engine)
+            async with tx.manage():
+                pass
+
+        # the connection error, not one of rolling back a transaction never begun
+        with pytest.raises(OperationalError):
+            asyncio.run(run())
+
+
+class TestUnitOfWork:
+    def test_no_connection_held_between_transactions(self, engine):
+        with unit_of_work():
+            for x in range(3):
+                with SQLAlchemyTransactionContext(engine=engine).manage() as tx:
+                    _insert(tx, x)
+                assert engine.pool.checkedout() == 0
+                # each context commits when it exits
+                assert _values(engine) == list(range(x + 1))
+
+    def test_nothing_checked_out_unless_used(self, engine):
+        with unit_of_work():
+            pass
+        assert engine.checkouts == []
+
+    def test_threads_use_their_own_connection(self, engine):
+        seen = {}
+
+        def _in_thread():
+            ctx = SQLAlchemyTransactionContext(engine=engine, savepoint=True)
+            with ctx.manage() as tx:
+                seen["connection"] = tx.connection
+                seen["values"] = tx.connection.execute(text("SELECT x FROM t")).all()
+
+        with unit_of_work():
+            with SQLAlchemyTransactionContext(engine=engine).manage() as tx:
+                _insert(tx, 1)
+                # like run_in_executor the thread sees the unit of work and the
+                # transaction, connections are not thread safe, it never joins it
+                ctx = contextvars.copy_context()
+                t = threading.Thread(target=ctx.run, args=(_in_thread,))
+                t.start()
+                t.join()
+                assert seen["connection"] is not tx.connection
+                assert seen["values"] == []
+
+        assert _values(engine) == [1]
+
+
+class TestReadReplica:
+    def test_read_only_goes_to_replica(self, engine, monkeypatch):
+        monkeypatch.setattr(sql, "replica_engine", engine)
+        assert SQLAlchemyTransactionContext(read_only=True).engine is engine
+        assert SQLAlchemyTransactionContext().engine is sql.sqlalchemy_engine
+
+    def test_no_replica_configured(self, monkeypatch):
+        monkeypatch.setattr(sql, "replica_engine", None)
+        ctx = SQLAlchemyTransactionContext(read_only=True)
+        assert ctx.engine is sql.sqlalchemy_engine
+
+    def test_pinned_to_primary_after_write(self, engine, monkeypatch):
+        monkeypatch.setattr(sql, "replica_engine", engine)
+        with unit_of_work():
+            with SQLAlchemyTransactionContext(read_only=True).manage() as tx:
+                assert tx.engine is engine
+            # a read only context does not pin
+            assert SQLAlchemyTransactionContext(read_only=True).engine is engine
+
+            with SQLAlchemyTransactionContext().manage():
+                pass
+            ctx = SQLAlchemyTransactionContext(read_only=True)
+            assert ctx.engine is sql.sqlalchemy_engine
+
+        # the pin only lasts for the unit of work
+        assert SQLAlchemyTransactionContext(read_only=True).engine is engine
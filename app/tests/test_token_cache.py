@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from app import auth
+from app.oauth2.token_cache import VerifiedTokenCache
+
+
+class TestVerifiedTokenCache:
+    def test_hit_until_expiry(self):
+        cache = VerifiedTokenCache(leeway=0)
+        claims = {"sub": "1", "exp": time.time() + 60}
+        cache.put("token", claims)
+
+        assert cache.get("token") == claims
+        assert cache.get("other") is None
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_expired_tokens_are_dropped(self):
+        cache = VerifiedTokenCache(leeway=30)
+        # expires within the leeway, never cached
+        cache.put("soon", {"sub": "1", "exp": time.time() + 10})
+        assert cache.get("soon") is None
+        # no exp claim, never cached
+        cache.put("noexp", {"sub": "1"})
+        assert cache.get("noexp") is None
+
+        cache = VerifiedTokenCache(leeway=0)
+        cache.put("token", {"sub": "1", "exp": time.time() + 0.05})
+        time.sleep(0.1)
+        assert cache.get("token") is None
+        assert cache.stats()["expired"] == 1
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction_by_memory(self):
+        cache = VerifiedTokenCache(max_bytes=1000, leeway=0)
+        exp = time.time() + 60
+        for i in range(10):
+            cache.put(f"token{i}", {"sub": str(i), "exp": exp})
+
+        stats = cache.stats()
+        assert stats["bytes"] <= 1000
+        assert stats["evictions"] > 0
+        assert cache.get("token9") is not None
+        assert cache.get("token0") is None
+
+
+class TestGetCurrentActiveUser:
+    def test_cached_token_stays_on_the_loop(self, monkeypatch):
+        api = auth.OAuth2Impl()
+        claims = {"sub": "1", "exp": time.time() + 60}
+        api._token_cache.put("token", claims)
+        monkeypatch.setattr(auth, "auth_api", api)
+        threads = []
+        monkeypatch.setattr(
+            asyncio, "to_thread", lambda f, *args: threads.append(f) or f(*args)
+        )
+
+        async def get_current_user(request, decoded_access_token):
+            return decoded_access_token
+
+        monkeypatch.setattr(api, "get_current_user", get_current_user)
+        request = Request(
+            {"type": "http", "headers": [(b"authorization", b"Bearer token")]}
+        )
+
+        assert asyncio.run(auth.get_current_active_user(request)) == claims
+        assert threads == []
+        assert api._token_cache.stats()["misses"] == 0
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.oauth2.userinfo import UserInfoClient
+
+ENDPOINT = "http://idp/userinfo"
+
+
+class FakeIdP:
+    def __init__(self, status_code: int = 200, delay: float = 0):
+        self.status_code = status_code
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        token = request.headers["Authorization"].split(" ")[1]
+        return httpx.Response(self.status_code, json={"sub": token})
+
+
+class TestUserInfoClient:
+    def test_concurrent_lookups_are_coalesced(self):
+        idp = FakeIdP(delay=0.05)
+        client = UserInfoClient(transport=httpx.MockTransport(idp))
+
+        async def run():
+            results = await asyncio.gather(
+                *[client.get(ENDPOINT, "t1") for _ in range(10)]
+            )
+            # served from cache
+            results.append(await client.get(ENDPOINT, "t1"))
+            await client.aclose()
+            return results
+
+        results = asyncio.run(run())
+        assert all(r == {"sub": "t1"} for r in results)
+        assert idp.calls == 1
+        stats = client.stats()
+        assert stats["coalesced"] == 9
+        assert stats["hits"] == 1
+
+    def test_failures_are_negatively_cached(self):
+        idp = FakeIdP(status_code=401)
+        client = UserInfoClient(transport=httpx.MockTransport(idp), negative_ttl=60)
+
+        async def run():
+            for _ in range(3):
+                with pytest.raises(HTTPException) as exc:
+                    await client.get(ENDPOINT, "t1")
+                assert exc.value.status_code == 401
+            await client.aclose()
+
+        asyncio.run(run())
+        assert idp.calls == 1
+        assert client.stats()["negative_hits"] == 2
+
+    def test_cancelled_lookup_does_not_hang_waiters(self):
+        idp = FakeIdP(delay=0.05)
+        client = UserInfoClient(transport=httpx.MockTransport(idp))
+
+        async def run():
+            leader = asyncio.create_task(client.get(ENDPOINT, "t1"))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(client.get(ENDPOINT, "t1"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            result = await asyncio.wait_for(follower, timeout=1)
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            await client.aclose()
+            return result
+
+        assert asyncio.run(run()) == {"sub": "t1"}
+        assert idp.calls == 2
+        assert client.stats()["inflight"] == 0
+
+    def test_ttl_respects_token_expiry(self):
+        idp = FakeIdP()
+        client = UserInfoClient(transport=httpx.MockTransport(idp), ttl=300)
+
+        async def run():
+            # already expired tokens are never cached
+            await client.get(ENDPOINT, "t1", token_exp=time.time() - 1)
+            await client.get(ENDPOINT, "t1", token_exp=time.time() - 1)
+            await client.aclose()
+
+        asyncio.run(run())
+        assert idp.calls == 2
+        assert client._ttl_for(time.time() + 10) <= 10
+        assert client._ttl_for(None) == 300
@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.engine import create_engine
+
+from app.models import (
+    Application,
+    ChatMessage,
+    Conversation,
+    ConversationTypes,
+    CurrentUser,
+    Directory,
+    Rule,
+    RuleTypes,
+    ThenTypes,
+    Workspace,
+    WorkspacePurgeStatuses,
+    WorkspaceStatuses,
+)
+from app.models_stores import WorkspaceStoreHooksPass, WorkspaceStoreProxy
+from app.models_stores_sql import (
+    ApplicationStoreSQL,
+    ChatMessageStoreSQL,
+    CheckpointStoreSQL,
+    ConversationStoreSQL,
+    DirectoryStoreSQL,
+    RuleStoreSQL,
+    WorkspacePurgeStoreSQL,
+    WorkspaceStoreSQL,
+    metadata,
+)
+from app.sql import SQLAlchemyTransactionContext
+from app.vault.api import VaultAPI
+from app.workspace_purge import WorkspacePurger
+
+USER = CurrentUser(id="u1", email="owner@acme.io", workspace_id=None)
+
+
+class DictVault(VaultAPI):
+    def __init__(self):
+        self.secrets = {}
+
+    def get_secret(self, workspace_id, path):
+        return self.secrets.get((workspace_id, path))
+
+    def set_secret(self, workspace_id, path, value):
+        self.secrets[(workspace_id, path)] = value
+        return True
+
+    def delete_secret(self, workspace_id, path):
+        return self.secrets.pop((workspace_id, path), None) is not None
+
+    def list_secrets(self, workspace_id):
+        return [path for ws, path in self.secrets if ws == workspace_id]
+
+
+class RecordingHooks(WorkspaceStoreHooksPass):
+    def __init__(self):
+        self.ran = []
+
+    def post_delete(self, workspace, current_user, background_tasks, tx_context):
+        background_tasks.add_task(self.ran.append, (workspace.id, current_user.id))
+
+
+@pytest.fixture
+def purger(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    metadata.create_all(engine)
+    hooks = RecordingHooks()
+    purger = WorkspacePurger(
+        workspace_store=WorkspaceStoreProxy(store=WorkspaceStoreSQL(), hooks=hooks),
+        purge_store=WorkspacePurgeStoreSQL(),
+        msg_store=ChatMessageStoreSQL(),
+        conversation_store=ConversationStoreSQL(),
+        app_store=ApplicationStoreSQL(),
+        dir_store=DirectoryStoreSQL(),
+        rule_store=RuleStoreSQL(),
+        checkpoint_store=CheckpointStoreSQL(engine=engine),
+        vault=DictVault(),
+        batch_size=2,
+        engine=engine,
+    )
+    purger.hooks = hooks
+    # the vector store is an external service, record that the step ran
+    purger.vstores_deleted = []
+    monkeypatch.setattr(
+        purger, "_delete_vector_store", lambda p: purger.vstores_deleted.append(p)
+    )
+    return purger
+
+
+def _seed(purger: WorkspacePurger, name: str) -> Workspace:
+    ws = Workspace(name=name, display_name=name, created_by=USER.email, config={})
+    with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx_context:
+        purger.workspace_store.insert(ws, USER, None, tx_context=tx_context)
+        for i in range(5):
+            conv = Conversation(
+                workspace_id=ws.id,
+                assignee=USER.id,
+                type=ConversationTypes.recommendation,
+                context={},
+            )
+            ConversationStoreSQL().insert(conv, tx_context=tx_context)
+            ChatMessageStoreSQL().insert(
+                ChatMessage(
+                    conversation_id=conv.id,
+                    workspace_id=ws.id,
+                    type="human",
+                    content="hi",
+                ),
+                tx_context=tx_context,
+            )
+        app = ApplicationStoreSQL().insert(
+            Application(workspace_id=ws.id, name="jira", aliases=[]),
+            tx_context=tx_context,
+        )
+        DirectoryStoreSQL().insert(
+            Directory(workspace_id=ws.id, name="okta", created_by=USER.email),
+            tx_context=tx_context,
+        )
+        RuleStoreSQL().insert(
+            Rule(
+                workspace_id=ws.id,
+                created_by=USER.email,
+                type=RuleTypes.auto_approve,
+                when="always",
+                then=ThenTypes.approve,
+                application_ids=[app.id],
+            ),
+            tx_context=tx_context,
+        )
+    purger.vault.set_secret(ws.id, "token", "s3cr3t")
+    return ws
+
+
+def _count(purger: WorkspacePurger, table, workspace_id: str) -> int:
+    q = select(func.count()).where(table.c.workspace_id == workspace_id)
+    with purger.engine.connect() as conn:
+        return conn.execute(q.select_from(table)).scalar()
+
+
+def _request(purger: WorkspacePurger, ws: Workspace):
+    with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx_context:
+        return purger.request(ws, USER, tx_context=tx_context)
+
+
+class TestWorkspacePurger:
+    def test_purge(self, purger):
+        ws = _seed(purger, "acme")
+        other = _seed(purger, "other")
+
+        purge = _request(purger, ws)
+        assert purge.status == WorkspacePurgeStatuses.pending
+        with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx:
+            deleting = purger.workspace_store.get_by_id(ws.id, tx_context=tx)
+        assert deleting.status == WorkspaceStatuses.deleting
+
+        purge = purger.run(ws.id)
+        assert purge.status == WorkspacePurgeStatuses.completed
+        assert purge.deleted["messages"] == 5
+        assert purge.deleted["conversations"] == 5
+        # the rule and its context row
+        assert purge.deleted["rules"] == 2
+        assert purge.deleted["secrets"] == 1
+        assert len(purger.vstores_deleted) == 1
+        assert purger.hooks.ran == [(ws.id, USER.id)]
+
+        with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx:
+            assert purger.workspace_store.get_by_id(ws.id, tx_context=tx) is None
+            assert purger.purge_store.get(ws.id, tx_context=tx).status == (
+                WorkspacePurgeStatuses.completed
+            )
+        for table in metadata.sorted_tables:
+            if "workspace_id" in table.c and table.name != "workspace_purges":
+                assert _count(purger, table, ws.id) == 0, table.name
+        # nothing of other workspaces is touched
+        assert _count(purger, ChatMessageStoreSQL().messages, other.id) == 5
+        assert purger.vault.list_secrets(other.id) == ["token"]
+
+        # a completed purge does not run again
+        assert purger.run(ws.id) is None
+
+    def test_resume_after_failure(self, purger):
+        ws = _seed(purger, "acme")
+        _request(purger, ws)
+
+        def boom(**kwargs):
+            raise RuntimeError("connection lost")
+
+        delete_rules, purger._tables["rules"] = purger._tables["rules"], boom
+        purge = purger.run(ws.id)
+        assert purge.status == WorkspacePurgeStatuses.failed
+        assert purge.step == "rules"
+        assert purge.error == "connection lost"
+        assert _count(purger, ChatMessageStoreSQL().messages, ws.id) == 0
+        purger._tables["rules"] = delete_rules
+
+        # a failed purge is retried by requesting it again, it carries on from
+        # the failed step
+        purge = _request(purger, ws)
+        assert purge.step == "rules"
+        purge = purger.run(ws.id)
+        assert purge.status == WorkspacePurgeStatuses.completed
+        assert purge.deleted["messages"] == 5
+
+    def test_resume_stale(self, purger):
+        ws = _seed(purger, "acme")
+        _request(purger, ws)
+
+        with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx:
+            assert purger.purge_store.claim(ws.id, 60, tx_context=tx) is not None
+            # running and recently updated, someone else owns it
+            assert purger.purge_store.claim(ws.id, 60, tx_context=tx) is None
+
+        # the owner died, its purge goes stale and is taken over on startup
+        q = (
+            purger.purge_store.purges.update()
+            .where(purger.purge_store.purges.c.workspace_id == ws.id)
+            .values(updated_at=datetime.now() - timedelta(seconds=600))
+        )
+        with purger.engine.begin() as conn:
+            conn.execute(q)
+
+        purger.stale_after = 60
+        purger.resume()
+        with SQLAlchemyTransactionContext(engine=purger.engine).manage() as tx:
+            purge = purger.purge_store.get(ws.id, tx_context=tx)
+        assert purge.status == WorkspacePurgeStatuses.completed
@@ -7,6 +7,7 @@ from app.models import Workspace
 from app.models_stores import WorkspaceStoreHooks, WorkspaceStoreProxy
 from app.models_stores_sql import WorkspaceStoreSQL
 from app.sql import SQLAlchemyTransactionContext
+from app.workspace_cache import WorkspaceCache, workspace_request_scope
 
 
 @pytest.fixture(scope="class")
@@ -105,3 +106,97 @@ class TestWorkspaceStoreSQL:
         with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
             rws = test_store.get_by_id(ws.id, tx_context=tx_context)
             assert rws is None
+
+
+class CountingWorkspaceStore(WorkspaceStoreSQL):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_by_id(self, workspace_id, tx_context):
+        self.reads += 1
+        return super().get_by_id(workspace_id, tx_context)
+
+
+class TestWorkspaceStoreProxyCache:
+    def _insert(self, engine, store, name, external_id=None):
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            ws = Workspace(
+                display_name=name,
+                name=name,
+                external_id=external_id,
+                created_by=generate(),
+                config={},
+            )
+            return store.insert(
+                ws, tx_context=tx_context, current_user=None, background_tasks=None
+            )
+
+    def test_request_memo(self, db):
+        engine, _ = db
+        store = CountingWorkspaceStore()
+        ws = self._insert(engine, store, "memo", external_id="T_MEMO")
+        # the shared cache is disabled, only the request memo applies
+        proxy = WorkspaceStoreProxy(
+            store=store, hooks=None, cache=WorkspaceCache(ttl=0)
+        )
+
+        with workspace_request_scope():
+            with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+                assert proxy.get_by_id(ws.id, tx_context).name == "memo"
+                assert proxy.get_by_id(ws.id, tx_context).name == "memo"
+                assert proxy.get_by_id("T_MEMO", tx_context).id == ws.id
+        assert store.reads == 1
+
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            proxy.get_by_id(ws.id, tx_context)
+        assert store.reads == 2
+
+    def test_shared_cache_invalidated_on_update(self, db):
+        engine, _ = db
+        store = CountingWorkspaceStore()
+        ws = self._insert(engine, store, "shared")
+        proxy = WorkspaceStoreProxy(store=store, hooks=None, cache=WorkspaceCache())
+
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            cached = proxy.get_by_id(ws.id, tx_context)
+            # callers may mutate what they get back without affecting the cache
+            cached.display_name = "mutated"
+            assert proxy.get_by_id(ws.id, tx_context).display_name == "shared"
+            assert store.reads == 1
+
+            cached.display_name = "Shared, Inc."
+            proxy.update(cached, tx_context=tx_context)
+            assert proxy.get_by_id(ws.id, tx_context).display_name == "Shared, Inc."
+            assert store.reads == 2
+
+    def test_shared_cache_invalidated_on_delete(self, db):
+        engine, _ = db
+        store = CountingWorkspaceStore()
+        ws = self._insert(engine, store, "deleted")
+        proxy = WorkspaceStoreProxy(store=store, hooks=None, cache=WorkspaceCache())
+
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            proxy.get_by_id(ws.id, tx_context)
+            proxy.delete(
+                ws, current_user=None, background_tasks=None, tx_context=tx_context
+            )
+            assert proxy.get_by_id(ws.id, tx_context) is None
+
+    def test_concurrent_read_recached_before_commit(self, db):
+        engine, _ = db
+        store = CountingWorkspaceStore()
+        ws = self._insert(engine, store, "racy")
+        cache = WorkspaceCache()
+        proxy = WorkspaceStoreProxy(store=store, hooks=None, cache=cache)
+
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            stale = proxy.get_by_id(ws.id, tx_context)
+            updated = stale.model_copy(deep=True)
+            updated.display_name = "Racy, Inc."
+            proxy.update(updated, tx_context=tx_context)
+            # a read of another request, before the update commits
+            cache.put(stale)
+
+        with SQLAlchemyTransactionContext(engine=engine).manage() as tx_context:
+            assert proxy.get_by_id(ws.id, tx_context).display_name == "Racy, Inc."
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Callable
 
 
 class TransactionContext(ABC):
@@ -13,3 +14,28 @@ class TransactionContext(ABC):
     @abstractmethod
     def rollback(self):
         pass
+
+    def after_transaction(self, callback: Callable[[], None]):
+        """
+        Calls callback once the transaction is over, committed or rolled back (e.g. to
+        invalidate what a cache may hold of the rows it wrote), right away by default
+        """
+        callback()
+
+
+class AsyncTransactionContext(ABC):
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def commit(self):
+        pass
+
+    @abstractmethod
+    async def rollback(self):
+        pass
+
+    def after_transaction(self, callback: Callable[[], None]):
+        """See TransactionContext.after_transaction"""
+        callback()
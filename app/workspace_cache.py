@@ -0,0 +1,92 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+from .models import Workspace
+
+# workspaces resolved during the current request, keyed by both id and external_id
+_request_memo: ContextVar[Optional[dict[str, Workspace]]] = ContextVar(
+    "workspace_request_memo", default=None
+)
+
+
+@contextmanager
+def workspace_request_scope():
+    """Memoizes workspace lookups until the scope (typically a request) ends"""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def _keys(workspace: Workspace) -> list[str]:
+    return [k for k in (workspace.id, workspace.external_id) if k is not None]
+
+
+class WorkspaceCache:
+    """
+    Two level workspace cache, a request scoped memo on top of a process wide bounded
+    TTL cache. Cached workspaces are copied in and out so callers may mutate them.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: int = 60):
+        self._lock = threading.Lock()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self._stats = {"request_hits": 0, "hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, workspace_id: str) -> Optional[Workspace]:
+        memo = _request_memo.get()
+        if memo is not None and workspace_id in memo:
+            with self._lock:
+                self._stats["request_hits"] += 1
+            return memo[workspace_id].model_copy(deep=True)
+
+        with self._lock:
+            workspace = (
+                self._cache.get(workspace_id) if self._cache is not None else None
+            )
+            self._stats["hits" if workspace is not None else "misses"] += 1
+
+        if workspace is None:
+            return None
+
+        if memo is not None:
+            for key in _keys(workspace):
+                memo[key] = workspace
+        return workspace.model_copy(deep=True)
+
+    def put(self, workspace: Workspace):
+        workspace = workspace.model_copy(deep=True)
+        memo = _request_memo.get()
+        for key in _keys(workspace):
+            if memo is not None:
+                memo[key] = workspace
+            if self._cache is not None:
+                with self._lock:
+                    self._cache[key] = workspace
+
+    def invalidate(self, workspace: Workspace):
+        memo = _request_memo.get()
+        with self._lock:
+            self._stats["invalidations"] += 1
+            # writes are rare, scan so entries under a previous external_id go too
+            for cache in (memo, self._cache):
+                if cache is None:
+                    continue
+                stale = [
+                    k
+                    for k, v in list(cache.items())
+                    if k in _keys(workspace) or v.id == workspace.id
+                ]
+                for key in stale:
+                    cache.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = self._stats.copy()
+            stats["entries"] = len(self._cache) if self._cache is not None else 0
+        return stats
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy import Engine
+
+from .embeddings import create_embedding
+from .models import (
+    CurrentUser,
+    Workspace,
+    WorkspacePurge,
+    WorkspacePurgeStatuses,
+    WorkspaceStatuses,
+)
+from .models_stores import (
+    ApplicationStore,
+    ChatMessageStore,
+    CheckpointStore,
+    ConversationStore,
+    DirectoryStore,
+    RuleStore,
+    WorkspacePurgeStore,
+    WorkspaceStore,
+)
+from .settings import settings
+from .sql import SQLAlchemyTransactionContext
+from .tx import TransactionContext
+from .vault.api import VaultAPI
+from .vector_store import create_workspace_vstore, delete_store
+
+logger = logging.getLogger(__name__)
+
+# rules reference applications and directories, so they go first
+PURGE_STEPS = (
+    "vector_store",
+    "messages",
+    "checkpoints",
+    "conversations",
+    "rules",
+    "applications",
+    "directories",
+    "secrets",
+    "workspace",
+)
+
+
+class WorkspacePurger:
+    """
+    Deletes a workspace in the background. Every step commits its progress on the
+    purge record, tables are emptied batch_size rows per transaction, so a purge
+    never holds locks for long and an interrupted one resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        workspace_store: WorkspaceStore,
+        purge_store: WorkspacePurgeStore,
+        msg_store: ChatMessageStore,
+        conversation_store: ConversationStore,
+        app_store: ApplicationStore,
+        dir_store: DirectoryStore,
+        rule_store: RuleStore,
+        checkpoint_store: CheckpointStore,
+        vault: VaultAPI,
+        batch_size: int = settings.WORKSPACE_PURGE_BATCH_SIZE,
+        stale_after: int = settings.WORKSPACE_PURGE_STALE_AFTER,
+        engine: Optional[Engine] = None,
+    ):
+        self.engine = engine
+        self.workspace_store = workspace_store
+        self.purge_store = purge_store
+        self.vault = vault
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self._tables: dict[str, Callable[..., int]] = {
+            "messages": msg_store.delete_for_workspace,
+            "checkpoints": checkpoint_store.delete_for_workspace,
+            "conversations": conversation_store.delete_for_workspace,
+            "rules": rule_store.delete_for_workspace,
+            "applications": app_store.delete_for_workspace,
+            "directories": dir_store.delete_for_workspace,
+        }
+
+    def request(
+        self,
+        workspace: Workspace,
+        current_user: CurrentUser,
+        tx_context: TransactionContext,
+    ) -> WorkspacePurge:
+        """Marks the workspace as deleting and records a pending purge of it"""
+        purge = self.purge_store.get(workspace.id, tx_context=tx_context)
+        if purge is None:
+            purge = self.purge_store.insert(
+                WorkspacePurge(
+                    workspace_id=workspace.id,
+                    external_id=workspace.external_id,
+                    step=PURGE_STEPS[0],
+                    requested_by=current_user,
+                ),
+                tx_context=tx_context,
+            )
+        elif purge.status == WorkspacePurgeStatuses.failed:
+            # retry from the failed step
+            purge.status = WorkspacePurgeStatuses.pending
+            purge.error = None
+            purge = self.purge_store.update(purge, tx_context=tx_context)
+
+        if workspace.status != WorkspaceStatuses.deleting:
+            workspace.status = WorkspaceStatuses.deleting
+            self.workspace_store.update(workspace=workspace, tx_context=tx_context)
+        return purge
+
+    def run(self, workspace_id: str) -> Optional[WorkspacePurge]:
+        """
+        Runs the purge to completion, returns None when it is not pending or is
+        being run by someone else.
+        """
+        with self._tx_context().manage() as tx_context:
+            purge = self.purge_store.claim(
+                workspace_id, stale_after=self.stale_after, tx_context=tx_context
+            )
+        if purge is None:
+            return None
+
+        logger.info("purging workspace %s from %s", workspace_id, purge.step)
+        try:
+            while purge.status == WorkspacePurgeStatuses.running:
+                purge = self._run_step(purge)
+        except Exception as e:
+            logger.exception("failed to purge workspace %s", workspace_id)
+            with self._tx_context().manage() as tx_context:
+                purge.status = WorkspacePurgeStatuses.failed
+                purge.error = str(e)
+                purge = self.purge_store.update(purge, tx_context=tx_context)
+        return purge
+
+    def resume(self):
+        """Runs the purges interrupted by a restart, typically called on startup"""
+        # the purges are written to next, list them from the primary rather than a
+        # replica that may lag behind their latest step
+        with self._tx_context().manage() as tx_context:
+            purges = self.purge_store.list_unfinished(tx_context=tx_context)
+        for purge in purges:
+            self.run(purge.workspace_id)
+
+    def _tx_context(self) -> SQLAlchemyTransactionContext:
+        return SQLAlchemyTransactionContext(engine=self.engine)
+
+    def _run_step(self, purge: WorkspacePurge) -> WorkspacePurge:
+        if purge.step in self._tables:
+            return self._delete_batch(purge, self._tables[purge.step])
+        if purge.step == "vector_store":
+            self._delete_vector_store(purge)
+        elif purge.step == "secrets":
+            self._delete_secrets(purge)
+        elif purge.step == "workspace":
+            return self._delete_workspace(purge)
+
+        with self._tx_context().manage() as tx_context:
+            return self._next_step(purge, tx_context)
+
+    def _delete_batch(
+        self, purge: WorkspacePurge, delete_for_workspace: Callable[..., int]
+    ) -> WorkspacePurge:
+        with self._tx_context().manage() as tx_context:
+            deleted = delete_for_workspace(
+                workspace_id=purge.workspace_id,
+                tx_context=tx_context,
+                limit=self.batch_size,
+            )
+            if deleted == 0:
+                return self._next_step(purge, tx_context)
+
+            purge.deleted[purge.step] = purge.deleted.get(purge.step, 0) + deleted
+            return self.purge_store.update(purge, tx_context=tx_context)
+
+    def _next_step(
+        self, purge: WorkspacePurge, tx_context: TransactionContext
+    ) -> WorkspacePurge:
+        purge.step = PURGE_STEPS[PURGE_STEPS.index(purge.step) + 1]
+        return self.purge_store.update(purge, tx_context=tx_context)
+
+    def _get_workspace(self, purge: WorkspacePurge) -> Optional[Workspace]:
+        with self._tx_context().manage() as tx_context:
+            return self.workspace_store.get_by_id(
+                purge.workspace_id, tx_context=tx_context
+            )
+
+    def _delete_vector_store(self, purge: WorkspacePurge):
+        workspace = self._get_workspace(purge)
+        if workspace is None:
+            return
+        ovstore = create_workspace_vstore(
+            workspace_id=workspace.id,
+            embedding=create_embedding(settings.VSTORE_EMBEDDING),
+            workspace_name=workspace.name,
+        )
+        delete_store(ovstore=ovstore)
+
+    def _delete_secrets(self, purge: WorkspacePurge):
+        for name in self.vault.list_secrets(workspace_id=purge.workspace_id):
+            self.vault.delete_secret(workspace_id=purge.workspace_id, path=name)
+            purge.deleted["secrets"] = purge.deleted.get("secrets", 0) + 1
+
+    def _delete_workspace(self, purge: WorkspacePurge) -> WorkspacePurge:
+        workspace = self._get_workspace(purge)
+        background_tasks = BackgroundTasks()
+        with self._tx_context().manage() as tx_context:
+            if workspace is not None:
+                self.workspace_store.delete(
+                    workspace=workspace,
+                    current_user=purge.requested_by,
+                    background_tasks=background_tasks,
+                    tx_context=tx_context,
+                )
+            purge.status = WorkspacePurgeStatuses.completed
+            purge = self.purge_store.update(purge, tx_context=tx_context)
+
+        # tasks the delete hooks scheduled, there is no response to run them after
+        asyncio.run(background_tasks())
+        logger.info("purged workspace %s: %s", purge.workspace_id, purge.deleted)
+        return purge
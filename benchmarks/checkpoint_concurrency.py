@@ -0,0 +1,146 @@
+"""
+Runs concurrent conversations of graph steps (load the latest checkpoint, save a new
+one and its writes) on a single event loop with the sync CheckpointStoreSQL and the
+asyncio AsyncCheckpointStoreSQL, and prints the throughput and how late a ticker
+sharing the loop gets (how long the loop is blocked, what streaming tokens would wait).
+
+    poetry run python -m benchmarks.checkpoint_concurrency
+    poetry run python -m benchmarks.checkpoint_concurrency --db-uri postgresql://... --reset
+
+Only run it against a scratch database, the tables are dropped when --reset is given.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from langgraph.checkpoint.base import empty_checkpoint
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.id import generate
+from app.models_stores_async import AsyncCheckpointStoreSQL
+from app.models_stores_sql import CheckpointStoreSQL, metadata, workspace_table
+from app.sql import async_db_url, engine_options
+
+TICK = 0.005
+
+
+async def conversation(store, workspace_id: str, steps: int, messages: int):
+    config = {
+        "configurable": {
+            "workspace_id": workspace_id,
+            "thread_id": generate(),
+            "checkpoint_ns": "",
+        }
+    }
+    for step in range(steps):
+        await store.aget_tuple(config)
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {
+            "messages": [f"message {i} of step {step}" * 5 for i in range(messages)]
+        }
+        config = await store.aput(config, checkpoint, {"step": step})
+        await store.aput_writes(config, [("messages", f"reply {step}")], "task")
+
+
+async def ticker(lags: list[float], done: asyncio.Event):
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def run(store, workspace_id: str, args) -> tuple[float, list[float]]:
+    if isinstance(store, AsyncCheckpointStoreSQL):
+        store.bind_loop()
+    lags, done = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, done))
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            conversation(store, workspace_id, args.steps, args.messages)
+            for _ in range(args.conversations)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    done.set()
+    await tick
+    return elapsed, lags
+
+
+async def bench(build, db_uri: str, workspace_id: str, args):
+    # the asyncio engine is bound to the loop it is used on, one per run, both engines
+    # are sized by the DB_POOL_* settings like the app's
+    url = async_db_url(db_uri)
+    async_engine = create_async_engine(url, **engine_options(url))
+    try:
+        return await run(build(async_engine), workspace_id, args)
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--db-uri", default=None, help="a temporary sqlite file if unset"
+    )
+    parser.add_argument("--reset", action="store_true", help="drop existing tables")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=50, help="per checkpoint")
+    args = parser.parse_args()
+
+    db_uri = args.db_uri
+    if db_uri is None:
+        # in memory sqlite databases are per connection, share a file between engines
+        db_uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    url = make_url(db_uri)
+    engine = create_engine(url, **engine_options(url))
+    if args.reset:
+        metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    workspace_id = generate()
+    with engine.begin() as conn:
+        conn.execute(
+            workspace_table.insert(),
+            {
+                "id": workspace_id,
+                "name": f"bench{workspace_id.lower()}",
+                "display_name": "bench",
+                "config": {},
+                "created_by": "bench@example.com",
+                "created_at": datetime.now(),
+            },
+        )
+
+    stores = {
+        "sync": lambda async_engine: CheckpointStoreSQL(engine=engine),
+        "async": lambda async_engine: AsyncCheckpointStoreSQL(
+            engine=engine, async_engine=async_engine
+        ),
+        "async+offload": lambda async_engine: AsyncCheckpointStoreSQL(
+            engine=engine, async_engine=async_engine, offload_serde=True
+        ),
+    }
+    total = args.conversations * args.steps
+    print(
+        f"{args.conversations} conversations x {args.steps} steps, "
+        f"{args.messages} messages per checkpoint"
+    )
+    print(f"{'store':>14} {'steps/s':>9} {'lag p50 ms':>11} {'lag max ms':>11}")
+    for name, build in stores.items():
+        elapsed, lags = asyncio.run(bench(build, db_uri, workspace_id, args))
+        print(
+            f"{name:>14} {total / elapsed:>9.1f} "
+            f"{statistics.median(lags or [0]):>11.2f} {max(lags or [0]):>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Times loading the latest checkpoint of threads of growing length, the way every graph
+step does, to show the load time stays flat as a thread accumulates checkpoints.
+
+    poetry run python -m benchmarks.checkpoint_load
+    poetry run python -m benchmarks.checkpoint_load --db-uri postgresql://... --reset
+
+Only run it against a scratch database, the tables are dropped when --reset is given.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from app.id import generate
+from app.models_stores_sql import (
+    CheckpointStoreSQL,
+    checkpoint_table,
+    checkpoint_writes_table,
+    metadata,
+    workspace_table,
+)
+
+WRITES_PER_CHECKPOINT = 3
+
+
+def seed(engine: Engine, store: CheckpointStoreSQL, workspace_id: str, length: int):
+    """A thread of length checkpoints, each with a few pending writes"""
+    thread_id = generate()
+    checkpoints, writes = [], []
+    parent_id = None
+    for step in range(length):
+        checkpoint = empty_checkpoint()
+        checkpoint["id"] = str(uuid6(clock_seq=step))
+        checkpoint["channel_values"] = {
+            "messages": [f"message {i}" for i in range(10)],
+            "step": step,
+        }
+        checkpoints.append(
+            {
+                "workspace_id": workspace_id,
+                "thread_id": thread_id,
+                "checkpoint_ns": "",
+                "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": parent_id,
+                "checkpoint": store.serde.dumps(checkpoint),
+                "metadata": store.serde.dumps({"step": step}),
+            }
+        )
+        writes.extend(
+            {
+                "workspace_id": workspace_id,
+                "thread_id": thread_id,
+                "checkpoint_ns": "",
+                "checkpoint_id": checkpoint["id"],
+                "task_id": generate(),
+                "idx": idx,
+                "channel": "messages",
+                "blob": store.serde.dumps(f"write {idx}"),
+            }
+            for idx in range(WRITES_PER_CHECKPOINT)
+        )
+        parent_id = checkpoint["id"]
+
+    with engine.begin() as conn:
+        conn.execute(checkpoint_table.insert(), checkpoints)
+        conn.execute(checkpoint_writes_table.insert(), writes)
+    return thread_id
+
+
+def time_load(store: CheckpointStoreSQL, config: dict, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        saved = asyncio.run(store.aget_tuple(config))
+        timings.append((time.perf_counter() - started) * 1000)
+    assert len(saved.pending_writes) == WRITES_PER_CHECKPOINT
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", default="sqlite:///:memory:")
+    parser.add_argument("--reset", action="store_true", help="drop existing tables")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_uri)
+    if args.reset:
+        metadata.drop_all(engine)
+    metadata.create_all(engine)
+    store = CheckpointStoreSQL(engine=engine)
+
+    workspace_id = generate()
+    with engine.begin() as conn:
+        conn.execute(
+            workspace_table.insert(),
+            {
+                "id": workspace_id,
+                "name": f"bench{workspace_id.lower()}",
+                "display_name": "bench",
+                "config": {},
+                "created_by": "bench@example.com",
+                "created_at": datetime.now(),
+            },
+        )
+
+    threads = {n: seed(engine, store, workspace_id, n) for n in args.lengths}
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE checkpoints, checkpoints_writes"))
+
+    print(f"{'checkpoints':>12} {'median ms':>10} {'p95 ms':>8}")
+    for length, thread_id in threads.items():
+        config = {
+            "configurable": {
+                "workspace_id": workspace_id,
+                "thread_id": thread_id,
+                "checkpoint_ns": "",
+            }
+        }
+        timings = sorted(time_load(store, config, args.repeat))
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{length:>12} {statistics.median(timings):>10.3f} {p95:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the checkpoint serializers on conversation checkpoints of growing length:
+bytes written and encode / decode time of a checkpoint, the way every graph step
+saves and loads them.
+
+    poetry run python -m benchmarks.checkpoint_serde
+    poetry run python -m benchmarks.checkpoint_serde --turns 10 100 --repeat 200
+"""
+
+import argparse
+import statistics
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.checkpoint_serde import TaggedSerializer
+
+SERIALIZERS = {
+    "json": JsonPlusSerializer(),
+    "msgpack": TaggedSerializer(compress_min_bytes=0),
+    "msgpack+zlib1": TaggedSerializer(compress_min_bytes=2048, compress_level=1),
+    "msgpack+zlib6": TaggedSerializer(compress_min_bytes=2048, compress_level=6),
+}
+
+
+def conversation_checkpoint(turns: int) -> dict:
+    """A data owner conversation: a request, tool calls and answers per turn"""
+    messages = [
+        SystemMessage(content="You are an access request assistant. " * 30),
+    ]
+    for i in range(turns):
+        messages += [
+            HumanMessage(
+                content=f"Hi, I need read access to the billing-{i} repository "
+                "for the quarterly audit, my manager approved it already."
+            ),
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "request_access",
+                        "args": {"app_name": f"billing-{i}", "role": "read"},
+                        "id": f"call_{i:08d}",
+                    }
+                ],
+                response_metadata={"model_name": "gpt-4o", "finish_reason": "stop"},
+                usage_metadata={
+                    "input_tokens": 1200 + i,
+                    "output_tokens": 40,
+                    "total_tokens": 1240 + i,
+                },
+            ),
+            ToolMessage(
+                content='{"status": "pending", "approvers": ["owner@acme.io"]}',
+                tool_call_id=f"call_{i:08d}",
+            ),
+            AIMessage(
+                content=f"I asked the owners of billing-{i} to approve read access, "
+                "you will be notified once they answer."
+            ),
+        ]
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages, "app_id": "a1"}
+    checkpoint["channel_versions"] = {"messages": turns * 4, "app_id": 1}
+    return checkpoint
+
+
+def timed(fn, arg, repeat: int) -> float:
+    """median µs of fn(arg)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    header = ("turns", "serializer", "bytes", "encode µs", "decode µs")
+    print("{:>6} {:>14} {:>9} {:>10} {:>10}".format(*header))
+    for turns in args.turns:
+        checkpoint = conversation_checkpoint(turns)
+        for name, serde in SERIALIZERS.items():
+            data = serde.dumps(checkpoint)
+            assert serde.loads(data)["channel_values"] == checkpoint["channel_values"]
+            encode = timed(serde.dumps, checkpoint, args.repeat)
+            decode = timed(serde.loads, data, args.repeat)
+            print(
+                f"{turns:>6} {name:>14} {len(data):>9} {encode:>10.0f} {decode:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Seeds realistic volumes and prints the query plans and timings of the hot lookup
+paths without and with the indexes declared in app/models_stores_sql.py.
+
+    poetry run python -m benchmarks.query_plans
+    poetry run python -m benchmarks.query_plans --db-uri postgresql://... --reset
+
+Only run it against a scratch database, the tables are dropped when --reset is given.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Engine
+
+from app.id import generate
+from app.models import ConversationStatuses, ConversationTypes, RuleTypes, ThenTypes
+from app.models_stores_sql import (
+    conversation_table,
+    message_table,
+    metadata,
+    rules_context_table,
+    rules_table,
+    workspace_table,
+)
+
+HOT_PATH_INDEXES = [
+    "idx_messages_conv_created",
+    "idx_conv_ws_external_id",
+    "idx_conv_ws_created",
+    "idx_conv_ws_assignee_created",
+    "idx_rules_context_rule_id",
+]
+
+
+def _indexes():
+    return [
+        index
+        for table in metadata.tables.values()
+        for index in table.indexes
+        if index.name in HOT_PATH_INDEXES
+    ]
+
+
+def _insert(engine: Engine, table, rows, batch_size: int = 5000):
+    with engine.begin() as conn:
+        for i in range(0, len(rows), batch_size):
+            conn.execute(table.insert(), rows[i : i + batch_size])
+
+
+def seed(engine: Engine, args) -> dict:
+    now = datetime.now()
+    rnd = random.Random(42)
+    ws_ids = [generate() for _ in range(args.workspaces)]
+    _insert(
+        engine,
+        workspace_table,
+        [
+            {
+                "id": ws_id,
+                "name": f"ws{i}",
+                "display_name": f"ws{i}",
+                "external_id": f"T{i}",
+                "config": {},
+                "created_by": "bench@example.com",
+                "created_at": now,
+            }
+            for i, ws_id in enumerate(ws_ids)
+        ],
+    )
+
+    conversations, messages = [], []
+    for ws_id in ws_ids:
+        for i in range(args.conversations):
+            conv_id = generate()
+            created_at = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            conversations.append(
+                {
+                    "id": conv_id,
+                    "workspace_id": ws_id,
+                    "assignee": f"user{rnd.randint(0, args.users)}@example.com",
+                    "type": ConversationTypes.recommendation,
+                    "status": ConversationStatuses.active,
+                    "external_id": f"{ws_id}-{i}",
+                    "context": {},
+                    "created_at": created_at,
+                }
+            )
+            for j in range(args.messages):
+                messages.append(
+                    {
+                        "id": generate(),
+                        "workspace_id": ws_id,
+                        "conversation_id": conv_id,
+                        "type": "human" if j % 2 == 0 else "ai",
+                        "content": "lorem ipsum " * 10,
+                        "created_at": created_at + timedelta(seconds=j),
+                    }
+                )
+    _insert(engine, conversation_table, conversations)
+    _insert(engine, message_table, messages)
+
+    rules, contexts = [], []
+    for ws_id in ws_ids:
+        for i in range(args.rules):
+            rule_id = generate()
+            rules.append(
+                {
+                    "id": rule_id,
+                    "workspace_id": ws_id,
+                    "active": True,
+                    "when": f"rule {i}",
+                    "then": ThenTypes.approve,
+                    "type": RuleTypes.auto_approve,
+                    "created_by": "bench@example.com",
+                    "created_at": now,
+                }
+            )
+            for _ in range(rnd.randint(1, 10)):
+                contexts.append(
+                    {
+                        "id": generate(),
+                        "rule_id": rule_id,
+                        "workspace_id": ws_id,
+                        "application_id": generate(),
+                    }
+                )
+    _insert(engine, rules_table, rules)
+    _insert(engine, rules_context_table, contexts)
+
+    sample = rnd.choice(conversations)
+    return {
+        "workspace_id": sample["workspace_id"],
+        "conversation_id": sample["id"],
+        "external_id": sample["external_id"],
+        "assignee": sample["assignee"],
+    }
+
+
+def hot_queries(sample: dict) -> dict:
+    conv, msg = conversation_table, message_table
+    ws = sample["workspace_id"]
+    return {
+        "messages of a conversation": select(msg)
+        .where(msg.c.conversation_id == sample["conversation_id"])
+        .order_by(msg.c.created_at),
+        "conversation by external id": select(conv)
+        .where(conv.c.workspace_id == ws)
+        .where(conv.c.external_id == sample["external_id"])
+        .limit(1),
+        "conversations of an assignee": select(conv)
+        .where(conv.c.workspace_id == ws)
+        .where(conv.c.assignee == sample["assignee"])
+        .order_by(conv.c.created_at.desc())
+        .limit(50),
+        "conversations of a workspace": select(conv)
+        .where(conv.c.workspace_id == ws)
+        .order_by(conv.c.created_at.desc(), conv.c.id.desc())
+        .limit(50),
+        "rules with their context": select(
+            rules_table.c.id, func.count(rules_context_table.c.id)
+        )
+        .join(rules_context_table, rules_context_table.c.rule_id == rules_table.c.id)
+        .where(rules_table.c.workspace_id == ws)
+        .group_by(rules_table.c.id),
+    }
+
+
+def explain(engine: Engine, queries: dict, repeat: int):
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text(f"{prefix} {sql}")).all()
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(query).all()
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+
+            print(f"-- {name}: {elapsed_ms:.2f}ms")
+            for row in plan:
+                print(f"   {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-uri", default="sqlite:///:memory:")
+    parser.add_argument("--reset", action="store_true", help="drop existing tables")
+    parser.add_argument("--workspaces", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_uri)
+    if args.reset:
+        metadata.drop_all(engine)
+    metadata.create_all(engine)
+    for index in _indexes():
+        index.drop(engine)
+
+    started = time.perf_counter()
+    sample = seed(engine, args)
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+    queries = hot_queries(sample)
+
+    print("\n== without indexes")
+    explain(engine, queries, args.repeat)
+
+    for index in _indexes():
+        index.create(engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    print("\n== with indexes")
+    explain(engine, queries, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""adds workspace purges and the deleting workspace status
+
+Revision ID: 1c225156d3cc
+Revises: af49ec8f63e1
+Create Date: 2026-10-18 14:03:27.219584
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1c225156d3cc"
+down_revision: Union[str, None] = "af49ec8f63e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        # a new enum value can not be used in the transaction that added it
+        with op.get_context().autocommit_block():
+            op.execute(
+                "ALTER TYPE workspacestatuses ADD VALUE IF NOT EXISTS 'deleting'"
+            )
+
+    op.create_table(
+        "workspace_purges",
+        sa.Column("workspace_id", sa.String(length=10), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "pending",
+                "running",
+                "completed",
+                "failed",
+                name="workspacepurgestatuses",
+            ),
+            nullable=False,
+        ),
+        sa.Column("step", sa.String(), nullable=False),
+        sa.Column("deleted", sa.JSON(), nullable=False),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("requested_by", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("workspace_id"),
+    )
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    op.drop_table("workspace_purges")
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS workspacepurgestatuses")
+    # postgres can not drop a value from an enum, 'deleting' stays
+    # ### end Alembic commands ###
@@ -0,0 +1,38 @@
+"""restores the checkpoints primary key
+
+Revision ID: 5e0b3f2d9a71
+Revises: 1c225156d3cc
+Create Date: 2026-10-18 15:21:09.734120
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0b3f2d9a71"
+down_revision: Union[str, None] = "1c225156d3cc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # dropping thread_ts in 802c0e0c8f3f dropped the primary key along with it, which
+    # left the latest checkpoint lookup of every graph step without an index
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE checkpoints DROP CONSTRAINT IF EXISTS checkpoints_pkey")
+    op.create_primary_key(
+        "checkpoints_pkey",
+        "checkpoints",
+        ["workspace_id", "thread_id", "checkpoint_ns", "checkpoint_id"],
+    )
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.drop_constraint("checkpoints_pkey", "checkpoints", type_="primary")
+    # ### end Alembic commands ###
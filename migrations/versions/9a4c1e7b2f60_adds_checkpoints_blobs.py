@@ -0,0 +1,47 @@
+"""adds checkpoints blobs, channel values stored per version
+
+Revision ID: 9a4c1e7b2f60
+Revises: 5e0b3f2d9a71
+Create Date: 2026-10-18 16:42:51.308215
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4c1e7b2f60"
+down_revision: Union[str, None] = "5e0b3f2d9a71"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing checkpoints keep their channel values inline and are read as they are,
+    # checkpoints saved from now on refer to their values here, the old rows go as
+    # the retention prunes their threads
+    op.create_table(
+        "checkpoints_blobs",
+        sa.Column("workspace_id", sa.String(length=10), nullable=False),
+        sa.Column("thread_id", sa.String(length=10), nullable=False),
+        sa.Column("checkpoint_ns", sa.String(), nullable=False),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column("blob", sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["workspace_id"],
+            ["workspaces.id"],
+        ),
+        sa.PrimaryKeyConstraint(
+            "workspace_id", "thread_id", "checkpoint_ns", "channel", "version"
+        ),
+    )
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # checkpoints saved since the upgrade lose their versioned channel values
+    op.drop_table("checkpoints_blobs")
+    # ### end Alembic commands ###
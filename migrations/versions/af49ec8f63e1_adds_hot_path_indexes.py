@@ -0,0 +1,48 @@
+"""adds indexes for the hot lookup paths
+
+Revision ID: af49ec8f63e1
+Revises: ad280954d50d
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "af49ec8f63e1"
+down_revision: Union[str, None] = "ad280954d50d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_messages_conv_created",
+        "messages",
+        ["conversation_id", "created_at"],
+    )
+    op.create_index(
+        "idx_conv_ws_external_id",
+        "conversations",
+        ["workspace_id", "external_id"],
+    )
+    op.create_index(
+        "idx_conv_ws_created",
+        "conversations",
+        ["workspace_id", "created_at", "id"],
+    )
+    op.create_index(
+        "idx_conv_ws_assignee_created",
+        "conversations",
+        ["workspace_id", "assignee", "created_at"],
+    )
+    op.create_index("idx_rules_context_rule_id", "rules_context", ["rule_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_rules_context_rule_id", table_name="rules_context")
+    op.drop_index("idx_conv_ws_assignee_created", table_name="conversations")
+    op.drop_index("idx_conv_ws_created", table_name="conversations")
+    op.drop_index("idx_conv_ws_external_id", table_name="conversations")
+    op.drop_index("idx_messages_conv_created", table_name="messages")
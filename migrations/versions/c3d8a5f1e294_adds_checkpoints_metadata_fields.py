@@ -0,0 +1,29 @@
+"""adds checkpoints metadata fields, to filter checkpoints by metadata in SQL
+
+Revision ID: c3d8a5f1e294
+Revises: 9a4c1e7b2f60
+Create Date: 2026-10-18 18:07:12.614930
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d8a5f1e294"
+down_revision: Union[str, None] = "9a4c1e7b2f60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing checkpoints are left null, listing matches their metadata in python
+    op.add_column("checkpoints", sa.Column("metadata_fields", sa.JSON(), nullable=True))
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    op.drop_column("checkpoints", "metadata_fields")
+    # ### end Alembic commands ###